@@ -46,10 +46,19 @@ reviews=[
     I can't explain how much I love this. Coming from a Nespresso machine to this, and I am so much happier. The taste, and simplicity are top notch. Plus the act of brewing with this is very peaceful. Highly recommend.
     '''
 ]
-corpus_text = "PRODUCT DESCRIPTION:\n" + description + "\n\nCUSTOMER REVIEWS:\n" + "\n\n".join(reviews)
 
+import os
+import sys
+import json
 from openai import OpenAI
-client = OpenAI()
+
+# Shared on-disk completion cache (reruns of the same prompts cost nothing; LLM_CACHE_BYPASS=1 to refresh)
+sys.path.append(os.path.abspath(os.path.join("..", "agentic workflow app")))
+from llm_cache import CachedOpenAI
+from multi_analysis import MultiTaskAnalyzer, Section, array, number, obj, print_comparison, string
+from topic_model import fit_topics, name_topics
+from review_dedup import dedup_reviews, print_report
+client = CachedOpenAI(OpenAI())
 
 # -----------------------------
 # Utility: Chat Completion Call
@@ -123,24 +132,6 @@ Reviews:
 """
 
 
-def build_topic_extraction_prompt(text):
-    return f"""
-You are a topic modeling expert.
-
-Identify the major topics discussed in these product reviews.
-Cluster the reviews into 3–6 coherent topics and describe each topic briefly.
-
-Return the output in this format:
-Topic Name:
-- Description:
-- Representative Keywords:
-- Representative User Comments (short phrases):
-
-Reviews:
-{text}
-"""
-
-
 # -----------------------------
 # Functions to Run All Prompts
 # -----------------------------
@@ -159,9 +150,16 @@ def run_sentiment_analysis(text):
     return ask_gpt(prompt)
 
 
-def run_topic_extraction(text):
-    prompt = build_topic_extraction_prompt(text)
-    return ask_gpt(prompt)
+def run_topic_extraction(reviews, n_topics=4, counts=None):
+    """
+    Clusters the reviews locally (TF-IDF + NMF) and only sends the cluster keywords and examples
+    to the LLM to name them. `reviews` is a list of review texts, or one text with a review per line;
+    counts are how often each one was posted, if duplicates were collapsed.
+    """
+    if isinstance(reviews, str):
+        reviews = [line.strip() for line in reviews.splitlines() if line.strip()]
+    clusters = fit_topics([r.strip() for r in reviews], n_topics=n_topics, counts=counts)
+    return name_topics(client, clusters, model="gpt-5.1", product="Hario V60 pour-over coffee starter set")
 
 # Example: Insert chunked (or single) review text
 sample_reviews = """
@@ -177,27 +175,71 @@ print(run_visual_feature_extraction(sample_reviews))
 print("\n=== Sentiment Analysis ===")
 print(run_sentiment_analysis(sample_reviews))
 print("\n=== Topic Extraction ===")
-print(run_topic_extraction(sample_reviews))
+print(json.dumps(run_topic_extraction(sample_reviews), indent=2, ensure_ascii=False))
+
+# === Q2: Collapse near-duplicate reviews before any of them reach the LLM ===
+# Each kept review is marked with how often it was posted, so the analyses can still weight it.
+unique_reviews, dedup_report = dedup_reviews([r.strip() for r in reviews], product="Hario V60 starter set")
+print_report(dedup_report, prefix="[Dedup] ")
+corpus_text = "PRODUCT DESCRIPTION:\n" + description + "\n\nCUSTOMER REVIEWS:\n" + "\n\n".join(
+    (f"(posted {n}x) " if n > 1 else "") + r for r, n in zip(unique_reviews, dedup_report["multiplicity"]))
+
+# === Q2: Summarization, Visual Features and Sentiment in one call ===
+# corpus_text is sent once; the three analyses come back as sections of one JSON schema,
+# and a section that fails validation is asked for again on its own.
+_strings = array(string())
+
+analysis_sections = [
+    Section("summary",
+            "A concise and comprehensive overview of the reviews: key themes, user experiences, pros, cons "
+            "and recurring patterns.",
+            obj({"overall_summary": string(), "top_positive_points": _strings,
+                 "top_negative_points": _strings, "frequently_mentioned_keywords": _strings})),
+    Section("visual_features",
+            "ONLY concrete visual or physical features of the product: shape, color, material, texture, size, "
+            "special patterns and usage environment.",
+            obj({"materials": _strings, "colors": _strings, "shapes": _strings, "textures": _strings,
+                 "distinctive_patterns": _strings, "functional_visual_elements": _strings,
+                 "common_usage_scenes": _strings})),
+    Section("sentiment",
+            "Overall sentiment (Positive / Neutral / Negative), sentiment distribution (%), top 5 reasons for "
+            "positive sentiment, top 5 reasons for negative sentiment and a one-sentence emotional summary.",
+            obj({"overall_sentiment": string("Positive, Neutral or Negative"),
+                 "distribution": obj({"positive": number(), "neutral": number(), "negative": number()}),
+                 "positive_reasons": _strings, "negative_reasons": _strings, "emotional_summary": string()}),
+            check=lambda s: None if abs(sum(s["distribution"].values()) - 100) <= 5
+            else "distribution percentages must add up to 100"),
+]
 
-# === Q2: Summarization ===
-summary_result = run_summarization(corpus_text)
-print("===== SUMMARIZATION =====")
-print(summary_result)
+analyzer = MultiTaskAnalyzer(client, analysis_sections, model="gpt-5.1", temperature=None)
+analysis_results = analyzer.analyze(corpus_text)
+summary_result = analysis_results["summary"]
+visual_features_result = analysis_results["visual_features"]
+sentiment_result = analysis_results["sentiment"]
 
-# === Q2: Visual Feature Extraction ===
-visual_features_result = run_visual_feature_extraction(corpus_text)
-print("\n===== VISUAL FEATURES (JSON) =====")
-print(visual_features_result)
+# === Q2: Topic Extraction (local clustering; the LLM only names the clusters) ===
+topics_result = run_topic_extraction(unique_reviews, n_topics=3, counts=dedup_report["multiplicity"])
 
-# === Q2: Sentiment Analysis ===
-sentiment_result = run_sentiment_analysis(corpus_text)
+print("===== SUMMARIZATION =====")
+print(json.dumps(summary_result, indent=2, ensure_ascii=False))
+print("\n===== VISUAL FEATURES (JSON) =====")
+print(json.dumps(visual_features_result, indent=2, ensure_ascii=False))
 print("\n===== SENTIMENT ANALYSIS =====")
-print(sentiment_result)
-
-# === (Optional) Topic Extraction ===
-topics_result = run_topic_extraction(corpus_text)
+print(json.dumps(sentiment_result, indent=2, ensure_ascii=False))
 print("\n===== TOPIC EXTRACTION =====")
-print(topics_result)
+print(json.dumps(topics_result, indent=2, ensure_ascii=False))
+
+report = analyzer.last_report
+print(f"\n[Combined Analysis] {len(report['calls'])} call(s), {report['input_tokens']:,} input tokens, "
+      f"{report['seconds']:.1f}s; re-asked: {', '.join(report['repaired']) or '-'}; "
+      f"invalid: {', '.join(report['failed']) or '-'}")
+
+# Set to True to also run the three sections as separate calls and compare tokens/latency
+COMPARE_ANALYSIS_PATHS = False
+if COMPARE_ANALYSIS_PATHS:
+    print("\n===== COMBINED vs. PER-TASK CALLS =====")
+    print_comparison(analyzer.compare(corpus_text))
+print(f"\n[LLM Cache] {client.cache.summary()}")
 
 analysis_output = {
     "summary": summary_result,
@@ -10,14 +10,14 @@ Q2: Analysis of Customer Reviews with LLM
 # ============================================================================
 
 import os
+import sys
 import json
 import re
 import time
-import requests
 from datetime import datetime
-from typing import List, Dict, Optional
+from urllib.parse import urlparse
+from typing import List, Dict, Optional, Set
 
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 from openai import OpenAI
 from selenium import webdriver
@@ -27,6 +27,30 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 
+# Shared scraping helpers live next to the agentic workflow app's scraper
+sys.path.append(os.path.abspath(os.path.join("..", "agentic workflow app")))
+from session_store import SessionStore
+from driver_pool import DriverPool, shared_pool
+from review_extractor import extract_reviews_js, extract_reviews_html, html_has_next_page
+from url_registry import UrlFormatRegistry
+from resource_policy import ResourcePolicy, page_traffic
+from tab_fetch import TabPipeline
+from review_store import ReviewStream, load_reviews, known_review_ids
+from http_fetch import FetchEngine, FetchResult, pooled_browser_fetch, parse_product_html, BROWSER, BLOCK_REASONS, PRODUCT_MARKER, REVIEW_MARKER
+from tracing import CrawlTrace, NAVIGATE, HTTP, WAIT, IDLE, SCROLL, EXTRACT
+from llm_pool import RateLimiter, estimate_tokens, fan_out
+from llm_cache import CachedOpenAI
+from stage_graph import StageGraph
+from multi_analysis import MultiTaskAnalyzer, Section, array, obj, print_comparison, string
+from summary_tree import SummaryStore, content_key, reduce_to_budget, print_levels
+from review_chunker import chunk_reviews, count_tokens, format_review
+from review_dedup import dedup_reviews, print_report
+from review_selector import VISUAL_TERMS
+from sentiment_scorer import pick_samples, review_text, score_reviews, sentiment_stats
+from topic_model import fit_topics, name_topics, print_clusters
+from waits import (PolitenessController, has_next_page, scroll_page,
+                   wait_for_reviews, READY, SIGNIN, CAPTCHA)
+
 # Load environment variables
 # Uses standard .env file at project root, as documented in README
 load_dotenv('.env')
@@ -34,8 +58,9 @@ openai_api_key = os.getenv('OPENAI_API')
 if not openai_api_key:
     raise ValueError("OpenAI API key not found in .env file")
 
-# Initialize OpenAI client
-client = OpenAI(api_key=openai_api_key)
+# Initialize OpenAI client (set OPENAI_BASE_URL to run against a compatible server, e.g. mock_openai.py).
+# Chat completions are cached in .cache/llm_completions.sqlite; set LLM_CACHE_BYPASS=1 to force fresh answers.
+client = CachedOpenAI(OpenAI(api_key=openai_api_key))
 
 # Configuration
 PRODUCT_URL = "https://www.amazon.com/gp/product/B0BYTNTGLY/ref=ewc_pr_img_1?smid=A2XRWKFPKCTI0V&th=1"
@@ -43,6 +68,23 @@ PRODUCT_ASIN = "B0BYTNTGLY"
 OUTPUT_DIR = "data"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# LLM concurrency for chunk summaries (keep under your OpenAI account's rate limits)
+LLM_MAX_WORKERS = 8
+LLM_RPM_LIMIT = 500
+LLM_TPM_LIMIT = 200_000
+ANALYSIS_MAX_WORKERS = 4       # Q2 analysis stages run concurrently where they don't depend on each other
+ANALYSIS_RETRIES = 1           # Retries per failed analysis stage
+TOPIC_COUNT = 8                # Review clusters the topic model finds (Q2-5)
+SENTIMENT_SAMPLES = 8          # Reviews per group (positive/negative/visual) the LLM names themes from
+COMBINED_ANALYSIS = True       # Q2-2 and Q2-3 as sections of one LLM call instead of two calls
+COMPARE_ANALYSIS_PATHS = False # Also run the sections one call each and report tokens/latency of both paths
+CHUNK_TOKENS = 1000            # Whole reviews are packed into chunks of at most this many tokens
+CHUNK_OVERLAP_REVIEWS = 0      # Reviews repeated from the previous chunk as context
+CONDENSED_TOKEN_BUDGET = 6000  # Chunk summaries are summarized again (level by level) until they fit
+SUMMARY_TREE_PATH = os.path.join(OUTPUT_DIR, "summary_tree.json")  # Reused group summaries
+DEDUP_REVIEWS = True           # Collapse near-duplicate reviews (MinHash + LSH) before any LLM step
+DEDUP_THRESHOLD = 0.8          # Estimated Jaccard similarity at which two reviews are the same review
+
 # Headers for web scraping
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -60,44 +102,21 @@ print(f"   Product ASIN: {PRODUCT_ASIN}")
 # Step 1: Helper Functions
 # ============================================================================
 
-def extract_product_description(url: str) -> Dict:
-    """Extract product description from Amazon product page."""
+def extract_product_description(url: str, fetch_engine: Optional[FetchEngine] = None) -> Dict:
+    """
+    Extract product description from Amazon product page.
+    Uses the pooled HTTP session first and only opens a browser if Amazon blocks it.
+    """
+    fetch_engine = fetch_engine or get_fetch_engine()
     try:
-        response = requests.get(url, headers=HEADERS, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Extract product title
-        title_elem = soup.find('span', {'id': 'productTitle'})
-        title = title_elem.get_text(strip=True) if title_elem else "N/A"
-        
-        # Extract features from "About this item" section
-        features = []
-        about_section = soup.find('div', {'id': 'feature-bullets'})
-        if about_section:
-            feature_list = about_section.find_all('li', class_='a-spacing-mini')
-            features = [li.get_text(strip=True) for li in feature_list if li.get_text(strip=True)]
+        page = fetch_engine.fetch(url, expect=PRODUCT_MARKER)
+        if not page.ok:
+            raise RuntimeError(f"product page unavailable ({page.reason})")
+        print(f"   Served by: {page.tier} tier ({page.elapsed:.2f}s)")
         
-        # Extract product details table
-        product_details = {}
-        details_table = soup.find('table', {'id': 'productDetails_techSpec_section_1'})
-        if details_table:
-            for row in details_table.find_all('tr'):
-                th, td = row.find('th'), row.find('td')
-                if th and td:
-                    product_details[th.get_text(strip=True)] = td.get_text(strip=True)
-        
-        # Extract price
-        price_elem = soup.find('span', {'class': 'a-price-whole'})
-        price = price_elem.get_text(strip=True) if price_elem else "N/A"
-        
-        return {
-            "title": title,
-            "features": features,
-            "product_details": product_details,
-            "price": price,
-            "scraped_at": datetime.now().isoformat()
-        }
+        description = parse_product_html(page.html)
+        description["scraped_at"] = datetime.now().isoformat()
+        return description
         
     except Exception as e:
         print(f"❌ Error extracting product description: {e}")
@@ -124,10 +143,19 @@ def extract_product_description(url: str) -> Dict:
         }
 
 
-def setup_selenium_driver(headless: bool = False) -> webdriver.Chrome:
-    """Setup Selenium Chrome driver with anti-detection settings."""
+def setup_selenium_driver(headless: bool = False, profile_dir: Optional[str] = None,
+                          block_resources: bool = True, measure_traffic: bool = False) -> webdriver.Chrome:
+    """
+    Setup Selenium Chrome driver with anti-detection settings.
+    With block_resources, images/media/fonts and non-Amazon hosts are not loaded (see resource_policy.py).
+    With measure_traffic, Chrome logs network events so the KB per page can be printed.
+    """
     chrome_options = Options()
     
+    # Persistent Chrome profile (keeps the Amazon login between runs)
+    if profile_dir:
+        chrome_options.add_argument(f'--user-data-dir={os.path.abspath(profile_dir)}')
+    
     # Anti-detection settings
     chrome_options.add_argument('--disable-blink-features=AutomationControlled')
     chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
@@ -136,17 +164,26 @@ def setup_selenium_driver(headless: bool = False) -> webdriver.Chrome:
     chrome_options.add_argument('--no-sandbox')
     chrome_options.add_argument('--window-size=1920,1080')
     chrome_options.add_argument('--start-maximized')
+    # Keep background tabs loading at full speed (multi-tab crawling)
+    chrome_options.add_argument('--disable-background-timer-throttling')
+    chrome_options.add_argument('--disable-backgrounding-occluded-windows')
+    chrome_options.add_argument('--disable-renderer-backgrounding')
     chrome_options.add_argument('user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
     
     if headless:
         chrome_options.add_argument('--headless')
         chrome_options.add_argument('--disable-gpu')
     
+    resource_policy = (ResourcePolicy(measure=measure_traffic) if block_resources
+                       else ResourcePolicy.off(measure=measure_traffic))
+    resource_policy.apply_to_options(chrome_options, headless=headless)
+    
     try:
         driver = webdriver.Chrome(options=chrome_options)
         driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
             'source': 'Object.defineProperty(navigator, "webdriver", {get: () => undefined});'
         })
+        resource_policy.apply_to_driver(driver)
         return driver
     except Exception as e:
         print(f"❌ Error setting up Chrome driver: {e}")
@@ -154,206 +191,285 @@ def setup_selenium_driver(headless: bool = False) -> webdriver.Chrome:
         raise
 
 
-def extract_rating_from_review(review_element) -> Optional[int]:
-    """Extract star rating from review element."""
-    try:
-        rating_elem = review_element.find_element(
-            By.CSS_SELECTOR, '[data-hook="review-star-rating"], .a-icon-alt, span.a-icon-alt'
-        )
-        rating_text = rating_elem.get_attribute('textContent') or rating_elem.text
-        rating_match = re.search(r'(\d+)', rating_text)
-        if rating_match:
-            return int(rating_match.group(1))
-    except NoSuchElementException:
-        pass
-    return None
+def get_driver_pool(headless: bool = False, profile_dir: Optional[str] = None,
+                    size: int = 1, max_age: float = 30 * 60, block_resources: bool = True,
+                    measure_traffic: bool = False) -> DriverPool:
+    """Shared pool of warm Chrome drivers, so repeated scrapes skip browser start-up."""
+    return shared_pool(("massager", headless, profile_dir, block_resources, measure_traffic),
+                       lambda: setup_selenium_driver(headless=headless, profile_dir=profile_dir,
+                                                     block_resources=block_resources,
+                                                     measure_traffic=measure_traffic),
+                       size=size, max_age=max_age)
 
 
-def extract_review_data(review_element, review_index: int) -> Optional[Dict]:
-    """Extract all data from a single review element."""
-    try:
-        review_id = review_element.get_attribute('id') or f"review_{review_index}"
-        rating = extract_rating_from_review(review_element)
-        
-        # Review title
-        try:
-            title_elem = review_element.find_element(By.CSS_SELECTOR, '[data-hook="review-title"] span:not(.a-icon-alt)')
-            review_title = title_elem.text.strip()
-        except NoSuchElementException:
-            review_title = ""
-        
-        # Review body
-        try:
-            body_elem = review_element.find_element(By.CSS_SELECTOR, '[data-hook="review-body"] span')
-            review_body = body_elem.text.strip()
-        except NoSuchElementException:
-            review_body = ""
-        
-        # Reviewer name
-        try:
-            name_elem = review_element.find_element(By.CSS_SELECTOR, '.a-profile-name, [data-hook="review-author"]')
-            reviewer_name = name_elem.text.strip()
-        except NoSuchElementException:
-            reviewer_name = "Anonymous"
-        
-        # Review date
-        try:
-            date_elem = review_element.find_element(By.CSS_SELECTOR, '[data-hook="review-date"]')
-            review_date = date_elem.text.strip()
-            date_match = re.search(r'(\w+\s+\d+,\s+\d{4})', review_date)
-            if date_match:
-                review_date = date_match.group(1)
-        except NoSuchElementException:
-            review_date = ""
-        
-        # Verified purchase
-        verified_purchase = False
-        try:
-            review_element.find_element(By.CSS_SELECTOR, '[data-hook="avp-badge"]')
-            verified_purchase = True
-        except NoSuchElementException:
-            pass
-        
-        # Helpful count
-        helpful_count = 0
-        try:
-            helpful_elem = review_element.find_element(By.CSS_SELECTOR, '[data-hook="helpful-vote-statement"]')
-            helpful_match = re.search(r'(\d+)', helpful_elem.text)
-            if helpful_match:
-                helpful_count = int(helpful_match.group(1))
-        except NoSuchElementException:
-            pass
-        
-        if review_body or review_title:
-            return {
-                "review_id": review_id,
-                "rating": rating,
-                "review_title": review_title,
-                "review_body": review_body,
-                "reviewer_name": reviewer_name,
-                "review_date": review_date,
-                "verified_purchase": verified_purchase,
-                "helpful_count": helpful_count
-            }
-    except Exception as e:
-        print(f"   ⚠️  Error extracting review data: {e}")
-    return None
+def setup_login_driver() -> webdriver.Chrome:
+    """A visible browser without resource blocking, for manual logins (see SessionStore.ensure_login)."""
+    return setup_selenium_driver(headless=False, block_resources=False)
+
+
+_fetch_engines: Dict = {}
+
+
+def get_fetch_engine(headless: bool = False, session_store: Optional[SessionStore] = None) -> FetchEngine:
+    """HTTP-first page fetcher (keep-alive session + lxml); blocked pages escalate to a pooled browser."""
+    session_store = session_store or SessionStore()
+    key = (headless, session_store.path)
+    if key not in _fetch_engines:
+        _fetch_engines[key] = FetchEngine(
+            browser_fetch=pooled_browser_fetch(get_driver_pool(headless=headless), session_store,
+                                               interactive=not headless, login_driver=setup_login_driver),
+            headers=HEADERS,
+            session_store=session_store,
+        )
+    return _fetch_engines[key]
 
 
 def collect_amazon_reviews(asin: str, max_pages: int = 5, headless: bool = False, 
-                          delay: float = 3.0, login_timeout: int = 60) -> List[Dict]:
+                          delay: float = 3.0, login_timeout: int = 60,
+                          session_store: Optional[SessionStore] = None,
+                          profile_dir: Optional[str] = None,
+                          pool: Optional[DriverPool] = None,
+                          fetch_engine: Optional[FetchEngine] = None,
+                          known_ids: Optional[Set[str]] = None,
+                          url_registry: Optional[UrlFormatRegistry] = None,
+                          stream: Optional[ReviewStream] = None,
+                          tabs: int = 1,
+                          base_url: str = "https://www.amazon.com",
+                          report_path: Optional[str] = None) -> List[Dict]:
     """
     Collect customer reviews from Amazon using Selenium.
-    Opens browser for manual login, then scrapes reviews.
+    Borrows a warm browser from the driver pool, reuses the saved login session
+    if still valid (otherwise waits for manual login), then scrapes reviews.
+    Each page is first fetched over plain HTTP with the browser's cookies; the
+    browser only loads the pages that HTTP cannot serve.
+    
+    Incremental mode (known_ids given): pages are walked most-recent-first, only
+    reviews whose review_id is not in known_ids are returned, and paging stops at
+    the first page that contains nothing but known reviews.
+    
+    The review URL format that worked last time (per ASIN, else per marketplace) is read
+    from url_registry and probed first; the other formats are only tried if it fails.
+    
+    With a ReviewStream, each finished page is appended to its JSONL log instead of being
+    kept in memory (the returned list stays empty), and a rerun resumes after the last
+    checkpointed page. Call stream.compact() afterwards to write customer_reviews.json.
+    
+    With tabs > 1, review pages are loaded in that many browser tabs of the same session
+    (see tab_fetch.TabPipeline): the next pages load while the current one is extracted.
+    This mode goes straight to the browser tier and drops back to one tab on a captcha.
+    
+    base_url can point at a local replay_server.py stand-in to crawl recorded pages offline.
+    
+    Every page is traced (navigate/http/wait/scroll/extract/idle time and WebDriver commands,
+    see tracing.CrawlTrace); the summary is printed at the end and written to report_path as JSON.
     """
     print(f"\n📝 Collecting reviews for ASIN: {asin}")
     print(f"   Max pages: {max_pages} | Login timeout: {login_timeout}s")
     
     reviews = []
     driver = None
+    failed = False
+    if stream is not None:
+        if stream.complete:
+            print(f"   ✅ Streamed crawl already finished ({stream.reviews_written} reviews). Nothing to resume.")
+            return reviews
+        if stream.last_page:
+            print(f"   ↩️  Resuming after page {stream.last_page} ({stream.reviews_written} reviews already streamed)")
+            if known_ids is not None:
+                # Streamed but not yet compacted: these must not be fetched and written again
+                known_ids = set(known_ids) | stream.streamed_ids()
+    collected = stream.reviews_written if stream is not None else 0
+    session_store = session_store or SessionStore()
+    pool = pool or get_driver_pool(headless=headless, profile_dir=profile_dir)
+    fetch_engine = fetch_engine or get_fetch_engine(headless=headless, session_store=session_store)
+    trace = CrawlTrace(name=f"reviews {asin}")
     
     try:
-        print("\n🔧 Setting up Selenium Chrome driver...")
-        driver = setup_selenium_driver(headless=headless)
+        print("\n🔧 Borrowing Selenium Chrome driver from pool...")
+        driver = pool.checkout()
+        driver_state = pool.state(driver)
+        trace.attach(driver)
         
-        # Navigate to Amazon login page
-        print("\n" + "="*60)
-        print("🔐 AMAZON LOGIN")
-        print(f"   You have {login_timeout} seconds to login manually.")
-        print("="*60)
-        
-        driver.get("https://www.amazon.com/ap/signin?openid.pape.max_auth_age=0&openid.return_to=https%3A%2F%2Fwww.amazon.com%2F&openid.identity=http%3A%2F%2Fspecs.openid.net%2Fauth%2F2.0%2Fidentifier_select&openid.assoc_handle=usflex&openid.mode=checkid_setup&openid.claimed_id=http%3A%2F%2Fspecs.openid.net%2Fauth%2F2.0%2Fidentifier_select&openid.ns=http%3A%2F%2Fspecs.openid.net%2Fauth%2F2.0")
-        
-        # Wait for user to login
-        print(f"\n⏳ Waiting {login_timeout} seconds for login...")
-        for remaining in range(login_timeout, 0, -10):
-            print(f"   ⏰ {remaining} seconds remaining...")
-            time.sleep(10)
-        
-        print("\n✅ Continuing with scraping...")
+        # Restore the saved session, falling back to manual login when it has expired.
+        # Warm drivers that already logged in skip this step.
+        if not driver_state.get("logged_in"):
+            print("\n" + "="*60)
+            print("🔐 AMAZON LOGIN")
+            print(f"   Saved session: {session_store.path}")
+            print(f"   If it has expired, you have {login_timeout} seconds to login manually.")
+            print("="*60)
+            
+            driver_state["logged_in"] = session_store.ensure_login(driver, login_timeout=login_timeout,
+                                                                   interactive=not headless,
+                                                                   login_driver=setup_login_driver)
+        print("\n✅ Logged in. Continuing with scraping..." if driver_state["logged_in"]
+              else "\n⚠️  Not logged in. Continuing with scraping...")
+        fetch_engine.load_cookies(driver.get_cookies())
         
         # URL formats to try
-        url_formats = [
-            lambda a, p: f"https://www.amazon.com/product-reviews/{a}/" if p == 1 else f"https://www.amazon.com/product-reviews/{a}/?pageNumber={p}",
-            lambda a, p: f"https://www.amazon.com/product-reviews/{a}/?ie=UTF8&reviewerType=all_reviews" if p == 1 else f"https://www.amazon.com/product-reviews/{a}/?ie=UTF8&reviewerType=all_reviews&pageNumber={p}",
-            lambda a, p: f"https://www.amazon.com/product-reviews/{a}/ref=cm_cr_dp_d_show_all_btm?ie=UTF8&reviewerType=all_reviews" if p == 1 else f"https://www.amazon.com/product-reviews/{a}/ref=cm_cr_dp_d_show_all_btm?ie=UTF8&reviewerType=all_reviews&pageNumber={p}",
-        ]
+        base_url = base_url.rstrip("/")
+        url_formats = {
+            "plain": lambda a, p: f"{base_url}/product-reviews/{a}/" if p == 1 else f"{base_url}/product-reviews/{a}/?pageNumber={p}",
+            "all_reviews": lambda a, p: f"{base_url}/product-reviews/{a}/?ie=UTF8&reviewerType=all_reviews" if p == 1 else f"{base_url}/product-reviews/{a}/?ie=UTF8&reviewerType=all_reviews&pageNumber={p}",
+            "show_all_btm": lambda a, p: f"{base_url}/product-reviews/{a}/ref=cm_cr_dp_d_show_all_btm?ie=UTF8&reviewerType=all_reviews" if p == 1 else f"{base_url}/product-reviews/{a}/ref=cm_cr_dp_d_show_all_btm?ie=UTF8&reviewerType=all_reviews&pageNumber={p}",
+        }
         
-        # Find working URL format
-        print(f"\n🔍 Finding working review page URL format...")
+        if known_ids is not None:
+            # Incremental mode: newest reviews first, so already-stored ones end the crawl
+            url_formats = {
+                name: lambda a, p, fmt=fmt: fmt(a, p) + ("&" if "?" in fmt(a, p) else "?") + "sortBy=recent"
+                for name, fmt in url_formats.items()
+            }
+            print(f"   Incremental mode: {len(known_ids)} reviews already stored")
+        
+        # Find working URL format, starting with the one remembered from earlier runs
+        # (each probe returns as soon as the page settles)
+        url_registry = url_registry or UrlFormatRegistry()
+        marketplace = urlparse(base_url).netloc.replace("www.", "", 1)
+        remembered = url_registry.lookup(marketplace, asin)
+        print(f"\n🔍 Finding working review page URL format..."
+              + (f" (remembered: {remembered})" if remembered else ""))
         working_url_format = None
+        trace.start_page("probe")
         
-        for idx, url_func in enumerate(url_formats, 1):
+        for name in url_registry.order(marketplace, asin, list(url_formats)):
+            url_func = url_formats[name]
             test_url = url_func(asin, 1)
-            print(f"   Testing format {idx}...")
+            print(f"   Testing format '{name}'...")
             
             try:
-                driver.get(test_url)
-                time.sleep(5)
-                
-                current_url = driver.current_url.lower()
-                if 'signin' in current_url or 'ap/signin' in current_url:
-                    continue
+                with trace.phase(NAVIGATE):
+                    driver.get(test_url)
+                with trace.phase(WAIT):
+                    status = wait_for_reviews(driver, timeout=10)
                 
-                driver.execute_script("window.scrollTo(0, 300);")
-                time.sleep(2)
-                review_elements = driver.find_elements(By.CSS_SELECTOR, '[data-hook="review"]')
-                
-                if review_elements:
-                    print(f"   ✅ Format {idx} works! Found {len(review_elements)} reviews.")
+                if status == READY:
+                    review_elements = driver.find_elements(By.CSS_SELECTOR, '[data-hook="review"]')
+                    print(f"   ✅ Format '{name}' works! Found {len(review_elements)} reviews.")
                     working_url_format = url_func
+                    url_registry.record_success(marketplace, asin, name)
                     break
             except Exception:
-                continue
+                pass
+            if name == remembered:
+                print(f"   ⚠️  Remembered format failed, probing the others...")
+                url_registry.record_failure(marketplace, asin, name)
+        
+        print(f"   URL format registry: {url_registry.stats['hits']} hits, {url_registry.stats['misses']} misses")
         
         if not working_url_format:
             print(f"\n❌ Could not find working URL format. Login may have failed.")
             return []
         
-        # Scrape all pages
-        for page in range(1, max_pages + 1):
+        # Scrape all pages, pacing requests with the adaptive politeness controller
+        politeness = PolitenessController(base_delay=delay)
+        page = stream.last_page + 1 if stream is not None else 1
+        captcha_retries = 0
+        interrupted = False
+        tab_pages = None
+        if tabs > 1 and page <= max_pages:
+            tab_pipeline = TabPipeline(driver, tabs=tabs, politeness=politeness)
+            print(f"   Loading pages in {tab_pipeline.tabs} tabs")
+            tab_pages = tab_pipeline.pages((p, working_url_format(asin, p)) for p in range(page, max_pages + 1))
+        while page <= max_pages:
             print(f"\n📄 Scraping page {page}/{max_pages}...")
             review_url = working_url_format(asin, page)
+            trace.start_page(page)
             
             try:
-                driver.get(review_url)
-                time.sleep(5)
-                
-                if 'signin' in driver.current_url.lower():
-                    print(f"   ⚠️  Redirected to login. Stopping.")
-                    break
-                
-                # Scroll to load content
-                for scroll_y in [500, 1000, 0]:
-                    driver.execute_script(f"window.scrollTo(0, {scroll_y});")
-                    time.sleep(2)
-                
-                # Find reviews
-                try:
-                    WebDriverWait(driver, 15).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, '[data-hook="review"]'))
-                    )
-                except TimeoutException:
-                    pass
+                if tab_pages is not None:
+                    # Already dispatched (up to `tabs` pages ahead); switch to its tab and wait
+                    with trace.phase(NAVIGATE):
+                        next(tab_pages)
+                    http_page = FetchResult(review_url, None, None, 0.0)
+                    fetch_engine.count_fetch(BROWSER)
+                    fetch_engine.record(review_url, BROWSER, "multi-tab")
+                    with trace.phase(WAIT):
+                        status = wait_for_reviews(driver)
+                else:
+                    if page > 1 or captcha_retries:
+                        with trace.phase(IDLE):
+                            politeness.pause()
+                    # Tier 1: plain HTTP with the browser's session cookies
+                    with trace.phase(HTTP):
+                        http_page = fetch_engine.fetch_http(review_url, expect=REVIEW_MARKER)
+                    if not http_page.ok:
+                        # Tier 2: load this page in the logged-in browser
+                        fetch_engine.count_fetch(BROWSER)
+                        fetch_engine.record(review_url, BROWSER, http_page.reason)
+                        page_traffic(driver)  # Drop log entries from earlier navigations
+                        with trace.phase(NAVIGATE):
+                            driver.get(review_url)
+                        with trace.phase(WAIT):
+                            status = wait_for_reviews(driver)
+                        traffic = page_traffic(driver)
+                        if traffic:
+                            print(f"   📦 {traffic['bytes'] / 1024:.0f} KB in {traffic['requests']} requests "
+                                  f"({traffic['blocked']} blocked)")
                 
-                review_elements = driver.find_elements(By.CSS_SELECTOR, '[data-hook="review"]')
+                if http_page.ok:
+                    politeness.record_success()
+                    with trace.phase(EXTRACT):
+                        page_reviews = extract_reviews_html(http_page.html, start_index=collected + 1)
+                        found_count = len(page_reviews)
+                        last_page = html_has_next_page(http_page.html) is False
+                else:
+                    if http_page.reason in BLOCK_REASONS:
+                        politeness.record_block()
+                    if status == SIGNIN:
+                        politeness.record_block()
+                        print(f"   ⚠️  Redirected to login. Stopping.")
+                        interrupted = True
+                        break
+                    if status == CAPTCHA:
+                        politeness.record_block()
+                        if tab_pages is not None:
+                            print(f"   ⚠️  Captcha detected. Closing extra tabs and retrying in one tab...")
+                            tab_pages.close()
+                            tab_pages = None
+                            captcha_retries += 1
+                            continue
+                        if captcha_retries < 2:
+                            captcha_retries += 1
+                            print(f"   ⚠️  Captcha detected. Backing off to {politeness.delay:.1f}s and retrying...")
+                            continue
+                        print(f"   ⚠️  Captcha persists. Stopping.")
+                        interrupted = True
+                        break
+                    politeness.record_success()
+                    
+                    with trace.phase(SCROLL):
+                        # Trigger any lazily rendered content (no fixed sleeps needed)
+                        scroll_page(driver)
+                    with trace.phase(EXTRACT):
+                        review_selector = '[data-hook="review"]'
+                        review_elements = driver.find_elements(By.CSS_SELECTOR, review_selector)
+                        
+                        if not review_elements:
+                            for selector in ['div[data-hook="review"]', '[id*="customer_review"]', '.review']:
+                                review_elements = driver.find_elements(By.CSS_SELECTOR, selector)
+                                if review_elements:
+                                    review_selector = selector
+                                    break
+                        
+                        # All fields of all reviews in one execute_script roundtrip
+                        page_reviews = extract_reviews_js(driver, selector=review_selector,
+                                                          start_index=collected + 1) if review_elements else []
+                        found_count = len(review_elements)
+                        last_page = has_next_page(driver) is False
+                captcha_retries = 0
                 
-                if not review_elements:
-                    for selector in ['div[data-hook="review"]', '[id*="customer_review"]', '.review']:
-                        review_elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                        if review_elements:
-                            break
+                if known_ids is not None and page_reviews:
+                    new_reviews = [r for r in page_reviews if r["review_id"] not in known_ids]
+                    if not new_reviews:
+                        print(f"   ⏹️  Every review on this page is already stored. Stopping.")
+                        break
+                    page_reviews = new_reviews
                 
-                if review_elements:
-                    print(f"   ✅ Found {len(review_elements)} reviews")
-                    page_reviews = []
-                    for i, elem in enumerate(review_elements):
-                        data = extract_review_data(elem, len(reviews) + i + 1)
-                        if data:
-                            page_reviews.append(data)
-                    
+                if found_count:
+                    print(f"   ✅ Found {found_count} reviews ({'http' if http_page.ok else 'browser'} tier)")
                     if page_reviews:
-                        reviews.extend(page_reviews)
+                        collected += len(page_reviews)
                         print(f"   ✅ Extracted {len(page_reviews)} reviews")
                     elif page == 1:
                         break
@@ -361,79 +477,91 @@ def collect_amazon_reviews(asin: str, max_pages: int = 5, headless: bool = False
                     if page == 1:
                         break
                 
-                if page < max_pages:
-                    time.sleep(delay)
+                if stream is not None:
+                    # Durable before moving on: a crash after this point resumes on the next page
+                    stream.append_page(page, page_reviews)
+                else:
+                    reviews.extend(page_reviews)
+                
+                if last_page:
+                    print(f"   ⏹️  No next page. Stopping.")
+                    break
                     
             except Exception as e:
                 print(f"   ❌ Error on page {page}: {str(e)[:80]}")
+                if tab_pages is not None:
+                    tab_pages.close()
+                    tab_pages = None
                 if page == 1:
+                    interrupted = True
                     break
+            page += 1
+        
+        if tab_pages is not None:
+            tab_pages.close()
+        if stream is not None and not interrupted:
+            stream.mark_complete()
         
-        print(f"\n✅ Total reviews collected: {len(reviews)}")
+        print(f"\n⏱️  Time per phase:")
+        trace.print_summary()
+        if report_path:
+            trace.save(report_path)
+            print(f"   Run report saved to: {report_path}")
+        fetch_engine.print_stats(prefix="   ")
+        print(f"\n✅ Total reviews collected: {collected}")
         
     except Exception as e:
         print(f"\n❌ Fatal error: {e}")
         import traceback
         print(traceback.format_exc())
+        failed = True
         
     finally:
+        trace.detach()
         if driver:
-            print("🔒 Closing browser...")
-            driver.quit()
+            print("🔒 Returning browser to pool...")
+            pool.checkin(driver, discard=failed)
     
     return reviews
 
 
-def chunk_text(text: str, chunk_size: int = 3000, overlap: int = 200) -> List[str]:
-    """Split text into chunks with overlap to preserve context."""
-    if len(text) <= chunk_size:
-        return [text]
-    
-    chunks = []
-    start = 0
-    
-    while start < len(text):
-        end = start + chunk_size
-        
-        if end < len(text):
-            sentence_end = max(
-                text.rfind('.', start, end),
-                text.rfind('!', start, end),
-                text.rfind('?', start, end)
-            )
-            if sentence_end > start:
-                end = sentence_end + 1
-        
-        chunk = text[start:end].strip()
-        if chunk:
-            chunks.append(chunk)
-        
-        start = end - overlap
-        if start >= len(text):
-            break
-    
-    return chunks
-
-
-def summarize_text_in_chunks(
-    text: str,
-    chunk_size: int = 3000,
-    overlap: int = 200,
+def summarize_reviews_in_chunks(
+    reviews: List[Dict],
+    chunk_tokens: int = CHUNK_TOKENS,
+    overlap_reviews: int = CHUNK_OVERLAP_REVIEWS,
     model: str = "gpt-5.1",
+    max_workers: int = LLM_MAX_WORKERS,
+    rpm: Optional[float] = LLM_RPM_LIMIT,
+    tpm: Optional[float] = LLM_TPM_LIMIT,
+    target_tokens: int = CONDENSED_TOKEN_BUDGET,
+    store_path: Optional[str] = SUMMARY_TREE_PATH,
 ) -> str:
     """
-    Use chunk_text + LLM to summarize long review text into a shorter,
-    consolidated version for downstream analysis.
+    Use chunk_reviews + LLM to summarize all reviews into a shorter,
+    consolidated text for downstream analysis. Reviews are packed whole into
+    chunks of at most chunk_tokens tokens. Chunks are summarized
+    concurrently (up to max_workers calls in flight, within rpm/tpm); the
+    chunk summaries are then merged group by group, level by level, until
+    they fit target_tokens, so the result stays bounded at any corpus size.
+    Summaries are kept in store_path and reused while their reviews are
+    unchanged, so a refresh costs calls in proportion to the new reviews.
     """
-    chunks = chunk_text(text, chunk_size=chunk_size, overlap=overlap)
-    if len(chunks) == 1:
-        return text
-
-    print(f"\n🧩 Chunking reviews into {len(chunks)} chunks for summarization...")
-    summaries: List[str] = []
-
-    for idx, chunk in enumerate(chunks, start=1):
-        print(f"   ✏️ Summarizing chunk {idx}/{len(chunks)}...")
+    chunks = chunk_reviews(reviews, max_tokens=chunk_tokens, overlap_reviews=overlap_reviews, content_defined=True)
+    if len(chunks) <= 1:
+        return chunks[0]["text"] if chunks else ""
+
+    # Chunk summaries are stored under a hash of the chunk's reviews, so a refresh only
+    # summarizes the chunks that gained or changed reviews
+    store = SummaryStore(store_path)
+    keys = [content_key([c["key"]], prefix=f"{model}|chunk") for c in chunks]
+    summaries: List[Optional[str]] = [store.get(key) for key in keys]
+    todo = [i for i, summary in enumerate(summaries) if summary is None]
+
+    print(f"\n🧩 Chunking {len(reviews)} reviews into {len(chunks)} chunks of ≤{chunk_tokens} tokens for summarization "
+          f"({len(chunks) - len(todo)} unchanged, {len(todo)} new or changed; "
+          f"{min(max_workers, max(len(todo), 1))} at a time)...")
+
+    def summarize_chunk(i: int) -> str:
         summary_prompt = f"""
 You are an expert at summarizing customer reviews for downstream analytics.
 
@@ -443,38 +571,96 @@ Focus on:
 - Visual descriptions of the product
 - Any notable pros/cons
 
-Reviews (chunk {idx}/{len(chunks)}):
-{chunk}
+Reviews:
+{chunks[i]["text"]}
 """
-        try:
-            response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You create concise, information-dense summaries of customer reviews.",
-                    },
-                    {"role": "user", "content": summary_prompt},
-                ],
-                temperature=0.3,
-            )
-            summaries.append(response.choices[0].message.content.strip())
-        except Exception as e:
-            # Preserve information even if the LLM call fails for this chunk
-            print(f"   ⚠️ Error summarizing chunk {idx}: {e}")
-            summaries.append(chunk.strip())
-
-    if not summaries:
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You create concise, information-dense summaries of customer reviews.",
+                },
+                {"role": "user", "content": summary_prompt},
+            ],
+            temperature=0.3,
+        )
+        print(f"   ✏️ Summarized chunk {i + 1}/{len(chunks)}")
+        summary = response.choices[0].message.content.strip()
+        store.put(keys[i], summary)
+        return summary
+
+    def keep_raw_chunk(i: int, error) -> str:
+        # Preserve information even if the LLM call fails for this chunk
+        print(f"   ⚠️ Error summarizing chunk {i + 1}: {error}")
+        return chunks[i]["text"].strip()
+
+    limiter = RateLimiter(rpm=rpm, tpm=tpm)
+    results, stats = fan_out(
+        summarize_chunk,
+        todo,
+        max_workers=max_workers,
+        limiter=limiter,
+        tokens=lambda i: chunks[i]["tokens"] + 600,  # Chunk + prompt + summary
+        fallback=keep_raw_chunk,
+    )
+    for i, summary in zip(todo, results):
+        summaries[i] = summary
+    if todo:
+        stats.print_summary()
+
+    if todo and stats.failures == len(todo) == len(chunks):
         print("⚠️ Chunk summarization failed, falling back to original text.")
-        return text
+        return "\n\n".join(c["text"] for c in chunks)
 
-    if len(summaries) != len(chunks):
+    if stats.failures:
         print(
-            f\"⚠️ Only {len(summaries)}/{len(chunks)} chunks were summarized successfully; "
-            "using raw text for failed chunks.\"
+            f"⚠️ Only {len(chunks) - stats.failures}/{len(chunks)} chunks were summarized successfully; "
+            "using raw text for failed chunks."
+        )
+
+    def merge_summaries(group_text: str, level: int) -> str:
+        merge_prompt = f"""
+You are an expert at summarizing customer reviews for downstream analytics.
+
+The following are summaries of consecutive batches of reviews for the same product.
+Merge them into one concise paragraph that keeps:
+- Key opinions and how common they are
+- Visual descriptions of the product
+- Any notable pros/cons
+
+Summaries:
+{group_text}
+"""
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You create concise, information-dense summaries of customer reviews.",
+                },
+                {"role": "user", "content": merge_prompt},
+            ],
+            temperature=0.3,
         )
+        return response.choices[0].message.content.strip()
+
+    if sum(estimate_tokens(s) for s in summaries) > target_tokens:
+        print(f"\n🌳 Reducing {len(summaries)} chunk summaries to ~{target_tokens:,} tokens...")
+    condensed, levels = reduce_to_budget(
+        summaries,
+        merge_summaries,
+        target_tokens=target_tokens,
+        group_tokens=max(2 * target_tokens, 4000),
+        max_workers=max_workers,
+        limiter=limiter,
+        store=store,
+        key_prefix=model,
+    )
+    store.save(prune=True)
+    print_levels(levels)
 
-    return "\n\n".join(summaries)
+    return condensed
 
 
 def load_collected_data() -> tuple:
@@ -565,29 +751,52 @@ with open(f"{OUTPUT_DIR}/product_description.json", "w", encoding="utf-8") as f:
 # Scraping Settings
 USE_SELENIUM_SCRAPING = True   # Set False to skip scraping and use existing data
 MAX_PAGES = 5                  # Number of pages to scrape (~10 reviews/page)
-HEADLESS_MODE = False          # Must be False for manual login
-DELAY_BETWEEN_PAGES = 4.0      # Delay between pages (seconds)
-LOGIN_TIMEOUT = 60             # Seconds to wait for manual login
+HEADLESS_MODE = False          # True only works once a saved session exists
+DELAY_BETWEEN_PAGES = 4.0      # Starting delay between pages (seconds); adapts to how Amazon responds
+LOGIN_TIMEOUT = 60             # Max seconds to wait for manual login (skipped if saved session is valid)
+SESSION_PATH = ".sessions/amazon_cookies.json"  # Saved login cookies (do not commit)
+DRIVER_POOL_SIZE = 1           # Warm browsers kept alive between scrapes
+BLOCK_RESOURCES = True         # Don't load images/media/fonts/third-party scripts in the browser
+MEASURE_PAGE_TRAFFIC = False   # Log network events and print the KB each browser-loaded page downloads
+BROWSER_TABS = 1               # >1: load the next pages in extra tabs while one is extracted (max 4)
+INCREMENTAL_SCRAPING = True    # Only fetch reviews newer than the ones already saved, then merge
+# Reviews are streamed page by page to customer_reviews.jsonl (+ .checkpoint); an interrupted
+# run resumes from the last finished page when this cell is rerun.
 
 if USE_SELENIUM_SCRAPING:
     print("\n🚀 Starting Selenium review scraping...")
-    print(f"   Browser will open. You have {LOGIN_TIMEOUT}s to login.")
+    print(f"   Browser will open. If the saved session expired, you have {LOGIN_TIMEOUT}s to login.")
     
     try:
-        collected_reviews = collect_amazon_reviews(
+        reviews_path = f"{OUTPUT_DIR}/customer_reviews.json"
+        stream = ReviewStream(f"{OUTPUT_DIR}/customer_reviews.jsonl", PRODUCT_ASIN)
+        stored_reviews = load_reviews(reviews_path) if INCREMENTAL_SCRAPING else []
+        
+        collect_amazon_reviews(
             asin=PRODUCT_ASIN,
             max_pages=MAX_PAGES,
             headless=HEADLESS_MODE,
             delay=DELAY_BETWEEN_PAGES,
-            login_timeout=LOGIN_TIMEOUT
+            login_timeout=LOGIN_TIMEOUT,
+            session_store=SessionStore(SESSION_PATH),
+            pool=get_driver_pool(headless=HEADLESS_MODE, size=DRIVER_POOL_SIZE, block_resources=BLOCK_RESOURCES,
+                                 measure_traffic=MEASURE_PAGE_TRAFFIC),
+            known_ids=known_review_ids(stored_reviews) if INCREMENTAL_SCRAPING else None,
+            stream=stream,
+            tabs=BROWSER_TABS,
+            report_path=f"{OUTPUT_DIR}/scrape_report.json"
         )
         
-        if collected_reviews:
-            print(f"\n💾 Saving {len(collected_reviews)} reviews...")
-            with open(f"{OUTPUT_DIR}/customer_reviews.json", "w", encoding="utf-8") as f:
-                json.dump(collected_reviews, f, indent=2, ensure_ascii=False)
-            print(f"✅ Saved to: {OUTPUT_DIR}/customer_reviews.json")
+        if not stream.complete:
+            print(f"\n⚠️  Scrape interrupted after page {stream.last_page}. Rerun this cell to resume; "
+                  "existing data is used until then.")
+        elif stream.reviews_written:
+            # Compaction: JSONL log -> customer_reviews.json for the analysis steps
+            print(f"\n💾 Compacting {stream.reviews_written} streamed reviews...")
+            total, added = stream.compact(reviews_path, merge=INCREMENTAL_SCRAPING)
+            print(f"✅ Saved {total} reviews ({added} new) to: {reviews_path}")
         else:
+            stream.clear()
             print("\n⚠️  No reviews collected. Will use existing data if available.")
             
     except Exception as e:
@@ -609,17 +818,25 @@ if len(customer_reviews) <= 2:
 else:
     print(f"✅ Loaded {len(customer_reviews)} reviews")
 
+# Collapse repeated and near-duplicate reviews; each kept review carries its "multiplicity",
+# which the local sentiment and topic figures weight by, so they still describe every review
+if DEDUP_REVIEWS:
+    unique_reviews, dedup_report = dedup_reviews(customer_reviews, render=format_review, threshold=DEDUP_THRESHOLD,
+                                                 product=product_description.get("title") or PRODUCT_ASIN)
+    print_report(dedup_report, prefix="   🧹 ")
+    with open(f"{OUTPUT_DIR}/dedup_report.json", "w", encoding="utf-8") as f:
+        json.dump({k: v for k, v in dedup_report.items() if k != "multiplicity"}, f, indent=2, ensure_ascii=False)
+else:
+    unique_reviews = customer_reviews
+
 # Prepare review text for analysis
-all_review_text = "\n\n".join([
-    f"Rating: {r.get('rating', 'N/A')}/5\nTitle: {r.get('review_title', '')}\n{r.get('review_body', '')}"
-    for r in customer_reviews
-])
+all_review_text = "\n\n".join(format_review(r) for r in unique_reviews)
 
-print(f"   Total text: {len(all_review_text)} characters")
+print(f"   Total text: {len(all_review_text)} characters (~{count_tokens(all_review_text):,} tokens)")
 
 # Create a condensed, chunk-aware summary of all reviews for downstream prompts
 print("\n🧩 Creating condensed review summary using chunking...")
-condensed_review_text = summarize_text_in_chunks(all_review_text)
+condensed_review_text = summarize_reviews_in_chunks(unique_reviews)
 print(f"   Condensed text length: {len(condensed_review_text)} characters")
 
 #%%
@@ -627,9 +844,11 @@ print(f"   Condensed text length: {len(condensed_review_text)} characters")
 # Q2-2: Extract Visual Features using LLM
 # ============================================================================
 
-print("\n🎨 Extracting visual features...")
+def extract_visual_features(condensed_review_text: str) -> Dict:
+    """Q2-2: Colors, materials, shape and other visual details mentioned in the reviews."""
+    print("\n🎨 Extracting visual features...")
 
-visual_prompt = f"""
+    visual_prompt = f"""
 Analyze the following customer reviews and extract ALL visual information about the product.
 
 Product: Zyllion Shiatsu Back and Neck Massager with Heat (Model: ZMA-13)
@@ -657,7 +876,6 @@ Format as JSON:
 }}
 """
 
-try:
     response = client.chat.completions.create(
         model="gpt-5.1",
         messages=[
@@ -667,29 +885,29 @@ try:
         temperature=0.3,
         response_format={"type": "json_object"}
     )
-    
+
     visual_features = json.loads(response.choices[0].message.content)
     print(f"✅ Visual features extracted!")
     print(f"   Colors: {visual_features.get('colors', [])}")
     print(f"   Materials: {visual_features.get('materials', [])}")
-    
+
     with open(f"{OUTPUT_DIR}/visual_features.json", "w", encoding="utf-8") as f:
         json.dump(visual_features, f, indent=2, ensure_ascii=False)
-        
-except Exception as e:
-    print(f"❌ Error: {e}")
-    visual_features = {}
+
+    return visual_features
 
 #%%
 # ============================================================================
 # Q2-3: Extract Product Features using LLM
 # ============================================================================
 
-print("\n🔍 Extracting product features...")
+def extract_product_features(product_description: Dict, condensed_review_text: str) -> Dict:
+    """Q2-3: Functional, design and material features from the description and reviews."""
+    print("\n🔍 Extracting product features...")
 
-features_text = "\n".join([f"- {f}" for f in product_description.get('features', [])])
+    features_text = "\n".join([f"- {f}" for f in product_description.get('features', [])])
 
-features_prompt = f"""
+    features_prompt = f"""
 Analyze the product description and customer reviews to extract key product features.
 
 PRODUCT DESCRIPTION:
@@ -720,7 +938,6 @@ Format as JSON:
 }}
 """
 
-try:
     response = client.chat.completions.create(
         model="gpt-5.1",
         messages=[
@@ -730,139 +947,115 @@ try:
         temperature=0.3,
         response_format={"type": "json_object"}
     )
-    
+
     product_features = json.loads(response.choices[0].message.content)
     print("✅ Product features extracted!")
-    
+
     with open(f"{OUTPUT_DIR}/product_features.json", "w", encoding="utf-8") as f:
         json.dump(product_features, f, indent=2, ensure_ascii=False)
-        
-except Exception as e:
-    print(f"❌ Error: {e}")
-    product_features = {}
+
+    return product_features
 
 #%%
 # ============================================================================
-# Q2-4: Sentiment Analysis using LLM
+# Q2-4: Sentiment Analysis (local scores, LLM-named themes)
 # ============================================================================
 
-print("\n😊 Analyzing sentiment...")
-
-reviews_summary = "\n\n".join([
-    f"Review {i+1} (Rating: {r.get('rating', 'N/A')}/5):\n{r.get('review_body', '')}"
-    for i, r in enumerate(customer_reviews[:20])
-])
+SENTIMENT_THEME_SECTIONS = [
+    Section("positive_themes", "Common positive themes in the POSITIVE REVIEWS (short phrases).", array(string())),
+    Section("negative_themes", "Common negative themes in the NEGATIVE REVIEWS (short phrases); empty if there are none.",
+            array(string())),
+    Section("visual_sentiment", "How reviewers feel about the product's looks, from the REVIEWS MENTIONING APPEARANCE "
+            "(one or two sentences).", string()),
+]
 
-sentiment_prompt = f"""
-Analyze the sentiment of these customer reviews for a massager product.
+sentiment_theme_analyzer = MultiTaskAnalyzer(
+    client, SENTIMENT_THEME_SECTIONS, model="gpt-5.1",
+    system="You are an expert at sentiment analysis. Always respond with valid JSON.",
+    temperature=0.3,
+)
 
-{reviews_summary}
 
-Provide:
-1. Overall sentiment distribution (positive/neutral/negative percentages)
-2. Common positive themes
-3. Common negative themes
-4. Sentiment towards visual aspects
-5. Overall satisfaction score (1-10)
-
-Format as JSON:
-{{
-    "overall_sentiment": {{
-        "positive": percentage,
-        "neutral": percentage,
-        "negative": percentage
-    }},
-    "positive_themes": ["theme1", "theme2"],
-    "negative_themes": ["theme1", "theme2"],
-    "visual_sentiment": "description",
-    "satisfaction_score": number
-}}
-"""
-
-try:
-    response = client.chat.completions.create(
-        model="gpt-5.1",
-        messages=[
-            {"role": "system", "content": "You are an expert at sentiment analysis. Always respond with valid JSON."},
-            {"role": "user", "content": sentiment_prompt}
-        ],
-        temperature=0.3,
-        response_format={"type": "json_object"}
-    )
-    
-    sentiment_analysis = json.loads(response.choices[0].message.content)
+def analyze_sentiment(customer_reviews: List[Dict]) -> Dict:
+    """
+    Q2-4: Sentiment distribution and satisfaction score computed locally over every review;
+    the LLM only names the themes of a few pre-selected positive, negative and visual reviews.
+    """
+    print("\n😊 Analyzing sentiment...")
+
+    scores = score_reviews(customer_reviews)
+    stats = sentiment_stats(scores)
+    print(f"   Scored {stats['reviews_scored']} reviews locally: {stats['counts']}")
+
+    def sample_block(title: str, samples: List[str]) -> str:
+        body = "\n".join(f"- {s}" for s in samples) if samples else "(none)"
+        return f"{title}:\n{body}"
+
+    context = "\n\n".join([
+        "Customer reviews of a massager product.",
+        sample_block("POSITIVE REVIEWS", pick_samples(customer_reviews, scores, "positive", k=SENTIMENT_SAMPLES)),
+        # Without negative reviews, the least positive neutral ones still carry the complaints
+        sample_block("NEGATIVE REVIEWS", pick_samples(customer_reviews, scores, "negative", k=SENTIMENT_SAMPLES)
+                     or pick_samples(customer_reviews, scores, "neutral", k=SENTIMENT_SAMPLES)),
+        sample_block("REVIEWS MENTIONING APPEARANCE", pick_samples(customer_reviews, scores, None, k=SENTIMENT_SAMPLES,
+                                                                  must_mention=VISUAL_TERMS)),
+    ])
+    themes = sentiment_theme_analyzer.analyze(context)
+
+    sentiment_analysis = {
+        "overall_sentiment": stats["overall_sentiment"],
+        "helpful_weighted_sentiment": stats["helpful_weighted_sentiment"],
+        "positive_themes": themes["positive_themes"] or [],
+        "negative_themes": themes["negative_themes"] or [],
+        "visual_sentiment": themes["visual_sentiment"] or "",
+        "satisfaction_score": stats["satisfaction_score"],
+        "average_rating": stats["average_rating"],
+        "reviews_scored": stats["reviews_scored"],
+    }
     print(f"✅ Sentiment analysis completed!")
+    print(f"   Distribution: {sentiment_analysis['overall_sentiment']}")
     print(f"   Satisfaction Score: {sentiment_analysis.get('satisfaction_score', 'N/A')}/10")
-    
+
     with open(f"{OUTPUT_DIR}/sentiment_analysis.json", "w", encoding="utf-8") as f:
         json.dump(sentiment_analysis, f, indent=2, ensure_ascii=False)
-        
-except Exception as e:
-    print(f"❌ Error: {e}")
-    sentiment_analysis = {}
+
+    return sentiment_analysis
 
 #%%
 # ============================================================================
-# Q2-5: Topic Extraction using LLM
+# Q2-5: Topic Extraction (local clustering, LLM-named topics)
 # ============================================================================
 
-print("\n📚 Extracting topics...")
-
-topics_prompt = f"""
-Analyze these customer reviews and extract main discussion topics.
-
-{condensed_review_text}
-
-Identify 5-10 main topics with:
-- Topic name
-- Brief description
-- Key keywords
-- Relevance to visual appearance (High/Medium/Low)
+def extract_topics(customer_reviews: List[Dict], product_description: Dict) -> List[Dict]:
+    """
+    Q2-5: Main discussion topics with keywords and visual relevance. Every review is clustered
+    locally (TF-IDF + NMF); the LLM only names the clusters from their keywords and examples.
+    """
+    print("\n📚 Extracting topics...")
 
-Format as JSON:
-{{
-    "topics": [
-        {{
-            "topic_name": "name",
-            "description": "description",
-            "keywords": ["keyword1", "keyword2"],
-            "visual_relevance": "High/Medium/Low"
-        }}
-    ]
-}}
-"""
+    clusters = fit_topics([review_text(r) for r in customer_reviews], n_topics=TOPIC_COUNT,
+                          counts=[r.get("multiplicity", 1) for r in customer_reviews])
+    print(f"   Clustered {len(customer_reviews)} distinct reviews into {len(clusters)} topics locally")
+    print_clusters(clusters)
+    topics = name_topics(client, clusters, model="gpt-5.1", product=product_description.get('title', ''))
 
-try:
-    response = client.chat.completions.create(
-        model="gpt-5.1",
-        messages=[
-            {"role": "system", "content": "You are an expert at topic extraction. Always respond with valid JSON."},
-            {"role": "user", "content": topics_prompt}
-        ],
-        temperature=0.5,
-        response_format={"type": "json_object"}
-    )
-    
-    response_content = json.loads(response.choices[0].message.content)
-    topics = response_content.get('topics', []) if isinstance(response_content, dict) else response_content
-    
     print(f"✅ Extracted {len(topics)} topics")
-    
+
     with open(f"{OUTPUT_DIR}/extracted_topics.json", "w", encoding="utf-8") as f:
         json.dump({"topics": topics}, f, indent=2, ensure_ascii=False)
-        
-except Exception as e:
-    print(f"❌ Error: {e}")
-    topics = []
+
+    return topics
 
 #%%
 # ============================================================================
 # Q2-6: Create Image Generation Summary
 # ============================================================================
 
-print("\n🎨 Creating image generation summary...")
+def create_image_generation_summary(product_description: Dict, visual_features: Dict, product_features: Dict) -> Dict:
+    """Q2-6: Visual description and image prompt built from the Q2-2/Q2-3 outputs."""
+    print("\n🎨 Creating image generation summary...")
 
-summary_prompt = f"""
+    summary_prompt = f"""
 Based on the following extracted information, create a comprehensive visual description for image generation.
 
 PRODUCT DESCRIPTION:
@@ -889,7 +1082,6 @@ Output format:
 }}
 """
 
-try:
     response = client.chat.completions.create(
         model="gpt-5.1",
         messages=[
@@ -899,19 +1091,142 @@ try:
         temperature=0.4,
         response_format={"type": "json_object"}
     )
-    
+
     image_generation_summary = json.loads(response.choices[0].message.content)
-    
+
     print("✅ Image generation summary created!")
     print(f"\n📝 Recommended Prompt:")
     print(f"   {image_generation_summary.get('recommended_prompt_for_image_generation', 'N/A')[:150]}...")
-    
+
     with open(f"{OUTPUT_DIR}/image_generation_summary.json", "w", encoding="utf-8") as f:
         json.dump(image_generation_summary, f, indent=2, ensure_ascii=False)
-        
-except Exception as e:
-    print(f"❌ Error: {e}")
-    image_generation_summary = {}
+
+    return image_generation_summary
+
+#%%
+# ============================================================================
+# Q2-2 and Q2-3 in one call
+# ============================================================================
+# Both analyses read the same condensed reviews, so one schema-constrained call
+# returns both and the reviews are sent once. Sections that fail validation are
+# asked for again on their own; the JSON files are the same as the per-task functions write.
+
+_strings = array(string())
+
+REVIEW_ANALYSIS_SECTIONS = [
+    Section("visual_features",
+            "ALL visual information about the product mentioned in the reviews: colors, materials, "
+            "size/dimensions, shape/design elements, textures, visual features (buttons, straps, etc.) "
+            "and a summary of the overall appearance.",
+            obj({"colors": _strings, "materials": _strings, "size_dimensions": _strings,
+                 "shape_design": _strings, "textures": _strings, "visual_features": _strings,
+                 "overall_appearance": string()})),
+    Section("product_features",
+            "Key product features from the description and the reviews: functional features (what it does), "
+            "design features, material features, size/portability, usage context (where/how used) "
+            "and key selling points.",
+            obj({"functional_features": _strings, "design_features": _strings, "material_features": _strings,
+                 "size_portability": string(), "usage_context": _strings, "key_selling_points": _strings})),
+]
+
+review_analyzer = MultiTaskAnalyzer(
+    client, REVIEW_ANALYSIS_SECTIONS, model="gpt-5.1",
+    system="You are an expert at analyzing products and their customer reviews. Always respond with valid JSON.",
+    temperature=0.3,
+)
+
+
+def review_analysis_context(product_description: Dict, condensed_review_text: str) -> str:
+    features_text = "\n".join([f"- {f}" for f in product_description.get('features', [])])
+    return f"""PRODUCT DESCRIPTION:
+Title: {product_description.get('title', 'N/A')}
+
+Key Features:
+{features_text}
+
+CUSTOMER REVIEWS:
+{condensed_review_text}"""
+
+
+def analyze_reviews_combined(product_description: Dict, condensed_review_text: str) -> Dict:
+    """Q2-2 and Q2-3 from one LLM call; returns both results by section name."""
+    print("\n🧩 Extracting visual features and product features in one call...")
+
+    results = review_analyzer.analyze(review_analysis_context(product_description, condensed_review_text))
+    report = review_analyzer.last_report
+    if len(report["failed"]) == len(REVIEW_ANALYSIS_SECTIONS):
+        raise ValueError("no section of the combined analysis passed validation")
+
+    visual_features = results["visual_features"] or {}
+    product_features = results["product_features"] or {}
+    for data, filename in [(visual_features, "visual_features.json"), (product_features, "product_features.json")]:
+        with open(f"{OUTPUT_DIR}/{filename}", "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+    print(f"✅ Combined analysis done: {len(report['calls'])} call(s), "
+          f"{report['input_tokens']:,} input tokens, {report['seconds']:.1f}s")
+    if report["repaired"]:
+        print(f"   🔁 Re-asked for: {', '.join(report['repaired'])}")
+    if report["failed"]:
+        print(f"   ⚠️ Still invalid (left empty): {', '.join(report['failed'])}")
+    print(f"   Colors: {visual_features.get('colors', [])}")
+    print(f"   Materials: {visual_features.get('materials', [])}")
+
+    return {"visual_features": visual_features, "product_features": product_features}
+
+#%%
+# ============================================================================
+# Q2-2 to Q2-6: Run the analysis stages
+# ============================================================================
+# Q2-2..Q2-5 only need the reviews, so they run concurrently; Q2-6 starts as soon as
+# Q2-2 and Q2-3 are done. A failed stage is retried, then falls back to an empty result.
+# With COMBINED_ANALYSIS, Q2-2 and Q2-3 come from the single review_analysis stage.
+
+print("\n🚀 Running analysis stages...")
+
+analysis_graph = StageGraph(max_workers=ANALYSIS_MAX_WORKERS)
+if COMBINED_ANALYSIS:
+    analysis_graph.add("review_analysis", analyze_reviews_combined, ["product_description", "condensed_review_text"],
+                       retries=ANALYSIS_RETRIES, default={})
+    analysis_graph.add("visual_features", lambda review_analysis: review_analysis.get("visual_features", {}),
+                       ["review_analysis"])
+    analysis_graph.add("product_features", lambda review_analysis: review_analysis.get("product_features", {}),
+                       ["review_analysis"])
+else:
+    analysis_graph.add("visual_features", extract_visual_features, ["condensed_review_text"],
+                       retries=ANALYSIS_RETRIES, default={})
+    analysis_graph.add("product_features", extract_product_features, ["product_description", "condensed_review_text"],
+                       retries=ANALYSIS_RETRIES, default={})
+analysis_graph.add("sentiment_analysis", analyze_sentiment, ["customer_reviews"],
+                   retries=ANALYSIS_RETRIES, default={})
+analysis_graph.add("topics", extract_topics, ["customer_reviews", "product_description"],
+                   retries=ANALYSIS_RETRIES, default=[])
+analysis_graph.add("image_generation_summary", create_image_generation_summary,
+                   ["product_description", "visual_features", "product_features"],
+                   retries=ANALYSIS_RETRIES, default={})
+
+analysis_results = analysis_graph.run({
+    "product_description": product_description,
+    "customer_reviews": unique_reviews,  # Deduplicated; sentiment and topics weight by multiplicity
+    "condensed_review_text": condensed_review_text,
+})
+visual_features = analysis_results["visual_features"]
+product_features = analysis_results["product_features"]
+sentiment_analysis = analysis_results["sentiment_analysis"]
+topics = analysis_results["topics"]
+image_generation_summary = analysis_results["image_generation_summary"]
+
+print()
+analysis_graph.print_timeline()
+with open(f"{OUTPUT_DIR}/analysis_timings.json", "w", encoding="utf-8") as f:
+    json.dump(analysis_graph.report(), f, indent=2)
+
+if COMPARE_ANALYSIS_PATHS:
+    print("\n⚖️ Comparing the combined call with one call per section...")
+    analysis_comparison = review_analyzer.compare(review_analysis_context(product_description, condensed_review_text))
+    print_comparison(analysis_comparison)
+    with open(f"{OUTPUT_DIR}/analysis_comparison.json", "w", encoding="utf-8") as f:
+        json.dump(analysis_comparison, f, indent=2)
 
 #%%
 # ============================================================================
@@ -922,11 +1237,12 @@ print("\n" + "="*60)
 print("🎉 Q1 AND Q2 COMPLETE!")
 print("="*60)
 print(f"✅ Product Description: Collected")
-print(f"✅ Customer Reviews: {len(customer_reviews)} reviews")
+print(f"✅ Customer Reviews: {len(customer_reviews)} reviews ({len(unique_reviews)} after deduplication)")
 print(f"✅ Visual Features: Extracted")
 print(f"✅ Product Features: Extracted")
 print(f"✅ Sentiment Analysis: Completed")
 print(f"✅ Topic Extraction: Completed")
 print(f"✅ Image Generation Summary: Created")
+print(f"🗄️ LLM Cache: {client.cache.summary()}")
 print(f"\n📁 All outputs saved in: {OUTPUT_DIR}/")
 print("="*60)
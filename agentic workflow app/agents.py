@@ -2,6 +2,10 @@ import json
 import os
 from openai import OpenAI
 import scraper
+from review_dedup import dedup_reviews
+from review_selector import select_reviews
+
+REVIEW_TOKEN_BUDGET = 3500  # Review tokens handed to the analyst (about the former 15,000-character cut)
 
 class Agent:
     def __init__(self, name, client):
@@ -25,14 +29,7 @@ class ResearcherAgent(Agent):
                 return {"status": "error", "message": "Scraping failed or no reviews found."}
             
             # Save the fresh data to a cache folder for future use
-            save_path = f"data/{asin}"
-            os.makedirs(save_path, exist_ok=True)
-            
-            with open(f"{save_path}/product_description.json", 'w', encoding='utf-8') as f:
-                json.dump({"title": scraped_data['title'], "features": scraped_data['features']}, f, indent=2)
-            
-            with open(f"{save_path}/customer_reviews.json", 'w', encoding='utf-8') as f:
-                json.dump(scraped_data['reviews'], f, indent=2)
+            scraper.save_scraped_data(asin, scraped_data)
                 
             return self._format_corpus(scraped_data['title'], scraped_data['features'], scraped_data['reviews'])
 
@@ -51,11 +48,26 @@ class ResearcherAgent(Agent):
                 return {"status": "error", "message": f"Data files not found in {base_path}"}
 
     def _format_corpus(self, title, features, reviews):
-        """Helper to format the raw data into a text block for the LLM."""
+        """
+        Helper to format the raw data into a text block for the LLM. Near-duplicate reviews are
+        collapsed into one line marked with how often it was posted; of the rest, only the reviews
+        that fit REVIEW_TOKEN_BUDGET are kept, picked for visual detail and variety rather than position.
+        """
+        def line(review):
+            count = review.get('multiplicity', 1)
+            posted = f"(posted {count}x) " if count > 1 else ""
+            return f"- {posted}{review.get('body', '')}"
+
+        unique, dedup = dedup_reviews(reviews, text=lambda r: r.get('body', ''), render=line, product=title)
+        print(f"[{self.name}]: {dedup['reviews']} reviews -> {dedup['unique']} unique, "
+              f"{dedup['tokens_saved']:,} review tokens saved")
+        lines = [line(r) for r in unique]
+        selected = select_reviews(lines, token_budget=REVIEW_TOKEN_BUDGET, extra_terms=[title])
         raw_text = f"PRODUCT TITLE: {title}\n"
         raw_text += f"KEY FEATURES: {json.dumps(features, indent=2)}\n"
-        raw_text += "CUSTOMER REVIEWS:\n" + "\n".join([f"- {r.get('body', '')}" for r in reviews])
-        return {"raw_text": raw_text, "status": "success", "count": len(reviews)}
+        raw_text += "CUSTOMER REVIEWS:\n" + "\n".join([lines[i] for i in selected])
+        return {"raw_text": raw_text, "status": "success", "count": len(reviews), "unique": len(unique),
+                "tokens_saved": dedup["tokens_saved"], "selected": len(selected)}
 
 class AnalystAgent(Agent):
     """
@@ -66,7 +78,7 @@ class AnalystAgent(Agent):
         You are a Senior Product Analyst. Analyze the following product data.
         
         Data:
-        {raw_text[:15000]}
+        {raw_text}
         
         Your Goal: Extract structured data for an image generation model.
         
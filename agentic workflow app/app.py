@@ -2,6 +2,7 @@ import streamlit as st
 import os
 from dotenv import load_dotenv
 from openai import OpenAI
+from llm_cache import CachedOpenAI
 # Import the new VisualizerAgent
 from agents import ResearcherAgent, AnalystAgent, CreativeAgent, VisualizerAgent
 
@@ -13,10 +14,16 @@ if not os.getenv("OPENAI_API"):
     st.error("Error: OPENAI_API key not found in .evn file")
     st.stop()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API"))
+@st.cache_resource
+def get_client(api_key):
+    """One cached client per process: Streamlit reruns keep the same cache stats and SQLite connection."""
+    return CachedOpenAI(OpenAI(api_key=api_key))
+
+client = get_client(os.getenv("OPENAI_API"))
 
 # 2. Sidebar Controls
 st.sidebar.title("🎛️ Agent Controls")
+client.cache.bypass = st.sidebar.checkbox("Refresh LLM answers (skip cache)", value=client.cache.bypass)
 mode = st.sidebar.radio("Input Source", ["📂 Load Existing Data", "🌐 Live Web Scraping"])
 
 target_input = ""
@@ -51,7 +58,9 @@ if st.button("🚀 Start Full Pipeline", type="primary"):
             st.error(result['message'])
             st.stop()
             
-        st.success(f"Data Acquisition Complete. Analyzed {result['count']} reviews.")
+        st.success(f"Data Acquisition Complete. Analyzed {result['count']} reviews "
+                   f"({result['unique']} after merging duplicates, {result['tokens_saved']:,} tokens saved; "
+                   f"{result['selected']} most informative sent to the analyst).")
         with st.expander("Inspect Raw Data"):
             st.text(result['raw_text'][:800] + "...")
 
@@ -95,4 +104,6 @@ if st.button("🚀 Start Full Pipeline", type="primary"):
             # Display the image centrally with a caption
             st.image(image_result['url'], caption="AI Reconstructed Product Prototype", use_column_width=True)
         else:
-            st.error(f"Image Generation Failed: {image_result['message']}")
\ No newline at end of file
+            st.error(f"Image Generation Failed: {image_result['message']}")
+
+    st.sidebar.caption(f"LLM cache: {client.cache.summary()}")
\ No newline at end of file
@@ -0,0 +1,150 @@
+import argparse
+import multiprocessing
+import os
+import time
+from typing import Dict, List, Optional
+
+import scraper
+from driver_pool import DriverPool
+from http_fetch import FetchEngine, pooled_browser_fetch
+from review_store import load_reviews, merge_reviews
+from session_store import SessionStore, DEFAULT_SESSION_PATH
+from waits import PolitenessController, TokenBucket
+
+# Per-process state, created once by _init_worker in each worker process
+_worker: Dict = {}
+
+
+def _init_worker(rate_limiter: TokenBucket, session_path: str, review_limit: int, base_dir: str,
+                 incremental: bool) -> None:
+    """Gives each worker process its own headless driver pool and HTTP session, sharing the global rate limiter."""
+    store = SessionStore(session_path)
+    # Headless Chrome is only started if a page actually has to be escalated to the browser
+    pool = DriverPool(lambda: scraper.setup_driver(headless=True), size=1, max_age=scraper.DRIVER_MAX_AGE,
+                      name=f"DriverPool[{multiprocessing.current_process().name}]")
+    engine = FetchEngine(
+        browser_fetch=pooled_browser_fetch(pool, store, interactive=False),
+        politeness=PolitenessController(base_delay=2.0, min_delay=0.5),
+        session_store=store,
+        rate_limiter=rate_limiter,
+    )
+    _worker.update(store=store, pool=pool, engine=engine, review_limit=review_limit, base_dir=base_dir,
+                   incremental=incremental)
+
+
+def _snapshot_path(base_dir: str, asin: str) -> str:
+    return os.path.join(base_dir, asin, "customer_reviews.json")
+
+
+def _scrape_one(asin: str) -> Dict:
+    """
+    Runs in a worker: scrapes one ASIN and reports how many pages it fetched. ASINs with a stored
+    snapshot are scraped incrementally (newest reviews until a stored one shows up).
+    """
+    engine = _worker["engine"]
+    fetches_before = engine.fetch_count
+    start = time.time()
+    previous = load_reviews(_snapshot_path(_worker["base_dir"], asin)) if _worker["incremental"] else []
+    try:
+        data = scraper.run_scraper(asin, review_limit=_worker["review_limit"], session_store=_worker["store"],
+                                   pool=_worker["pool"], fetch_engine=engine, known_reviews=previous or None)
+        if not data:
+            error = "no data"
+        elif previous:
+            error = None if data["recent_pages"] else "reviews page did not load"
+        else:
+            error = None if data["reviews"] else "no reviews"
+    except Exception as e:
+        data, error = None, str(e)
+    return {
+        "asin": asin,
+        "data": data if error is None else None,
+        "error": error,
+        "pages": engine.fetch_count - fetches_before,  # Every request, retries and failures included
+        "seconds": time.time() - start,
+    }
+
+
+def scrape_many(asins: List[str], workers: int = 4, requests_per_minute: float = 30,
+                retries: int = 2, review_limit: int = 10, base_dir: str = "data",
+                session_path: str = DEFAULT_SESSION_PATH, incremental: bool = True) -> Dict:
+    """
+    Scrapes a list of ASINs across `workers` processes and writes each result into
+    data/<ASIN>/product_description.json + customer_reviews.json. All workers share one
+    token-bucket limit of `requests_per_minute` against Amazon. Failed ASINs are retried
+    up to `retries` more times. With `incremental`, ASINs that already have a snapshot only
+    fetch the reviews posted since (sortBy=recent) and merge them in front of the stored ones.
+    Returns a throughput summary, with per-ASIN pages (fetch attempts), seconds, new reviews
+    (None for a first scrape, or a baseline crawl of a snapshot without review ids) and errors
+    under "results".
+    """
+    ctx = multiprocessing.get_context("spawn")
+    rate_limiter = TokenBucket(rate=requests_per_minute / 60.0, capacity=max(1, workers), ctx=ctx)
+
+    pending = list(dict.fromkeys(asins))
+    succeeded: List[str] = []
+    failures: Dict[str, Optional[str]] = {}
+    results: Dict[str, Dict] = {}
+    pages = 0
+    start = time.time()
+
+    with ctx.Pool(processes=max(1, min(workers, len(pending) or 1)), initializer=_init_worker,
+                  initargs=(rate_limiter, session_path, review_limit, base_dir, incremental)) as process_pool:
+        for attempt in range(retries + 1):
+            if not pending:
+                break
+            if attempt:
+                print(f"[Batch]: Retrying {len(pending)} failed ASINs (attempt {attempt + 1})...")
+            failed_this_round = []
+            for result in process_pool.imap_unordered(_scrape_one, pending):
+                pages += result["pages"]
+                asin_result = results.setdefault(result["asin"], {"pages": 0, "seconds": 0.0, "attempts": 0})
+                asin_result["pages"] += result["pages"]
+                asin_result["seconds"] += result["seconds"]
+                asin_result["attempts"] += 1
+                asin_result["error"] = result["error"]
+                if result["error"] is None:
+                    data = result["data"]
+                    if "recent_pages" in data:
+                        previous = load_reviews(_snapshot_path(base_dir, result["asin"]))
+                        data["reviews"], _ = merge_reviews(previous, data["reviews"])
+                    asin_result["reviews"] = len(data["reviews"])
+                    asin_result["new_reviews"] = data.get("new_reviews")
+                    asin_result["new_reviews_capped"] = data.get("new_reviews_capped", False)
+                    scraper.save_scraped_data(result["asin"], data, base_dir=base_dir)
+                    succeeded.append(result["asin"])
+                    failures.pop(result["asin"], None)
+                    print(f"[Batch]: {result['asin']} done in {result['seconds']:.1f}s ({result['pages']} pages)")
+                else:
+                    failed_this_round.append(result["asin"])
+                    failures[result["asin"]] = result["error"]
+                    print(f"[Batch]: {result['asin']} failed: {result['error']}")
+            pending = failed_this_round
+
+    minutes = max(time.time() - start, 1e-9) / 60.0
+    summary = {
+        "asins_requested": len(dict.fromkeys(asins)),
+        "succeeded": succeeded,
+        "failed": failures,
+        "pages_fetched": pages,
+        "elapsed_seconds": round(minutes * 60, 1),
+        "asins_per_minute": round(len(succeeded) / minutes, 2),
+        "pages_per_minute": round(pages / minutes, 2),
+        "results": results,
+    }
+    print(f"[Batch]: {len(succeeded)}/{summary['asins_requested']} ASINs in {summary['elapsed_seconds']}s — "
+          f"{summary['asins_per_minute']} ASINs/min, {summary['pages_per_minute']} pages/min")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape many ASINs in parallel into data/<ASIN>/.")
+    parser.add_argument("asins", nargs="+")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rpm", type=float, default=30, help="Global requests per minute across all workers")
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--review-limit", type=int, default=10)
+    parser.add_argument("--full", action="store_true", help="Rescrape the top reviews instead of only new ones")
+    args = parser.parse_args()
+    scrape_many(args.asins, workers=args.workers, requests_per_minute=args.rpm,
+                retries=args.retries, review_limit=args.review_limit, incremental=not args.full)
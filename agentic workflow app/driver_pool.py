@@ -0,0 +1,166 @@
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Hashable, List, Optional
+
+
+class _PooledDriver:
+    """Bookkeeping for one browser owned by the pool."""
+    def __init__(self, driver):
+        self.driver = driver
+        self.created_at = time.time()
+        self.uses = 0
+        self.state: Dict = {}  # Free-form per-driver state for callers (e.g. "logged_in")
+
+
+class DriverPool:
+    """
+    Keeps up to `size` WebDriver instances alive and hands them out with checkout/checkin,
+    so consecutive scrapes reuse a warm browser instead of paying Chrome start-up every time.
+    Drivers are health-checked on checkout and recycled once they exceed max_age or max_uses.
+    """
+    def __init__(self, factory: Callable, size: int = 1, max_age: float = 30 * 60,
+                 max_uses: int = 50, name: str = "DriverPool"):
+        self.factory = factory
+        self.size = max(1, size)
+        self.max_age = max_age
+        self.max_uses = max_uses
+        self.name = name
+
+        self._idle: List[_PooledDriver] = []
+        self._busy: Dict[int, _PooledDriver] = {}
+        self._lock = threading.Condition()
+        self._closed = False
+        self.stats = {"created": 0, "reused": 0, "recycled": 0, "unhealthy": 0}
+        atexit.register(self.close)
+
+    def _is_healthy(self, entry: _PooledDriver) -> bool:
+        try:
+            entry.driver.execute_script("return 1;")
+            return bool(entry.driver.window_handles)
+        except Exception:
+            return False
+
+    def _is_expired(self, entry: _PooledDriver) -> bool:
+        return (time.time() - entry.created_at > self.max_age) or entry.uses >= self.max_uses
+
+    def _quit(self, entry: _PooledDriver) -> None:
+        try:
+            entry.driver.quit()
+        except Exception:
+            pass
+
+    def _count(self, events: List[str]) -> None:
+        """Adds checkout events to stats; call with the lock held."""
+        for event in events:
+            self.stats[event] += 1
+
+    def _total(self) -> int:
+        return len(self._idle) + len(self._busy)
+
+    def checkout(self, timeout: Optional[float] = None):
+        """Borrows a driver, starting a new one if the pool is below size. Blocks while all are busy."""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise RuntimeError(f"{self.name} is closed")
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._total() < self.size:
+                    entry = None
+                    break
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"{self.name}: no driver available after {timeout}s")
+                self._lock.wait(remaining)
+            # Reserve the slot before releasing the lock so concurrent callers respect size
+            placeholder = object()
+            self._busy[id(placeholder)] = placeholder
+
+        # Health checks and Chrome startup run outside the lock; their counts are taken under it
+        events: List[str] = []
+        try:
+            if entry is not None:
+                if self._is_expired(entry):
+                    events.append("recycled")
+                    self._quit(entry)
+                    entry = None
+                elif not self._is_healthy(entry):
+                    events.append("unhealthy")
+                    self._quit(entry)
+                    entry = None
+                else:
+                    events.append("reused")
+            if entry is None:
+                entry = _PooledDriver(self.factory())
+                events.append("created")
+        except Exception:
+            with self._lock:
+                self._count(events)
+                self._busy.pop(id(placeholder), None)
+                self._lock.notify()
+            raise
+
+        entry.uses += 1
+        with self._lock:
+            self._count(events)
+            self._busy.pop(id(placeholder), None)
+            self._busy[id(entry.driver)] = entry
+        return entry.driver
+
+    def checkin(self, driver, discard: bool = False) -> None:
+        """Returns a borrowed driver. Pass discard=True if it is known to be broken."""
+        with self._lock:
+            entry = self._busy.pop(id(driver), None)
+            if entry is None:
+                return
+            if discard or self._closed:
+                self._quit(entry)
+            else:
+                self._idle.append(entry)
+            self._lock.notify()
+
+    def state(self, driver) -> Dict:
+        """Per-driver state dict that survives between checkouts of the same browser."""
+        with self._lock:
+            entry = self._busy.get(id(driver))
+        return entry.state if entry is not None else {}
+
+    @contextmanager
+    def driver(self, timeout: Optional[float] = None):
+        """Context-manager form of checkout/checkin; the driver is discarded if the block raises."""
+        driver = self.checkout(timeout=timeout)
+        failed = False
+        try:
+            yield driver
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.checkin(driver, discard=failed)
+
+    def close(self) -> None:
+        """Quits every idle driver; busy ones are quit when they are checked back in."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._lock.notify_all()
+        for entry in idle:
+            self._quit(entry)
+
+
+_shared_pools: Dict[Hashable, DriverPool] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_pool(key: Hashable, factory: Callable, **kwargs) -> DriverPool:
+    """Returns the process-wide pool registered under `key`, creating it on first use."""
+    with _shared_lock:
+        pool = _shared_pools.get(key)
+        if pool is None or pool._closed:
+            pool = DriverPool(factory, name=f"DriverPool[{key}]", **kwargs)
+            _shared_pools[key] = pool
+        return pool
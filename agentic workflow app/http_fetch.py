@@ -0,0 +1,259 @@
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from selenium.webdriver.common.by import By
+from tracing import HTTP, IDLE, NAVIGATE, WAIT
+from waits import PolitenessController, wait_for_element, wait_for_reviews
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+}
+
+# Markers that must be present in the raw HTML for a page to be usable without a browser
+PRODUCT_MARKER = 'id="productTitle"'
+REVIEW_MARKER = 'data-hook="review"'
+
+# Fetch tiers: HTTP is the tracing phase label, so both modules report the HTTP tier the same way
+BROWSER = "browser"
+
+# Reasons that mean Amazon is pushing back (as opposed to a JS-only page), so pacing should back off
+BLOCK_REASONS = ("signin", "captcha", "status 403", "status 429", "status 503")
+
+
+def detect_block(response: requests.Response, expect: Optional[str] = None) -> Optional[str]:
+    """Returns why a plain HTTP response is unusable (block, login wall, JS-only page), or None if it is fine."""
+    if response.status_code >= 400:
+        return f"status {response.status_code}"
+    if "/ap/signin" in response.url:
+        return "signin"
+    text = response.text
+    if "validateCaptcha" in text or "Type the characters you see" in text:
+        return "captcha"
+    if expect and expect not in text:
+        return "missing content"
+    return None
+
+
+class FetchResult:
+    """One fetched page and which tier served it."""
+    def __init__(self, url: str, html: Optional[str], tier: Optional[str], elapsed: float,
+                 reason: Optional[str] = None):
+        self.url = url
+        self.html = html
+        self.tier = tier
+        self.elapsed = elapsed
+        self.reason = reason  # Why the HTTP tier was not enough, if it wasn't
+
+    @property
+    def ok(self) -> bool:
+        return self.html is not None
+
+
+class FetchEngine:
+    """
+    Two-tier page fetcher. Tier 1 is a pooled keep-alive requests.Session; a URL is escalated
+    to tier 2 (browser_fetch, typically a pooled Selenium driver) only when the HTTP response
+    looks blocked or is missing the expected content. Records which tier served each page, and
+    counts every fetch attempt per tier (fetches), including repeats and failures.
+    """
+    def __init__(self, browser_fetch: Optional[Callable[[str, Optional[str]], str]] = None,
+                 headers: Optional[Dict] = None, timeout: float = 10, pool_size: int = 10,
+                 politeness: Optional[PolitenessController] = None, session_store=None,
+                 rate_limiter=None):
+        self.browser_fetch = browser_fetch
+        self.rate_limiter = rate_limiter  # e.g. a waits.TokenBucket shared across processes
+        self.timeout = timeout
+        self.politeness = politeness
+        self.session_store = session_store
+        self.trace = None  # Optional tracing.CrawlTrace for the crawl currently using this engine
+
+        self.session = requests.Session()
+        self.session.headers.update(headers or HEADERS)
+        retry = Retry(total=2, backoff_factor=0.5, status_forcelist=(500, 502, 504),
+                      allowed_methods=frozenset(["GET"]))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.served_by: Dict[str, str] = {}
+        self.escalations: Counter = Counter()
+        self.fetches: Counter = Counter()
+        self._last_request: Optional[float] = None
+        self._lock = threading.Lock()
+        if session_store is not None:
+            self.load_cookies(session_store.load())
+
+    def load_cookies(self, cookies: Iterable[Dict]) -> None:
+        """Copies browser cookies (Selenium get_cookies() / SessionStore.load() format) into the HTTP session."""
+        for c in cookies:
+            self.session.cookies.set(c["name"], c["value"], domain=c.get("domain"), path=c.get("path", "/"))
+
+    def _pace(self) -> None:
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        if self.politeness is None:
+            return
+        with self._lock:
+            last, self._last_request = self._last_request, time.time()
+        if last is not None:
+            if self.trace is not None:
+                with self.trace.phase(IDLE):
+                    self.politeness.pause(since=last)
+            else:
+                self.politeness.pause(since=last)
+
+    def record(self, url: str, tier: str, reason: Optional[str] = None) -> None:
+        """Records the tier that served `url` (callers that run their own browser path use this too)."""
+        with self._lock:
+            self.served_by[url] = tier
+            if tier == BROWSER and reason:
+                self.escalations[reason] += 1
+
+    def count_fetch(self, tier: str) -> None:
+        """Counts one page request on `tier` (callers that load pages in their own browser use this too)."""
+        with self._lock:
+            self.fetches[tier] += 1
+
+    @property
+    def fetch_count(self) -> int:
+        """Page requests made so far on either tier; diff it to measure the pages a crawl cost."""
+        with self._lock:
+            return sum(self.fetches.values())
+
+    def fetch_http(self, url: str, expect: Optional[str] = None) -> FetchResult:
+        """Tier 1 only. result.ok is False (with result.reason) if the page needs the browser."""
+        self._pace()
+        self.count_fetch(HTTP)
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            reason = detect_block(response, expect)
+        except requests.RequestException as e:
+            response, reason = None, f"error: {type(e).__name__}"
+        elapsed = time.perf_counter() - start
+
+        if self.politeness is not None:
+            if reason in BLOCK_REASONS:
+                self.politeness.record_block()
+            else:
+                self.politeness.record_success()
+
+        if reason is None:
+            self.record(url, HTTP)
+            return FetchResult(url, response.text, HTTP, elapsed)
+        return FetchResult(url, None, None, elapsed, reason=reason)
+
+    def fetch(self, url: str, expect: Optional[str] = None) -> FetchResult:
+        """Tries the HTTP tier, then escalates this one URL to the browser tier if needed."""
+        trace = self.trace
+        if trace is not None:
+            with trace.phase(HTTP):
+                result = self.fetch_http(url, expect)
+        else:
+            result = self.fetch_http(url, expect)
+        if result.ok or self.browser_fetch is None:
+            return result
+
+        start = time.perf_counter()
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        self.count_fetch(BROWSER)
+        try:
+            html = self.browser_fetch(url, expect) if trace is None else self.browser_fetch(url, expect, trace=trace)
+        except Exception as e:
+            print(f"[Fetch]: Browser tier failed for {url}: {e}")
+            return FetchResult(url, None, None, result.elapsed + time.perf_counter() - start, reason=result.reason)
+        self.record(url, BROWSER, result.reason)
+        if self.session_store is not None:
+            # The browser may just have logged in; let the HTTP tier use the fresh session too
+            self.load_cookies(self.session_store.load())
+        return FetchResult(url, html, BROWSER, result.elapsed + time.perf_counter() - start, reason=result.reason)
+
+    def tier_counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(Counter(self.served_by.values()))
+
+    def print_stats(self, prefix: str = "[Fetch]: ") -> None:
+        counts = self.tier_counts()
+        print(f"{prefix}pages served — http: {counts.get(HTTP, 0)}, browser: {counts.get(BROWSER, 0)} "
+              f"({self.fetch_count} fetches)")
+        if self.escalations:
+            reasons = ", ".join(f"{r}: {n}" for r, n in self.escalations.most_common())
+            print(f"{prefix}escalation reasons — {reasons}")
+
+
+def pooled_browser_fetch(pool, session_store=None, login_timeout: int = 45, interactive: bool = True,
+                         login_driver: Optional[Callable[[], object]] = None) -> Callable[[str, Optional[str]], str]:
+    """
+    Builds a browser_fetch for FetchEngine that borrows a driver from a DriverPool per URL.
+    login_driver starts the browser a manual login happens in (see SessionStore.ensure_login).
+    If a CrawlTrace is passed, the driver's commands and navigate/wait times are recorded in it.
+    """
+    def browser_fetch(url: str, expect: Optional[str] = None, trace=None) -> str:
+        with pool.driver() as driver:
+            state = pool.state(driver)
+            if session_store is not None and not state.get("logged_in"):
+                state["logged_in"] = session_store.ensure_login(driver, login_timeout=login_timeout,
+                                                                interactive=interactive, login_driver=login_driver)
+            if trace is None:
+                driver.get(url)
+                _wait_for(driver, expect)
+                return driver.page_source
+            # Counted only while this trace holds the driver: it goes back to the pool afterwards
+            trace.attach(driver)
+            try:
+                with trace.phase(NAVIGATE):
+                    driver.get(url)
+                with trace.phase(WAIT):
+                    _wait_for(driver, expect)
+                return driver.page_source
+            finally:
+                trace.detach(driver)
+    return browser_fetch
+
+
+def _wait_for(driver, expect: Optional[str]) -> None:
+    if expect == REVIEW_MARKER:
+        wait_for_reviews(driver)
+    elif expect == PRODUCT_MARKER:
+        wait_for_element(driver, By.ID, "productTitle")
+
+
+def parse_product_html(html: str) -> Dict:
+    """Parses title, feature bullets, tech-spec table and price from a product page with lxml."""
+    from lxml import html as lxml_html
+
+    tree = lxml_html.fromstring(html)
+
+    def first_text(xpath: str) -> Optional[str]:
+        found = tree.xpath(xpath)
+        return found[0].text_content().strip() if found else None
+
+    features: List[str] = []
+    for li in tree.xpath('//div[@id="feature-bullets"]//li'):
+        text = " ".join(li.text_content().split())
+        if text:
+            features.append(text)
+
+    product_details = {}
+    for row in tree.xpath('//table[@id="productDetails_techSpec_section_1"]//tr'):
+        th, td = row.xpath('./th'), row.xpath('./td')
+        if th and td:
+            product_details[" ".join(th[0].text_content().split())] = " ".join(td[0].text_content().split())
+
+    return {
+        "title": first_text('//span[@id="productTitle"]') or "N/A",
+        "features": features,
+        "product_details": product_details,
+        "price": first_text('//span[contains(concat(" ", normalize-space(@class), " "), " a-price-whole ")]') or "N/A",
+    }
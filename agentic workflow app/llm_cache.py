@@ -0,0 +1,166 @@
+"""
+Content-addressed on-disk cache for OpenAI chat completions.
+
+CachedOpenAI wraps an OpenAI client: client.chat.completions.create(...) first looks the request
+up in a SQLite file, keyed by a hash of its parameters (model, messages, temperature,
+response_format and anything else passed), and only calls the API on a miss. Every other client
+attribute (images, embeddings, ...) goes straight to the wrapped client.
+
+Entries expire after ttl_days; past max_entries the least recently used ones are evicted.
+Set bypass=True (or LLM_CACHE_BYPASS=1) to force fresh completions; they still refresh the cache.
+
+    python llm_cache.py            # entries, size and tokens stored
+    python llm_cache.py --clear
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+DEFAULT_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_completions.sqlite")
+DEFAULT_TTL_DAYS = 30
+DEFAULT_MAX_ENTRIES = 5000
+
+
+def request_key(params: Dict) -> str:
+    """sha256 of the request parameters, independent of argument order."""
+    canonical = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """SQLite table of completion responses (as JSON) with TTL and LRU eviction."""
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl_days: Optional[float] = DEFAULT_TTL_DAYS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, bypass: Optional[bool] = None):
+        self.path = path
+        self.ttl = ttl_days * 86400 if ttl_days else None
+        self.max_entries = max_entries
+        self.bypass = os.getenv("LLM_CACHE_BYPASS") == "1" if bypass is None else bypass
+        self.stats = {"hits": 0, "misses": 0, "tokens_saved": 0}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            " key TEXT PRIMARY KEY, model TEXT, response TEXT, total_tokens INTEGER,"
+            " created_at REAL, last_used_at REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS completions_lru ON completions (last_used_at)")
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Cached response dict, or None on a miss, an expired entry or while bypassing."""
+        if self.bypass:
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, total_tokens, created_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl and now - row[2] > self.ttl):
+                self.stats["misses"] += 1
+                return None
+            self._db.execute("UPDATE completions SET last_used_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.stats["hits"] += 1
+            self.stats["tokens_saved"] += row[1] or 0
+        return json.loads(row[0])
+
+    def put(self, key: str, model: str, response: Dict) -> None:
+        now = time.time()
+        total_tokens = (response.get("usage") or {}).get("total_tokens") or 0
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, json.dumps(response), total_tokens, now, now),
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now: float) -> None:
+        if self.ttl:
+            self._db.execute("DELETE FROM completions WHERE created_at < ?", (now - self.ttl,))
+        self._db.execute(
+            "DELETE FROM completions WHERE key NOT IN "
+            "(SELECT key FROM completions ORDER BY last_used_at DESC LIMIT ?)", (self.max_entries,)
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM completions")
+            self._db.commit()
+
+    def info(self) -> Dict:
+        with self._lock:
+            entries, tokens = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(total_tokens), 0) FROM completions").fetchone()
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return {"path": self.path, "entries": entries, "tokens_stored": tokens, "bytes": size}
+
+    def summary(self) -> str:
+        s = self.stats
+        total = s["hits"] + s["misses"]
+        rate = 100 * s["hits"] / total if total else 0.0
+        return (f"{s['hits']} hits / {s['misses']} misses ({rate:.0f}%), "
+                f"{s['tokens_saved']:,} tokens saved{' [bypassed]' if self.bypass else ''}")
+
+
+class _CachedCompletions:
+    def __init__(self, completions, cache: CompletionCache):
+        self._completions = completions
+        self._cache = cache
+
+    def create(self, **params):
+        if params.get("stream"):
+            return self._completions.create(**params)
+        key = request_key(params)
+        cached = self._cache.get(key)
+        if cached is not None:
+            from openai.types.chat import ChatCompletion
+            return ChatCompletion.model_validate(cached)
+        response = self._completions.create(**params)
+        self._cache.put(key, params.get("model", ""), response.model_dump(mode="json"))
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._completions, name)
+
+
+class _CachedChat:
+    def __init__(self, chat, cache: CompletionCache):
+        self._chat = chat
+        self.completions = _CachedCompletions(chat.completions, cache)
+
+    def __getattr__(self, name):
+        return getattr(self._chat, name)
+
+
+class CachedOpenAI:
+    """Drop-in wrapper for an OpenAI client whose chat completions go through a CompletionCache."""
+    def __init__(self, client, cache: Optional[CompletionCache] = None, **cache_options):
+        self._client = client
+        self.cache = cache or CompletionCache(**cache_options)
+        self.chat = _CachedChat(client.chat, self.cache)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or clear the LLM completion cache.")
+    parser.add_argument("--path", default=DEFAULT_CACHE_PATH)
+    parser.add_argument("--clear", action="store_true")
+    args = parser.parse_args()
+
+    cache = CompletionCache(args.path)
+    if args.clear:
+        cache.clear()
+        print(f"[LLM Cache]: Cleared {args.path}")
+    print(f"[LLM Cache]: {cache.info()}")
@@ -0,0 +1,169 @@
+"""
+Concurrent LLM calls with bounded parallelism and account rate limits.
+
+fan_out() runs one call per item on a thread pool (the OpenAI client is thread-safe), keeps
+results in input order, swaps in a fallback result when a call fails, and holds every call to
+a shared RateLimiter (requests and tokens per minute). Its CallStats compare wall time with the
+summed latency of the individual calls, i.e. how much the fan-out actually overlapped.
+
+Try it against the local mock server (mock_openai.py) instead of the real API:
+    python llm_pool.py --chunks 40 --workers 8 --latency 0.5
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English) for rate-limit bookkeeping."""
+    return max(1, len(text) // 4)
+
+
+class RateLimiter:
+    """
+    Sliding one-minute window over requests (rpm) and tokens (tpm), shared by all threads.
+    acquire() blocks until a call of `tokens` fits under both limits. A single call larger than
+    tpm is let through once the window is empty, so it cannot block forever.
+    """
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None, window: float = 60.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self._calls: deque = deque()  # (timestamp, tokens)
+        self._tokens = 0
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        while self._calls and now - self._calls[0][0] >= self.window:
+            self._tokens -= self._calls.popleft()[1]
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Blocks until the call fits and returns the time spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.time()
+                self._expire(now)
+                fits_rpm = self.rpm is None or len(self._calls) < self.rpm
+                fits_tpm = self.tpm is None or not self._calls or self._tokens + tokens <= self.tpm
+                if fits_rpm and fits_tpm:
+                    self._calls.append((now, tokens))
+                    self._tokens += tokens
+                    return waited
+                sleep = self.window - (now - self._calls[0][0]) + 0.01
+            time.sleep(sleep)
+            waited += sleep
+
+
+class CallStats:
+    """Timing of one fan_out run."""
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.tokens = 0
+        self.call_seconds = 0.0       # Summed latency of every call
+        self.rate_limit_seconds = 0.0  # Summed time calls waited for the rate limiter
+        self.wall_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float, waited: float, tokens: int, failed: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            self.failures += int(failed)
+            self.tokens += tokens
+            self.call_seconds += seconds
+            self.rate_limit_seconds += waited
+
+    @property
+    def speedup(self) -> float:
+        return self.call_seconds / self.wall_seconds if self.wall_seconds else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "estimated_tokens": self.tokens,
+            "wall_seconds": round(self.wall_seconds, 3),
+            "summed_call_seconds": round(self.call_seconds, 3),
+            "rate_limit_wait_seconds": round(self.rate_limit_seconds, 3),
+            "speedup": round(self.speedup, 2),
+        }
+
+    def print_summary(self, prefix: str = "   ") -> None:
+        print(f"{prefix}⏱️  {self.calls} calls: wall {self.wall_seconds:.1f}s vs. {self.call_seconds:.1f}s summed "
+              f"call latency ({self.speedup:.1f}x), {self.rate_limit_seconds:.1f}s rate-limit waits, "
+              f"{self.failures} failed")
+
+
+def fan_out(func: Callable, items: Sequence, max_workers: int = 4, limiter: Optional[RateLimiter] = None,
+            tokens: Callable = lambda item: 0, fallback: Optional[Callable] = None) -> Tuple[List, CallStats]:
+    """
+    Calls func(item) for every item on up to max_workers threads and returns the results in
+    the order of `items`, plus CallStats. tokens(item) is the estimated token cost charged to
+    the limiter. If a call raises, fallback(item, error) supplies its result instead (without a
+    fallback the error propagates once every call has finished).
+    """
+    stats = CallStats()
+    results: List = [None] * len(items)
+    errors: List[Optional[BaseException]] = [None] * len(items)
+
+    def run(index: int) -> None:
+        item = items[index]
+        cost = tokens(item)
+        waited = limiter.acquire(cost) if limiter is not None else 0.0
+        start = time.perf_counter()
+        try:
+            results[index] = func(item)
+            failed = False
+        except Exception as e:
+            failed = True
+            if fallback is None:
+                errors[index] = e
+            else:
+                results[index] = fallback(item, e)
+        stats.add(time.perf_counter() - start, waited, cost, failed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        list(pool.map(run, range(len(items))))
+    stats.wall_seconds = time.perf_counter() - start
+
+    for error in errors:
+        if error is not None:
+            raise error
+    return results, stats
+
+
+if __name__ == "__main__":
+    import argparse
+    from openai import OpenAI
+    from mock_openai import MockOpenAIServer
+
+    parser = argparse.ArgumentParser(description="Sequential vs. concurrent chunk summaries against a mock server.")
+    parser.add_argument("--chunks", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--rpm", type=float, default=None)
+    parser.add_argument("--tpm", type=float, default=None)
+    args = parser.parse_args()
+
+    chunks = [f"Review chunk {i}. " + "The keyboard feels solid and the keys are quiet. " * 60
+              for i in range(args.chunks)]
+    with MockOpenAIServer(latency=args.latency, error_rate=args.error_rate) as server:
+        mock_client = OpenAI(base_url=server.base_url, api_key="mock", max_retries=0)
+
+        def summarize(chunk: str) -> str:
+            response = mock_client.chat.completions.create(
+                model="mock", messages=[{"role": "user", "content": chunk}], temperature=0.3)
+            return response.choices[0].message.content
+
+        for workers in (1, args.workers):
+            limiter = RateLimiter(rpm=args.rpm, tpm=args.tpm)
+            summaries, stats = fan_out(summarize, chunks, max_workers=workers, limiter=limiter,
+                                       tokens=estimate_tokens, fallback=lambda chunk, e: chunk)
+            print(f"workers={workers}: {len(summaries)} summaries, in order: "
+                  f"{all(s.startswith('Summary: Review chunk ' + str(i) + '.') or s == chunks[i] for i, s in enumerate(summaries))}")
+            stats.print_summary()
@@ -0,0 +1,136 @@
+"""
+Minimal OpenAI-compatible chat completions server for offline tests and benchmarks.
+
+POST {base_url}/chat/completions returns "Summary: " + the first words of the last message,
+after a configurable latency; error_rate of requests fail with a 500 (or 429 if rate_limited).
+Point an OpenAI client at it with OpenAI(base_url=server.base_url, api_key="mock"), or set
+OPENAI_BASE_URL=<base_url> so the pipelines' default clients use it.
+
+    python mock_openai.py --port 8766 --latency 0.5
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+
+def default_reply(request: Dict) -> str:
+    text = request["messages"][-1]["content"] if request.get("messages") else ""
+    if isinstance(text, list):  # Multi-part content
+        text = " ".join(part.get("text", "") for part in text if isinstance(part, dict))
+    return "Summary: " + " ".join(text.split()[:40])
+
+
+class MockOpenAIServer:
+    """Serves fake chat completions on localhost in a background thread."""
+    def __init__(self, port: int = 0, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limited: bool = False, reply: Callable[[Dict], str] = default_reply, seed: Optional[int] = 0):
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limited = rate_limited
+        self.reply = reply
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def _complete(self, request: Dict):
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["in_flight"] += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+            roll = self._random.random()
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+        try:
+            time.sleep(delay)
+            if roll < self.error_rate:
+                with self._lock:
+                    self.stats["errors"] += 1
+                status = 429 if self.rate_limited else 500
+                return status, {"error": {"message": "mock failure", "type": "server_error"}}
+            content = self.reply(request)
+            prompt_tokens = sum(len(str(m.get("content", ""))) // 4 for m in request.get("messages", []))
+            completion_tokens = len(content) // 4
+            return 200, {
+                "id": f"chatcmpl-mock-{self.stats['requests']}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "mock"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            }
+        finally:
+            with self._lock:
+                self.stats["in_flight"] -= 1
+
+    def start(self) -> str:
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if self.path.rstrip("/").endswith("/chat/completions"):
+                    status, body = mock._complete(request)
+                else:
+                    status, body = 404, {"error": {"message": f"unknown path {self.path}"}}
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self.base_url
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "MockOpenAIServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self.stop()
+        return False
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve fake OpenAI chat completions.")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(port=args.port, latency=args.latency, jitter=args.jitter,
+                              error_rate=args.error_rate, seed=None)
+    print(f"[Mock OpenAI]: Serving at {server.start()} — set OPENAI_BASE_URL to this (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+        print(f"[Mock OpenAI]: {server.stats}")
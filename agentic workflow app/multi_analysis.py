@@ -0,0 +1,225 @@
+"""
+Several review analyses (visual features, product features, sentiment, topics, ...) from a
+single LLM call that shares one copy of the review context.
+
+Each Section has a name, instructions and a JSON schema. MultiTaskAnalyzer asks for all sections
+in one schema-constrained JSON response (Structured Outputs; structured=False falls back to
+json_object mode with the schema spelled out in the prompt), validates every section against its
+schema, and re-asks only for the sections that came back missing or malformed. compare() runs the
+same sections the old way, one call per section, and reports input tokens and latency of both.
+"""
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+# --- Schema helpers (the subset of JSON Schema that Structured Outputs accepts in strict mode) ---
+
+def string(description: str = "") -> Dict:
+    return {"type": "string", "description": description} if description else {"type": "string"}
+
+
+def number(description: str = "") -> Dict:
+    return {"type": "number", "description": description} if description else {"type": "number"}
+
+
+def array(items: Dict, description: str = "") -> Dict:
+    schema = {"type": "array", "items": items}
+    if description:
+        schema["description"] = description
+    return schema
+
+
+def obj(properties: Dict[str, Dict], description: str = "") -> Dict:
+    schema = {"type": "object", "properties": properties, "required": list(properties),
+              "additionalProperties": False}
+    if description:
+        schema["description"] = description
+    return schema
+
+
+_TYPES = {"string": str, "number": (int, float), "array": list, "object": dict}
+
+
+def validate(value: Any, schema: Dict, path: str = "") -> List[str]:
+    """Errors of value against a schema built with the helpers above (empty list if valid)."""
+    expected = _TYPES[schema["type"]]
+    if not isinstance(value, expected) or (schema["type"] == "number" and isinstance(value, bool)):
+        return [f"{path or 'value'}: expected {schema['type']}, got {type(value).__name__}"]
+    errors = []
+    if schema["type"] == "object":
+        for key, sub in schema["properties"].items():
+            if key not in value:
+                errors.append(f"{path}.{key}: missing")
+            else:
+                errors.extend(validate(value[key], sub, f"{path}.{key}"))
+    elif schema["type"] == "array":
+        for i, item in enumerate(value):
+            errors.extend(validate(item, schema["items"], f"{path}[{i}]"))
+    return errors
+
+
+def skeleton(schema: Dict) -> Any:
+    """Example value showing a schema's shape, for prompts in json_object mode."""
+    kind = schema["type"]
+    if kind == "object":
+        return {k: skeleton(v) for k, v in schema["properties"].items()}
+    if kind == "array":
+        return [skeleton(schema["items"])]
+    return schema.get("description") or kind
+
+
+class Section:
+    """One analysis task: the JSON key it fills, what to put there and its schema.
+    check(value) may return an error message for problems the schema can't express."""
+    def __init__(self, name: str, instructions: str, schema: Dict,
+                 check: Optional[Callable[[Any], Optional[str]]] = None):
+        self.name = name
+        self.instructions = instructions
+        self.schema = schema
+        self.check = check
+
+    def errors(self, value: Any) -> List[str]:
+        errors = validate(value, self.schema, self.name)
+        if not errors and self.check is not None:
+            problem = self.check(value)
+            if problem:
+                errors.append(f"{self.name}: {problem}")
+        return errors
+
+
+class MultiTaskAnalyzer:
+    """Runs a list of Sections over one context in a single chat completion (plus repairs)."""
+    def __init__(self, client, sections: List[Section], model: str = "gpt-5.1",
+                 system: str = "You are an expert product analyst. Always respond with valid JSON.",
+                 temperature: Optional[float] = 0.3, structured: bool = True, max_repairs: int = 1):
+        self.client = client
+        self.sections = sections
+        self.model = model
+        self.system = system
+        self.temperature = temperature
+        self.structured = structured
+        self.max_repairs = max_repairs
+        self.last_report: Dict = {}
+
+    def _prompt(self, context: str, sections: List[Section], errors: Optional[List[str]] = None) -> str:
+        tasks = "\n".join(f'- "{s.name}": {s.instructions}' for s in sections)
+        prompt = f"""
+Analyze the following product information and customer reviews.
+
+{context}
+
+Return one JSON object with exactly these keys:
+{tasks}
+"""
+        if not self.structured:
+            shape = {s.name: skeleton(s.schema) for s in sections}
+            prompt += f"\nUse this structure:\n{json.dumps(shape, indent=2)}\n"
+        if errors:
+            prompt += "\nA previous answer had these problems; fix them:\n" + "\n".join(f"- {e}" for e in errors) + "\n"
+        return prompt
+
+    def _call(self, context: str, sections: List[Section], errors: Optional[List[str]] = None) -> Tuple[Dict, Dict]:
+        if self.structured:
+            response_format = {"type": "json_schema", "json_schema": {
+                "name": "review_analysis", "strict": True,
+                "schema": obj({s.name: s.schema for s in sections}),
+            }}
+        else:
+            response_format = {"type": "json_object"}
+        params = dict(
+            model=self.model,
+            messages=[{"role": "system", "content": self.system},
+                      {"role": "user", "content": self._prompt(context, sections, errors)}],
+            response_format=response_format,
+        )
+        if self.temperature is not None:
+            params["temperature"] = self.temperature
+
+        start = time.perf_counter()
+        response = self.client.chat.completions.create(**params)
+        seconds = time.perf_counter() - start
+        usage = response.usage
+        call = {"sections": [s.name for s in sections], "seconds": round(seconds, 3),
+                "input_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+                "output_tokens": getattr(usage, "completion_tokens", 0) or 0}
+        try:
+            data = json.loads(response.choices[0].message.content)
+        except (TypeError, json.JSONDecodeError):
+            data = {}
+        return (data if isinstance(data, dict) else {}), call
+
+    def analyze(self, context: str) -> Dict[str, Any]:
+        """All sections for `context`; sections still invalid after the repairs are None."""
+        results: Dict[str, Any] = {}
+        calls: List[Dict] = []
+        todo = list(self.sections)
+        errors: List[str] = []
+        for attempt in range(self.max_repairs + 1):
+            data, call = self._call(context, todo, errors if attempt else None)
+            calls.append(call)
+            errors, failed = [], []
+            for section in todo:
+                problems = section.errors(data.get(section.name))
+                if problems:
+                    failed.append(section)
+                    errors.extend(problems[:5])
+                else:
+                    results[section.name] = data[section.name]
+            todo = failed
+            if not todo:
+                break
+        for section in todo:
+            results[section.name] = None
+
+        self.last_report = {
+            "calls": calls,
+            "input_tokens": sum(c["input_tokens"] for c in calls),
+            "output_tokens": sum(c["output_tokens"] for c in calls),
+            "seconds": round(sum(c["seconds"] for c in calls), 3),
+            "repaired": sorted({name for c in calls[1:] for name in c["sections"]}),
+            "failed": [s.name for s in todo],
+        }
+        return results
+
+    def compare(self, context: str) -> Dict:
+        """Runs the combined call and then one call per section; returns both reports.
+        A CachedOpenAI client is bypassed meanwhile, so both paths really hit the API."""
+        cache = getattr(self.client, "cache", None)
+        bypass = cache.bypass if cache is not None else None
+        if cache is not None:
+            cache.bypass = True
+        try:
+            self.analyze(context)
+            combined = self.last_report
+            per_task_calls = []
+            per_task_failed = []
+            for section in self.sections:
+                single = MultiTaskAnalyzer(self.client, [section], model=self.model, system=self.system,
+                                           temperature=self.temperature, structured=self.structured, max_repairs=0)
+                single.analyze(context)
+                per_task_calls.extend(single.last_report["calls"])
+                per_task_failed.extend(single.last_report["failed"])
+        finally:
+            if cache is not None:
+                cache.bypass = bypass
+        per_task = {
+            "calls": per_task_calls,
+            "input_tokens": sum(c["input_tokens"] for c in per_task_calls),
+            "output_tokens": sum(c["output_tokens"] for c in per_task_calls),
+            "seconds": round(sum(c["seconds"] for c in per_task_calls), 3),
+            "failed": per_task_failed,
+        }
+        return {"combined": combined, "per_task": per_task}
+
+
+def print_comparison(report: Dict, prefix: str = "   ") -> None:
+    print(f"{prefix}{'path':<10}{'calls':>7}{'input tok':>11}{'output tok':>12}{'seconds':>9}  failed")
+    for name in ("combined", "per_task"):
+        r = report[name]
+        print(f"{prefix}{name:<10}{len(r['calls']):>7}{r['input_tokens']:>11,}{r['output_tokens']:>12,}"
+              f"{r['seconds']:>9.1f}  {', '.join(r['failed']) or '-'}")
+    saved = report["per_task"]["input_tokens"] - report["combined"]["input_tokens"]
+    if report["per_task"]["input_tokens"]:
+        print(f"{prefix}combined call saves {saved:,} input tokens "
+              f"({100 * saved / report['per_task']['input_tokens']:.0f}%)")
@@ -0,0 +1,240 @@
+"""
+Refresh scheduler for the cached product catalog (data/<ASIN>/).
+
+Each ASIN folder gets a refresh.json with its scrape history: last scrape/attempt time, new
+reviews found last time, a smoothed review velocity (new reviews per day), pages spent and
+consecutive failures. New reviews come from batch_scraper's incremental crawl, which reads the
+review pages newest first and stops at the first stored review; pages are real fetch attempts.
+Every round, the scheduler ranks ASINs by expected new reviews per page (velocity x time since
+last scrape / pages per scrape), skips ones in failure backoff, and picks as many as fit in what
+is left of the global pages-per-hour budget. Fast-moving products are
+refreshed often; static ones are only revisited once enough time has passed to matter.
+
+Usage:
+    python refresh_scheduler.py --pages-per-hour 60 --dry-run
+    python refresh_scheduler.py --pages-per-hour 60 --workers 2 --rpm 20 --loop
+"""
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+META_FILE = "refresh.json"
+LEDGER_FILE = "refresh_ledger.json"
+
+DEFAULT_PAGES_PER_SCRAPE = 2      # run_scraper: product page + one review page
+PRIOR_VELOCITY = 1.0              # Assumed new reviews/day for an ASIN with no history
+MIN_VELOCITY = 0.05               # Floor, so static products are still revisited eventually
+VELOCITY_SMOOTHING = 0.5          # Weight of the newest observation in the velocity average
+MIN_REFRESH_HOURS = 1.0           # Never re-scrape an ASIN more often than this
+FAILURE_BACKOFF_HOURS = 1.0       # Doubles with every consecutive failure...
+MAX_BACKOFF_HOURS = 7 * 24.0      # ...up to a week
+
+
+def _load_json(path: str, default):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def _save_json(path: str, payload) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class RefreshScheduler:
+    """Keeps per-ASIN refresh metadata under base_dir and plans refresh batches within a page budget."""
+    def __init__(self, base_dir: str = "data", pages_per_hour: float = 60):
+        self.base_dir = base_dir
+        self.pages_per_hour = pages_per_hour
+        self.ledger_path = os.path.join(base_dir, LEDGER_FILE)
+
+    # --- Per-ASIN metadata ---
+
+    def catalog(self) -> List[str]:
+        """ASIN folders under base_dir that hold a snapshot or refresh metadata."""
+        if not os.path.isdir(self.base_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.base_dir)
+            if any(os.path.exists(os.path.join(self.base_dir, name, f))
+                   for f in ("customer_reviews.json", "product_description.json", META_FILE))
+        )
+
+    def metadata(self, asin: str) -> Dict:
+        meta = _load_json(os.path.join(self.base_dir, asin, META_FILE), {})
+        if "last_scrape" not in meta:
+            # Snapshots from before the scheduler existed: date them by their file time
+            snapshot = os.path.join(self.base_dir, asin, "customer_reviews.json")
+            meta.setdefault("last_scrape", os.path.getmtime(snapshot) if os.path.exists(snapshot) else None)
+        meta.setdefault("last_attempt", meta["last_scrape"])
+        meta.setdefault("velocity", None)
+        meta.setdefault("new_reviews_last", None)
+        meta.setdefault("pages_last", DEFAULT_PAGES_PER_SCRAPE)
+        meta.setdefault("failures", 0)
+        meta.setdefault("scrapes", 0)
+        return meta
+
+    def save_metadata(self, asin: str, meta: Dict) -> None:
+        _save_json(os.path.join(self.base_dir, asin, META_FILE), meta)
+
+    def add(self, asin: str) -> None:
+        """Registers a new ASIN; it has no history, so it is scheduled soon."""
+        if not os.path.exists(os.path.join(self.base_dir, asin, META_FILE)):
+            self.save_metadata(asin, self.metadata(asin))
+
+    def record_result(self, asin: str, pages: int, new_reviews: Optional[int] = None,
+                      error: Optional[str] = None, now: Optional[float] = None, capped: bool = False) -> Dict:
+        """
+        Updates an ASIN's metadata after a refresh attempt and charges its pages to the budget.
+        pages is the number of fetch attempts the refresh made; new_reviews is the count from the
+        recent-first crawl, and capped marks it as a lower bound (the crawl hit its page limit).
+        """
+        now = now or time.time()
+        meta = self.metadata(asin)
+        meta["last_attempt"] = now
+        if error is None:
+            if meta["last_scrape"] and new_reviews is not None:
+                days = max((now - meta["last_scrape"]) / 86400, 1 / 24)
+                observed = new_reviews / days
+                meta["velocity"] = observed if meta["velocity"] is None else \
+                    VELOCITY_SMOOTHING * observed + (1 - VELOCITY_SMOOTHING) * meta["velocity"]
+                if capped:
+                    # Only a lower bound: never let it pull the estimate down
+                    meta["velocity"] = max(meta["velocity"], observed)
+            meta["last_scrape"] = now
+            meta["new_reviews_last"] = new_reviews
+            meta["pages_last"] = pages
+            meta["failures"] = 0
+            meta["scrapes"] += 1
+            meta.pop("last_error", None)
+        else:
+            meta["failures"] += 1
+            meta["last_error"] = error
+        self.save_metadata(asin, meta)
+        self.charge(pages, now=now)
+        return meta
+
+    # --- Page budget ---
+
+    def pages_spent(self, now: Optional[float] = None) -> int:
+        """Pages charged during the last hour."""
+        now = now or time.time()
+        return sum(entry["pages"] for entry in _load_json(self.ledger_path, []) if now - entry["at"] < 3600)
+
+    def charge(self, pages: int, now: Optional[float] = None) -> None:
+        now = now or time.time()
+        ledger = [e for e in _load_json(self.ledger_path, []) if now - e["at"] < 3600]
+        ledger.append({"at": now, "pages": pages})
+        _save_json(self.ledger_path, ledger)
+
+    def remaining_budget(self, now: Optional[float] = None) -> float:
+        return max(0.0, self.pages_per_hour - self.pages_spent(now))
+
+    # --- Planning ---
+
+    def priority(self, meta: Dict, now: Optional[float] = None) -> Optional[float]:
+        """Expected new reviews per page if refreshed now, or None while the ASIN is not due."""
+        now = now or time.time()
+        if meta["failures"] and meta["last_attempt"]:
+            backoff = min(MAX_BACKOFF_HOURS, FAILURE_BACKOFF_HOURS * 2 ** (meta["failures"] - 1))
+            if now - meta["last_attempt"] < backoff * 3600:
+                return None
+        if meta["last_scrape"] is None:
+            hours = 30 * 24.0  # Never scraped: worth a month of reviews
+        else:
+            hours = (now - meta["last_scrape"]) / 3600
+            if hours < MIN_REFRESH_HOURS:
+                return None
+        velocity = PRIOR_VELOCITY if meta["velocity"] is None else max(meta["velocity"], MIN_VELOCITY)
+        return velocity * hours / 24 / max(meta["pages_last"], 1)
+
+    def plan(self, now: Optional[float] = None, budget: Optional[float] = None) -> List[Dict]:
+        """Picks the highest-priority due ASINs whose estimated pages fit in the remaining budget."""
+        now = now or time.time()
+        budget = self.remaining_budget(now) if budget is None else budget
+        candidates = []
+        for asin in self.catalog():
+            meta = self.metadata(asin)
+            score = self.priority(meta, now)
+            if score is not None:
+                candidates.append({"asin": asin, "priority": score, "pages": meta["pages_last"], "meta": meta})
+        candidates.sort(key=lambda c: -c["priority"])
+
+        batch = []
+        for candidate in candidates:
+            if candidate["pages"] <= budget:
+                batch.append(candidate)
+                budget -= candidate["pages"]
+        return batch
+
+    def refresh(self, workers: int = 2, requests_per_minute: float = 30, review_limit: int = 10,
+                dry_run: bool = False) -> List[Dict]:
+        """Plans one batch, scrapes it with batch_scraper.scrape_many and records the results."""
+        batch = self.plan()
+        print(f"[Scheduler]: {len(batch)} ASINs due, {self.remaining_budget():.0f}/{self.pages_per_hour:.0f} "
+              f"pages left this hour")
+        print_plan(batch)
+        if dry_run or not batch:
+            return batch
+
+        from batch_scraper import scrape_many
+        summary = scrape_many([c["asin"] for c in batch], workers=workers, requests_per_minute=requests_per_minute,
+                              retries=0, review_limit=review_limit, base_dir=self.base_dir)
+        for asin, result in summary["results"].items():
+            meta = self.record_result(asin, result["pages"], result.get("new_reviews"), result["error"],
+                                      capped=result.get("new_reviews_capped", False))
+            velocity = f"{meta['velocity']:.2f}/day" if meta["velocity"] is not None else "n/a"
+            new_reviews = result.get("new_reviews")
+            new_reviews = "n/a" if new_reviews is None else f"{new_reviews}{'+' if result.get('new_reviews_capped') else ''}"
+            print(f"[Scheduler]: {asin}: {new_reviews} new reviews, velocity {velocity}, "
+                  f"failures {meta['failures']}")
+        return batch
+
+    def run_forever(self, interval: float = 600, **kwargs) -> None:
+        """Refreshes a batch every `interval` seconds; rounds with no budget left scrape nothing."""
+        while True:
+            self.refresh(**kwargs)
+            time.sleep(interval)
+
+
+def print_plan(batch: List[Dict]) -> None:
+    if not batch:
+        return
+    print(f"{'ASIN':<14}{'priority':>10}{'velocity':>10}{'age (h)':>9}{'pages':>7}{'failures':>10}")
+    now = time.time()
+    for c in batch:
+        meta = c["meta"]
+        velocity = f"{meta['velocity']:.2f}" if meta["velocity"] is not None else "-"
+        age = f"{(now - meta['last_scrape']) / 3600:.1f}" if meta["last_scrape"] else "never"
+        print(f"{c['asin']:<14}{c['priority']:>10.2f}{velocity:>10}{age:>9}{c['pages']:>7}{meta['failures']:>10}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresh the data/<ASIN> catalog within a page budget.")
+    parser.add_argument("--pages-per-hour", type=float, default=60)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--rpm", type=float, default=30, help="Global requests per minute across all workers")
+    parser.add_argument("--review-limit", type=int, default=10)
+    parser.add_argument("--add", nargs="*", default=[], help="ASINs to add to the catalog")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the plan")
+    parser.add_argument("--loop", action="store_true", help="Keep refreshing every --interval seconds")
+    parser.add_argument("--interval", type=float, default=600)
+    args = parser.parse_args()
+
+    scheduler = RefreshScheduler(pages_per_hour=args.pages_per_hour)
+    for new_asin in args.add:
+        scheduler.add(new_asin)
+    options = dict(workers=args.workers, requests_per_minute=args.rpm, review_limit=args.review_limit,
+                   dry_run=args.dry_run)
+    if args.loop and not args.dry_run:
+        scheduler.run_forever(interval=args.interval, **options)
+    else:
+        scheduler.refresh(**options)
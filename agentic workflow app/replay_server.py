@@ -0,0 +1,282 @@
+"""
+Offline Amazon stand-in for measuring and regression-testing the scrapers.
+
+FixtureRecorder saves product and review pages to a fixture directory (pages/*.html plus an
+index.json). ReplayServer serves them back on localhost with configurable latency, HTTP errors
+and captcha pages; point a scraper's base_url at server.base_url to crawl it instead of Amazon.
+write_synthetic_fixtures() generates Amazon-shaped pages for boxes that have never recorded any.
+
+Usage:
+    python replay_server.py record B0BYTNTGLY --pages 5 --out fixtures
+    python replay_server.py synthetic B0BYTNTGLY --pages 5 --out fixtures
+    python replay_server.py serve fixtures --port 8765 --latency 0.3 --error-rate 0.05
+"""
+import hashlib
+import html as html_lib
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from http_fetch import PRODUCT_MARKER, REVIEW_MARKER
+
+CAPTCHA_HTML = ('<html><body><form action="/errors/validateCaptcha">'
+                '<p>Type the characters you see in this image:</p><input id="captchacharacters"></form></body></html>')
+
+
+def fixture_key(url: str) -> str:
+    """
+    Maps a URL to the page it represents, so every review-URL format (ref=..., ie=UTF8, ...) of
+    the same page shares one fixture: product/<ASIN>, reviews/<ASIN>/<page>[/<sort>], else the path.
+    """
+    parsed = urlparse(url)
+    parts = [p for p in parsed.path.split("/") if p]
+    query = parse_qs(parsed.query)
+    if "product-reviews" in parts and parts.index("product-reviews") + 1 < len(parts):
+        asin = parts[parts.index("product-reviews") + 1]
+        key = f"reviews/{asin}/{query.get('pageNumber', ['1'])[0]}"
+        if "sortBy" in query:
+            key += f"/{query['sortBy'][0]}"
+        return key
+    for marker in ("dp", "product"):
+        if marker in parts and parts.index(marker) + 1 < len(parts):
+            return f"product/{parts[parts.index(marker) + 1]}"
+    return parsed.path
+
+
+class FixtureStore:
+    """A fixture directory: index.json maps fixture_key -> {"file", "url", "recorded_at"}."""
+    def __init__(self, root: str):
+        self.root = root
+        self.index_path = os.path.join(root, "index.json")
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.index: Dict[str, Dict] = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.index = {}
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.index.get(key)
+        if entry is None:
+            return None
+        with open(os.path.join(self.root, entry["file"]), "r", encoding="utf-8") as f:
+            return f.read()
+
+    def put(self, url: str, html: str, key: Optional[str] = None) -> str:
+        key = key or fixture_key(url)
+        filename = os.path.join("pages", hashlib.sha1(key.encode("utf-8")).hexdigest()[:16] + ".html")
+        os.makedirs(os.path.join(self.root, "pages"), exist_ok=True)
+        with open(os.path.join(self.root, filename), "w", encoding="utf-8") as f:
+            f.write(html)
+        self.index[key] = {"file": filename, "url": url, "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        return key
+
+    def save(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def asins(self) -> List[str]:
+        return sorted({k.split("/")[1] for k in self.index if k.startswith(("product/", "reviews/"))})
+
+    def review_pages(self, asin: str) -> int:
+        return len([k for k in self.index if k.startswith(f"reviews/{asin}/") and k.count("/") == 2])
+
+
+class FixtureRecorder:
+    """Records live pages through a FetchEngine (HTTP first, browser fallback) into a FixtureStore."""
+    def __init__(self, engine, out_dir: str = "fixtures", base_url: str = "https://www.amazon.com"):
+        self.engine = engine
+        self.store = FixtureStore(out_dir)
+        self.base_url = base_url.rstrip("/")
+
+    def record(self, url: str, expect: Optional[str] = None) -> Optional[str]:
+        page = self.engine.fetch(url, expect=expect)
+        if not page.ok:
+            print(f"[Recorder]: Skipped {url} ({page.reason})")
+            return None
+        key = self.store.put(url, page.html)
+        print(f"[Recorder]: {key} <- {url} ({page.tier})")
+        return key
+
+    def record_asin(self, asin: str, pages: int = 5) -> int:
+        """Records the product page and the first `pages` review pages. Returns how many pages were saved."""
+        saved = 0
+        if self.record(f"{self.base_url}/dp/{asin}", expect=PRODUCT_MARKER):
+            saved += 1
+        for page in range(1, pages + 1):
+            url = f"{self.base_url}/product-reviews/{asin}/?ie=UTF8&reviewerType=all_reviews&pageNumber={page}"
+            if not self.record(url, expect=REVIEW_MARKER):
+                break
+            saved += 1
+        self.store.save()
+        return saved
+
+
+def _synthetic_review(asin: str, n: int) -> str:
+    rating = 1 + (n * 7) % 5
+    body = " ".join(["The keys feel great and the build quality is solid."] * (1 + n % 4))
+    return f"""
+<div id="R{asin[-4:]}{n:06d}" data-hook="review" class="a-section review">
+  <span class="a-profile-name">Reviewer {n}</span>
+  <i data-hook="review-star-rating"><span class="a-icon-alt">{rating}.0 out of 5 stars</span></i>
+  <a data-hook="review-title"><span class="a-icon-alt">{rating}.0 out of 5 stars</span><span>Review title {n}</span></a>
+  <span data-hook="review-date">Reviewed in the United States on March {1 + n % 28}, 2024</span>
+  <span data-hook="avp-badge">Verified Purchase</span>
+  <span data-hook="review-body"><span>{html_lib.escape(body)}<br>Posted review #{n}.</span></span>
+  <span data-hook="helpful-vote-statement">{n % 30} people found this helpful</span>
+</div>"""
+
+
+def write_synthetic_fixtures(out_dir: str, asin: str, pages: int = 5, reviews_per_page: int = 10) -> FixtureStore:
+    """Generates an Amazon-shaped product page and `pages` review pages for `asin`."""
+    store = FixtureStore(out_dir)
+    store.put(f"/dp/{asin}", f"""<html><body>
+<span id="productTitle"> Synthetic Keyboard {asin} </span>
+<span class="a-price-whole">79.</span>
+<div id="feature-bullets"><ul>{''.join(f'<li><span>Feature {i}</span></li>' for i in range(1, 6))}</ul></div>
+<table id="productDetails_techSpec_section_1"><tr><th>Brand</th><td>Synthetic</td></tr></table>
+</body></html>""")
+    for page in range(1, pages + 1):
+        reviews = "".join(_synthetic_review(asin, (page - 1) * reviews_per_page + i)
+                          for i in range(1, reviews_per_page + 1))
+        last = ' a-disabled' if page == pages else ''
+        store.put(f"/product-reviews/{asin}/?pageNumber={page}", f"""<html><body>
+<div id="cm_cr-review_list">{reviews}</div>
+<ul class="a-pagination"><li class="a-last{last}"><a href="?pageNumber={page + 1}">Next page</a></li></ul>
+</body></html>""")
+    store.save()
+    return store
+
+
+class ReplayServer:
+    """
+    Serves a fixture directory over HTTP on localhost, in a background thread.
+    latency (+/- jitter) seconds is added to every response; error_rate of requests get a 503 and
+    captcha_rate get a captcha page, drawn from a seeded RNG so runs are reproducible.
+    """
+    def __init__(self, fixture_dir: str, port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, captcha_rate: float = 0.0, seed: Optional[int] = 0):
+        self.store = FixtureStore(fixture_dir)
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.captcha_rate = captcha_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "served": 0, "not_found": 0, "errors": 0, "captchas": 0}
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def _respond(self, path: str):
+        """Decides (status, body) for one request and sleeps for the simulated latency."""
+        with self._lock:
+            self.stats["requests"] += 1
+            roll = self._random.random()
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+        time.sleep(delay)
+        if roll < self.error_rate:
+            kind, status, body = "errors", 503, "<html><body>Service Unavailable</body></html>"
+        elif roll < self.error_rate + self.captcha_rate:
+            kind, status, body = "captchas", 200, CAPTCHA_HTML
+        else:
+            body = self.store.get(fixture_key(path))
+            kind, status = ("served", 200) if body is not None else ("not_found", 404)
+            body = body if body is not None else "<html><body>Not Found</body></html>"
+        with self._lock:
+            self.stats[kind] += 1
+        return status, body
+
+    def start(self) -> str:
+        replay = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, body = replay._respond(self.path)
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "ReplayServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self.stop()
+        return False
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Record, generate or serve offline Amazon page fixtures.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record", help="Record live pages for ASINs")
+    rec.add_argument("asins", nargs="+")
+    rec.add_argument("--pages", type=int, default=5)
+    rec.add_argument("--out", default="fixtures")
+    syn = sub.add_parser("synthetic", help="Generate Amazon-shaped pages")
+    syn.add_argument("asins", nargs="+")
+    syn.add_argument("--pages", type=int, default=5)
+    syn.add_argument("--reviews-per-page", type=int, default=10)
+    syn.add_argument("--out", default="fixtures")
+    srv = sub.add_parser("serve", help="Serve a fixture directory")
+    srv.add_argument("fixtures")
+    srv.add_argument("--port", type=int, default=8765)
+    srv.add_argument("--latency", type=float, default=0.0)
+    srv.add_argument("--jitter", type=float, default=0.0)
+    srv.add_argument("--error-rate", type=float, default=0.0)
+    srv.add_argument("--captcha-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        import scraper
+        from session_store import SessionStore
+        store = SessionStore()
+        recorder = FixtureRecorder(scraper.get_fetch_engine(store, scraper.get_driver_pool()), out_dir=args.out)
+        for asin in args.asins:
+            print(f"[Recorder]: {asin}: {recorder.record_asin(asin, pages=args.pages)} pages saved")
+    elif args.command == "synthetic":
+        for asin in args.asins:
+            write_synthetic_fixtures(args.out, asin, pages=args.pages, reviews_per_page=args.reviews_per_page)
+        print(f"[Replay]: Wrote synthetic fixtures for {len(args.asins)} ASINs to {args.out}")
+    else:
+        server = ReplayServer(args.fixtures, port=args.port, latency=args.latency, jitter=args.jitter,
+                              error_rate=args.error_rate, captcha_rate=args.captcha_rate, seed=None)
+        print(f"[Replay]: Serving {args.fixtures} at {server.start()} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.stop()
+            print(f"[Replay]: {server.stats}")
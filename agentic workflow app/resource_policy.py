@@ -0,0 +1,192 @@
+"""
+Resource policy for the scraping browsers.
+
+We only read text from review cards and the product title, so images, media, fonts and
+third-party (ad/tracking) scripts are pure overhead. ResourcePolicy cuts them at three levels:
+  - Chrome prefs: no images, notifications, popups or plugins (headless drivers only, since
+    a person logging in by hand may need to see a captcha image),
+  - a host-resolver allow-list: hosts outside allowed_domains never resolve, which drops
+    third-party scripts and ad frames before any bytes are sent,
+  - DevTools Network.setBlockedURLs: images/media/fonts by URL pattern, including on the
+    allow-listed Amazon CDNs.
+The allow-list is fixed when Chrome starts, so a manual login (whose captcha and auth assets may
+come from other hosts) runs in a separate browser started without it; see
+SessionStore.ensure_login(). page_traffic() reads Chrome's performance log (measure=True) to
+report the bytes each page downloaded, and compare() loads the same URL with and without the policy.
+"""
+import json
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+
+# Hosts Amazon review and product pages need to render (HTML, CSS, the JS that renders reviews)
+DEFAULT_ALLOWED_DOMAINS = (
+    "amazon.com", "*.amazon.com",
+    "*.media-amazon.com", "*.ssl-images-amazon.com",
+    "localhost", "127.0.0.1",
+)
+
+IMAGE_PATTERNS = ("*.jpg*", "*.jpeg*", "*.png*", "*.gif*", "*.webp*", "*.svg*", "*.ico*", "*.avif*")
+MEDIA_PATTERNS = ("*.mp4*", "*.webm*", "*.m3u8*", "*.ts?*", "*.mp3*", "*.m4a*")
+FONT_PATTERNS = ("*.woff*", "*.ttf*", "*.otf*", "*.eot*")
+
+# Patterns currently applied to each driver, so unblocked() can lift and restore them
+_applied: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+# Policy each driver was started with, so callers can tell whether it resolves only allowed hosts
+_policies: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+class ResourcePolicy:
+    """Which resources the scraping browser may load. Apply with apply_to_options() before start and apply_to_driver() after."""
+    def __init__(self, block_images: bool = True, block_media: bool = True, block_fonts: bool = True,
+                 allowed_domains: Optional[Sequence[str]] = DEFAULT_ALLOWED_DOMAINS,
+                 extra_blocked: Sequence[str] = (), measure: bool = False):
+        self.block_images = block_images
+        self.block_media = block_media
+        self.block_fonts = block_fonts
+        self.allowed_domains = tuple(allowed_domains) if allowed_domains else None  # None: any host
+        self.extra_blocked = tuple(extra_blocked)
+        # Performance logging buffers every network event until page_traffic() drains it,
+        # so only turn it on where the log is read
+        self.measure = measure
+
+    @classmethod
+    def off(cls, measure: bool = False) -> "ResourcePolicy":
+        """A policy that blocks nothing (the baseline for compare())."""
+        return cls(block_images=False, block_media=False, block_fonts=False, allowed_domains=None, measure=measure)
+
+    def blocked_patterns(self) -> List[str]:
+        patterns = list(self.extra_blocked)
+        if self.block_images:
+            patterns += IMAGE_PATTERNS
+        if self.block_media:
+            patterns += MEDIA_PATTERNS
+        if self.block_fonts:
+            patterns += FONT_PATTERNS
+        return patterns
+
+    def apply_to_options(self, options, headless: bool = False) -> None:
+        """Adds the Chrome prefs, host allow-list and performance logging to ChromeOptions."""
+        prefs = {
+            "profile.managed_default_content_settings.notifications": 2,
+            "profile.managed_default_content_settings.popups": 2,
+            "profile.managed_default_content_settings.plugins": 2,
+            "profile.managed_default_content_settings.geolocation": 2,
+        }
+        if self.block_images and headless:
+            prefs["profile.managed_default_content_settings.images"] = 2
+        options.add_experimental_option("prefs", prefs)
+        if self.allowed_domains:
+            rules = ", ".join(["MAP * ~NOTFOUND"] + [f"EXCLUDE {d}" for d in self.allowed_domains])
+            options.add_argument(f"--host-resolver-rules={rules}")
+        if self.measure:
+            options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+    def apply_to_driver(self, driver) -> None:
+        """Installs the URL-pattern blocklist through DevTools on a started driver."""
+        _policies[driver] = self
+        patterns = self.blocked_patterns()
+        if not patterns:
+            return
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+        _applied[driver] = patterns
+
+
+def restricts_hosts(driver) -> bool:
+    """Whether the driver was started with a host allow-list (which cannot be lifted while it runs)."""
+    policy = _policies.get(driver)
+    return bool(policy is not None and policy.allowed_domains)
+
+
+@contextmanager
+def unblocked(driver):
+    """
+    Temporarily lifts the DevTools blocklist (images/media/fonts). The host allow-list and the
+    headless image pref stay in force; use a driver started without them where that matters.
+    """
+    patterns = _applied.get(driver)
+    if patterns:
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": []})
+    try:
+        yield
+    finally:
+        if patterns:
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+
+
+def page_traffic(driver) -> Optional[Dict]:
+    """
+    Sums the network traffic logged since the previous call (so call it once per page):
+    bytes over the wire, finished requests and requests the policy blocked. Returns None
+    if the driver was started without performance logging.
+    """
+    try:
+        entries = driver.get_log("performance")
+    except Exception:
+        return None
+    traffic = {"bytes": 0, "requests": 0, "blocked": 0, "failed": 0}
+    for entry in entries:
+        message = json.loads(entry["message"])["message"]
+        method, params = message.get("method"), message.get("params", {})
+        if method == "Network.loadingFinished":
+            traffic["requests"] += 1
+            traffic["bytes"] += int(params.get("encodedDataLength", 0))
+        elif method == "Network.loadingFailed":
+            if params.get("blockedReason") or "NAME_NOT_RESOLVED" in params.get("errorText", ""):
+                traffic["blocked"] += 1
+            else:
+                traffic["failed"] += 1
+    return traffic
+
+
+def compare(url: str, policy: Optional[ResourcePolicy] = None, headless: bool = True,
+            repeats: int = 2) -> Dict[str, Dict]:
+    """Loads `url` in a fresh Chrome with no policy and with `policy`, and reports bytes, requests and load time for each."""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    results = {}
+    for name, candidate in (("before", ResourcePolicy.off()), ("after", policy or ResourcePolicy())):
+        options = Options()
+        if headless:
+            options.add_argument("--headless=new")
+        candidate.apply_to_options(options, headless=headless)
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})  # Read by page_traffic() below
+        driver = webdriver.Chrome(options=options)
+        try:
+            candidate.apply_to_driver(driver)
+            runs = []
+            for _ in range(repeats):
+                driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+                page_traffic(driver)  # Drop log entries from the previous load
+                start = time.perf_counter()
+                driver.get(url)
+                seconds = time.perf_counter() - start
+                runs.append(dict(page_traffic(driver) or {}, seconds=round(seconds, 3)))
+            results[name] = {
+                "bytes": min(r["bytes"] for r in runs),
+                "requests": min(r["requests"] for r in runs),
+                "blocked": max(r["blocked"] for r in runs),
+                "best_seconds": min(r["seconds"] for r in runs),
+            }
+        finally:
+            driver.quit()
+    return results
+
+
+def print_comparison(results: Dict[str, Dict]) -> None:
+    for name, r in results.items():
+        print(f"{name:<8}{r['bytes'] / 1024:>10.0f} KB{r['requests']:>6} requests"
+              f"{r['blocked']:>6} blocked{r['best_seconds']:>8.2f}s")
+    before, after = results.get("before"), results.get("after")
+    if before and after and before["bytes"]:
+        print(f"saved {100 * (1 - after['bytes'] / before['bytes']):.0f}% of bytes, "
+              f"{before['best_seconds'] - after['best_seconds']:.2f}s per page")
+
+
+if __name__ == "__main__":
+    # Usage: python resource_policy.py https://www.amazon.com/product-reviews/<ASIN>/
+    import sys
+    print_comparison(compare(sys.argv[1]))
@@ -0,0 +1,238 @@
+"""
+Token-budgeted chunking of review records for LLM summarization.
+
+chunk_reviews() packs whole reviews, in order, into chunks of at most max_tokens in one linear
+pass; a review is never cut in half (one longer than the whole budget gets a chunk of its own,
+truncated). Overlap is by whole reviews: each chunk can repeat the last few reviews of the one
+before it. Tokens are counted with tiktoken when it is installed, otherwise estimated from length.
+
+With content_defined=True, where a chunk ends is decided by the reviews themselves (a hash of
+each review picks the boundaries), not by their position, so new reviews only change the chunks
+they land in. Every chunk carries a key hashed from its member reviews' ids and text, which is
+what incremental re-summarization looks summaries up by.
+
+Benchmark against the old character splitter on a synthetic corpus:
+    python review_chunker.py --reviews 50000 --max-tokens 1000
+"""
+import hashlib
+import time
+from typing import Callable, Dict, List
+
+from llm_pool import estimate_tokens
+
+TOKENIZER_ENCODING = "o200k_base"  # gpt-4o / gpt-5 family
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """tiktoken encoding, or None if tiktoken (or its BPE file) is unavailable."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+        except Exception as e:  # Not installed, or offline on first use
+            print(f"[Chunker]: tiktoken unavailable ({type(e).__name__}), estimating tokens from length")
+    return _encoding
+
+
+def count_tokens_batch(texts: List[str]) -> List[int]:
+    encoding = _get_encoding()
+    if encoding is None:
+        return [estimate_tokens(t) for t in texts]
+    return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+
+
+def count_tokens(text: str) -> int:
+    return count_tokens_batch([text])[0]
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    return encoding.decode(encoding.encode_ordinary(text)[:max_tokens])
+
+
+def content_boundary(fingerprint: str, tokens: int, target_tokens: int) -> bool:
+    """
+    Whether a chunk ends after the item with this fingerprint (hex digest). Decided by the item
+    alone, with a chance proportional to its size, so chunks average about target_tokens.
+    """
+    return int(fingerprint[:12], 16) / 16 ** 12 < tokens / max(target_tokens, 1)
+
+
+def review_fingerprint(review: Dict, text: str) -> str:
+    return hashlib.sha1(f"{review.get('review_id', '')}\x1f{text}".encode("utf-8")).hexdigest()
+
+
+def format_review(review: Dict) -> str:
+    """The review layout the Massager pipeline feeds to the LLM (with how often it was posted,
+    for a review that review_dedup collapsed from duplicates)."""
+    count = review.get("multiplicity", 1)
+    posted = f"Posted {count} times\n" if count > 1 else ""
+    return (f"Rating: {review.get('rating', 'N/A')}/5\nTitle: {review.get('review_title', '')}\n{posted}"
+            f"{review.get('review_body', '')}")
+
+
+def chunk_reviews(reviews: List[Dict], max_tokens: int = 1000, overlap_reviews: int = 0,
+                  formatter: Callable[[Dict], str] = format_review, separator: str = "\n\n",
+                  content_defined: bool = False) -> List[Dict]:
+    """
+    Packs consecutive reviews into chunks of at most max_tokens.
+
+    Returns one dict per chunk: text, tokens, key (hash of the member reviews) and start/end
+    indices into `reviews` (end exclusive; overlapping reviews are included in the range).
+    Overlap reviews are only carried over while they take up at most half the budget, so every
+    chunk adds new reviews. content_defined=True also ends chunks at content boundaries
+    (about 3/4 of max_tokens apart) so they stay put when reviews are added.
+    """
+    texts = [formatter(r) for r in reviews]
+    sizes = count_tokens_batch(texts)
+    sep_tokens = count_tokens(separator) if texts else 0
+    prints = [review_fingerprint(r, t) for r, t in zip(reviews, texts)]
+
+    chunks: List[Dict] = []
+    start = 0
+    size = 0
+
+    def close(end: int) -> None:
+        chunk_texts = texts[start:end]
+        tokens = size
+        if end - start == 1 and sizes[start] > max_tokens:
+            chunk_texts = [truncate_to_tokens(texts[start], max_tokens)]
+            tokens = max_tokens
+        key = hashlib.sha256("".join(prints[start:end]).encode("ascii")).hexdigest()
+        chunks.append({"start": start, "end": end, "tokens": tokens, "key": key,
+                       "text": separator.join(chunk_texts)})
+
+    for i, tokens in enumerate(sizes):
+        added = tokens + (sep_tokens if i > start else 0)
+        cut = i > start and size + added > max_tokens
+        if not cut and content_defined and i > start:
+            cut = content_boundary(prints[i - 1], sizes[i - 1], 3 * max_tokens // 4)
+        if cut:
+            close(i)
+            # Carry the last few reviews over as context, if they leave room for review i
+            new_start, carried = i, 0
+            while (new_start > start + 1 and i - new_start < overlap_reviews
+                   and carried + sizes[new_start - 1] + sep_tokens <= max_tokens // 2
+                   and carried + sizes[new_start - 1] + sep_tokens + tokens <= max_tokens):
+                new_start -= 1
+                carried += sizes[new_start] + sep_tokens
+            start, size = new_start, max(0, carried - sep_tokens)
+            added = tokens + (sep_tokens if i > start else 0)
+        size += added
+    if start < len(texts):
+        close(len(texts))
+    return chunks
+
+
+def _char_chunks(text: str, chunk_size: int = 3000, overlap: int = 200) -> List[str]:
+    """The former character-based splitter of the Massager pipeline, for the benchmark."""
+    if len(text) <= chunk_size:
+        return [text]
+    chunks, start = [], 0
+    while start < len(text):
+        end = start + chunk_size
+        if end < len(text):
+            sentence_end = max(text.rfind('.', start, end), text.rfind('!', start, end), text.rfind('?', start, end))
+            if sentence_end > start:
+                end = sentence_end + 1
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = end - overlap
+        if start >= len(text):
+            break
+    return chunks
+
+
+def synthetic_reviews(n: int, seed: int = 0) -> List[Dict]:
+    """Amazon-like reviews of varied length for benchmarks."""
+    import random
+    rng = random.Random(seed)
+    phrases = ["The massager feels sturdy.", "Battery life is great!", "The matte black finish looks sleek.",
+               "It stopped working after a week.", "Really helps my sore shoulders.", "Too loud for my taste.",
+               "The carrying case is a nice touch.", "Heads are easy to swap?", "Customer service was slow.",
+               "Worth every penny, would buy again."]
+    reviews = []
+    for i in range(n):
+        body = " ".join(rng.choice(phrases) for _ in range(int(rng.expovariate(1 / 8)) + 1))
+        reviews.append({"review_id": f"R{i:07d}", "rating": rng.randint(1, 5),
+                        "review_title": rng.choice(["Love it", "Meh", "Great value", "Broke fast"]),
+                        "review_body": body})
+    return reviews
+
+
+def benchmark(n_reviews: int = 50000, max_tokens: int = 1000, overlap_reviews: int = 0,
+              chunk_size: int = 3000, overlap_chars: int = 200) -> Dict:
+    reviews = synthetic_reviews(n_reviews)
+    text = "\n\n".join(format_review(r) for r in reviews)
+    count_tokens("warm up")  # Load the encoding outside the timings
+
+    start = time.perf_counter()
+    old = _char_chunks(text, chunk_size=chunk_size, overlap=overlap_chars)
+    old_seconds = time.perf_counter() - start
+    old_tokens = count_tokens_batch(old)
+    # A chunk ends mid-review unless it ends with a whole review body
+    bodies = {r["review_body"] for r in reviews}
+    old_cut = sum(1 for c in old[:-1] if c.rsplit("\n", 1)[-1] not in bodies)
+
+    start = time.perf_counter()
+    new = chunk_reviews(reviews, max_tokens=max_tokens, overlap_reviews=overlap_reviews)
+    new_seconds = time.perf_counter() - start
+    new_tokens = [c["tokens"] for c in new]
+    corpus_tokens = count_tokens(text)
+
+    start = time.perf_counter()
+    stable = chunk_reviews(reviews, max_tokens=max_tokens, overlap_reviews=overlap_reviews, content_defined=True)
+    stable_seconds = time.perf_counter() - start
+
+    # A refresh: 5 new reviews in front (incremental scraping merges them there). Chunks whose
+    # key is unchanged keep their summary; the rest would be re-summarized.
+    refreshed = synthetic_reviews(5, seed=1) + reviews
+    old_refreshed = set(_char_chunks("\n\n".join(format_review(r) for r in refreshed),
+                                     chunk_size=chunk_size, overlap=overlap_chars))
+    reused = {
+        "chars": sum(1 for c in old if c in old_refreshed),
+        "reviews_packed": len({c["key"] for c in new} & {c["key"] for c in chunk_reviews(
+            refreshed, max_tokens=max_tokens, overlap_reviews=overlap_reviews)}),
+        "content_defined": len({c["key"] for c in stable} & {c["key"] for c in chunk_reviews(
+            refreshed, max_tokens=max_tokens, overlap_reviews=overlap_reviews, content_defined=True)}),
+    }
+
+    def describe(name: str, seconds: float, sizes: List[int], cut: int) -> Dict:
+        return {"seconds": round(seconds, 3), "chunks": len(sizes), "tokens_total": sum(sizes),
+                "overlap_tokens": sum(sizes) - corpus_tokens, "tokens_min": min(sizes),
+                "tokens_mean": round(sum(sizes) / len(sizes)), "tokens_max": max(sizes),
+                "reviews_cut": cut, "reused_after_refresh": reused[name]}
+
+    return {"reviews": n_reviews, "corpus_tokens": corpus_tokens,
+            "tokenizer": "tiktoken " + TOKENIZER_ENCODING if _get_encoding() else "length estimate",
+            "chars": describe("chars", old_seconds, old_tokens, old_cut),
+            "reviews_packed": describe("reviews_packed", new_seconds, new_tokens, 0),
+            "content_defined": describe("content_defined", stable_seconds, [c["tokens"] for c in stable], 0)}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark review chunking on a synthetic corpus.")
+    parser.add_argument("--reviews", type=int, default=50000)
+    parser.add_argument("--max-tokens", type=int, default=1000)
+    parser.add_argument("--overlap-reviews", type=int, default=0)
+    args = parser.parse_args()
+
+    report = benchmark(args.reviews, max_tokens=args.max_tokens, overlap_reviews=args.overlap_reviews)
+    print(f"[Chunker]: {report['reviews']:,} reviews, {report['corpus_tokens']:,} tokens ({report['tokenizer']})")
+    print(f"{'chunker':<16}{'seconds':>9}{'chunks':>8}{'overlap tok':>13}{'min':>7}{'mean':>7}{'max':>7}{'cut':>7}"
+          f"{'reused':>9}")
+    for name in ("chars", "reviews_packed", "content_defined"):
+        r = report[name]
+        print(f"{name:<16}{r['seconds']:>9}{r['chunks']:>8}{r['overlap_tokens']:>13,}{r['tokens_min']:>7}"
+              f"{r['tokens_mean']:>7}{r['tokens_max']:>7}{r['reviews_cut']:>7}{r['reused_after_refresh']:>9}")
+    print("reused = chunks whose summary is still valid after 5 new reviews are merged in front")
@@ -0,0 +1,199 @@
+"""
+Collapses near-duplicate reviews before any of them are sent to an LLM.
+
+Scraped review sets repeat themselves: the same review shows up on several pages or product
+variants, and copy-pasted or templated reviews differ only in punctuation, case or a few words.
+dedup_reviews() normalizes every review (lowercase, letters and digits only), drops exact repeats,
+and compares the rest by MinHash signatures of their word 3-gram shingles. LSH banding (the
+signature cut into bands; reviews sharing any whole band become candidates) keeps this close to
+linear in the number of reviews; candidates whose estimated Jaccard similarity reaches the
+threshold are merged.
+
+Each group comes back as one representative review (the most helpful, then the longest) with a
+"multiplicity" count, so sentiment and rating figures can still weight it by how often it was
+posted. The report says how many reviews and prompt tokens the collapse saved.
+
+    python review_dedup.py ../Massager/data/customer_reviews.json
+    python review_dedup.py --synthetic 50000
+"""
+import json
+import re
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from review_chunker import count_tokens_batch
+from sentiment_scorer import review_text
+
+SHINGLE_WORDS = 3     # Words per shingle
+NUM_PERM = 128        # MinHash functions (signature length)
+BANDS = 16            # LSH bands of NUM_PERM // BANDS rows: pairs above ~0.7 Jaccard become candidates
+THRESHOLD = 0.8       # Estimated Jaccard similarity at which two reviews count as the same review
+
+_PRIME = (1 << 31) - 1  # a * h + b stays below 2**63 for 32-bit shingle hashes
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase words and digits separated by single spaces."""
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def shingles(normalized: str, k: int = SHINGLE_WORDS) -> np.ndarray:
+    """32-bit hashes of the text's distinct word k-grams (the whole text if it is shorter)."""
+    words = normalized.split()
+    grams = {" ".join(words[i:i + k]) for i in range(max(len(words) - k + 1, 1))}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+def minhash_signatures(shingle_sets: List[np.ndarray], num_perm: int = NUM_PERM, seed: int = 0,
+                       block: int = 2000) -> np.ndarray:
+    """(reviews x num_perm) MinHash signatures under the hashes (a * h + b) mod p."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _PRIME, size=(num_perm, 1), dtype=np.uint64)
+    b = rng.integers(0, _PRIME, size=(num_perm, 1), dtype=np.uint64)
+    signatures = np.empty((len(shingle_sets), num_perm), dtype=np.uint64)
+    # Blocks of reviews keep the (num_perm x shingles) matrix small at any corpus size
+    for start in range(0, len(shingle_sets), block):
+        sets = shingle_sets[start:start + block]
+        hashes = np.concatenate(sets) % _PRIME
+        offsets = np.cumsum([0] + [len(s) for s in sets[:-1]])
+        signatures[start:start + len(sets)] = np.minimum.reduceat((a * hashes + b) % _PRIME, offsets, axis=1).T
+    return signatures
+
+
+def _find(parent: List[int], i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def near_duplicate_groups(signatures: np.ndarray, bands: int = BANDS, threshold: float = THRESHOLD) -> List[int]:
+    """Group id (the index of one member) of every signature row, via LSH banding + union-find."""
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    parent = list(range(n))
+    for band in range(bands):
+        # Each row's band as one opaque value, so np.unique buckets them in C
+        chunk = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        keys = chunk.view(np.dtype((np.void, chunk.dtype.itemsize * rows))).ravel()
+        _, first_idx, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        bucket_first = first_idx[inverse.ravel()]
+        for i in np.flatnonzero(bucket_first != np.arange(n)).tolist():
+            first = int(bucket_first[i])
+            root_i, root_first = _find(parent, i), _find(parent, first)
+            if root_i == root_first:
+                continue
+            if np.mean(signatures[i] == signatures[first]) >= threshold:
+                parent[root_i] = root_first
+    return [_find(parent, i) for i in range(n)]
+
+
+def _helpful(review: Any) -> int:
+    return int(review.get("helpful_count") or 0) if isinstance(review, dict) else 0
+
+
+def dedup_reviews(reviews: List[Any], text: Optional[Callable[[Any], str]] = None,
+                  render: Optional[Callable[[Any], str]] = None, threshold: float = THRESHOLD,
+                  product: str = "") -> Tuple[List[Any], Dict]:
+    """
+    One representative per group of (near-)duplicate reviews, in order of first appearance, and
+    a report. Reviews may be dicts or plain strings; `text` gives what is compared (default: title
+    and body), `render` what would be sent to the LLM (default: `text`), for the token counts.
+
+    Dict representatives are copies carrying "multiplicity" (how many reviews they stand for, the
+    counts of reviews passed in already collapsed adding up). report["multiplicity"] lists the
+    counts for any kind of review.
+    """
+    text = text or (lambda r: r if isinstance(r, str) else review_text(r))
+    render = render or text
+    weights = [r.get("multiplicity", 1) if isinstance(r, dict) else 1 for r in reviews]
+
+    # Exact repeats (after normalization) never need a signature
+    first_of: Dict[str, int] = {}
+    exact = [first_of.setdefault(normalize(text(r)), i) for i, r in enumerate(reviews)]
+    distinct = list(first_of.values())
+    signatures = minhash_signatures([shingles(t) for t in first_of])
+    near = near_duplicate_groups(signatures, threshold=threshold)
+    group_of = {d: distinct[near[j]] for j, d in enumerate(distinct)}
+
+    groups: Dict[int, List[int]] = {}
+    for i, e in enumerate(exact):
+        groups.setdefault(group_of[e], []).append(i)
+
+    representatives: List[Any] = []
+    multiplicity: List[int] = []
+    for members in sorted(groups.values(), key=lambda m: m[0]):
+        best = max(members, key=lambda i: (_helpful(reviews[i]), len(text(reviews[i])), -i))
+        count = sum(weights[i] for i in members)
+        rep = reviews[best]
+        if isinstance(rep, dict):
+            rep = dict(rep, multiplicity=count)
+        representatives.append(rep)
+        multiplicity.append(count)
+
+    tokens_before = sum(count_tokens_batch([render(r) for r in reviews]))
+    tokens_after = sum(count_tokens_batch([render(r) for r in representatives]))
+    report = {
+        "product": product,
+        "reviews": len(reviews),
+        "unique": len(representatives),
+        "collapsed": len(reviews) - len(representatives),
+        "exact_duplicates": len(reviews) - len(distinct),
+        "near_duplicates": len(distinct) - len(representatives),
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": tokens_before - tokens_after,
+        "multiplicity": multiplicity,
+    }
+    return representatives, report
+
+
+def print_report(report: Dict, prefix: str = "[Dedup]: ") -> None:
+    saved = report["tokens_saved"]
+    share = 100 * saved / report["tokens_before"] if report["tokens_before"] else 0.0
+    name = f"{report['product']}: " if report["product"] else ""
+    print(f"{prefix}{name}{report['reviews']:,} reviews -> {report['unique']:,} unique "
+          f"({report['exact_duplicates']:,} exact, {report['near_duplicates']:,} near duplicates collapsed), "
+          f"{saved:,} of {report['tokens_before']:,} tokens saved ({share:.0f}%)")
+
+
+def synthetic_duplicated_reviews(n: int, duplicate_share: float = 0.3, seed: int = 0) -> List[Dict]:
+    """synthetic_reviews() where duplicate_share of the reviews repeat an earlier one, often lightly edited."""
+    import random
+    from review_chunker import synthetic_reviews
+
+    rng = random.Random(seed)
+    reviews = synthetic_reviews(n, seed=seed)
+    for i in range(1, n):
+        if rng.random() < duplicate_share:
+            source = reviews[rng.randrange(i)]
+            body = source["review_body"]
+            if rng.random() < 0.5:
+                body = body.upper() if rng.random() < 0.3 else body.replace(".", "!") + " "
+            reviews[i] = dict(source, review_id=reviews[i]["review_id"], review_body=body)
+    return reviews
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Collapse near-duplicate reviews (MinHash + LSH).")
+    parser.add_argument("path", nargs="?", help="customer_reviews.json")
+    parser.add_argument("--synthetic", type=int, default=0, help="Deduplicate N synthetic reviews instead")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        reviews = synthetic_duplicated_reviews(args.synthetic)
+    else:
+        with open(args.path or "data/customer_reviews.json", "r", encoding="utf-8") as f:
+            reviews = json.load(f)
+
+    start = time.perf_counter()
+    unique, report = dedup_reviews(reviews, threshold=args.threshold, product=args.path or "synthetic")
+    print(f"[Dedup]: {time.perf_counter() - start:.2f}s")
+    print_report(report)
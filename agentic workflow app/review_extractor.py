@@ -0,0 +1,308 @@
+"""
+Review extraction for Amazon review pages.
+
+extract_review_data() is the original per-element path: every field is a separate
+find_element call, i.e. one chromedriver HTTP roundtrip each (~8 per review).
+extract_reviews_js() pulls every review on the page in a single execute_script call, and
+extract_reviews_html() parses a page_source string locally with lxml. All three return the
+same dict schema.
+"""
+import re
+import time
+from typing import Callable, Dict, List, Optional
+
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import NoSuchElementException
+
+from tracing import hook_execute
+
+REVIEW_SELECTOR = '[data-hook="review"]'
+
+# Runs in the page: collects the raw text of every field for every review in one roundtrip.
+# Selectors mirror the ones used by extract_review_data().
+EXTRACT_REVIEWS_JS = """
+const selector = arguments[0];
+const text = (root, sel) => {
+    const el = root.querySelector(sel);
+    return el ? (el.innerText || el.textContent || '') : null;
+};
+return Array.from(document.querySelectorAll(selector)).map(el => {
+    const rating = el.querySelector('[data-hook="review-star-rating"], .a-icon-alt, span.a-icon-alt');
+    return {
+        id: el.id || '',
+        rating: rating ? (rating.textContent || rating.innerText || '') : null,
+        title: text(el, '[data-hook="review-title"] span:not(.a-icon-alt)'),
+        body: text(el, '[data-hook="review-body"] span'),
+        name: text(el, '.a-profile-name, [data-hook="review-author"]'),
+        date: text(el, '[data-hook="review-date"]'),
+        verified: !!el.querySelector('[data-hook="avp-badge"]'),
+        helpful: text(el, '[data-hook="helpful-vote-statement"]'),
+    };
+});
+"""
+
+
+def normalize_review(raw: Dict, review_index: int) -> Optional[Dict]:
+    """Turns the raw field texts of one review into the customer_reviews.json schema."""
+    rating = None
+    rating_match = re.search(r'(\d+)', raw.get("rating") or "")
+    if rating_match:
+        rating = int(rating_match.group(1))
+
+    review_date = (raw.get("date") or "").strip()
+    date_match = re.search(r'(\w+\s+\d+,\s+\d{4})', review_date)
+    if date_match:
+        review_date = date_match.group(1)
+
+    helpful_count = 0
+    helpful_match = re.search(r'(\d+)', raw.get("helpful") or "")
+    if helpful_match:
+        helpful_count = int(helpful_match.group(1))
+
+    review_title = (raw.get("title") or "").strip()
+    review_body = (raw.get("body") or "").strip()
+    if not (review_body or review_title):
+        return None
+
+    return {
+        "review_id": raw.get("id") or f"review_{review_index}",
+        "rating": rating,
+        "review_title": review_title,
+        "review_body": review_body,
+        "reviewer_name": (raw.get("name") or "").strip() or "Anonymous",
+        "review_date": review_date,
+        "verified_purchase": bool(raw.get("verified")),
+        "helpful_count": helpful_count
+    }
+
+
+def extract_reviews_js(driver, selector: str = REVIEW_SELECTOR, start_index: int = 1) -> List[Dict]:
+    """Extracts every review on the current page with one execute_script roundtrip."""
+    raw_reviews = driver.execute_script(EXTRACT_REVIEWS_JS, selector) or []
+    reviews = []
+    for i, raw in enumerate(raw_reviews):
+        review = normalize_review(raw, start_index + i)
+        if review:
+            reviews.append(review)
+    return reviews
+
+
+def _has_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# XPath equivalents of the CSS selectors above (lxml needs the optional cssselect package for CSS)
+_XPATHS = {
+    "rating": f'.//*[@data-hook="review-star-rating" or {_has_class("a-icon-alt")}]',
+    "title": f'.//*[@data-hook="review-title"]//span[not({_has_class("a-icon-alt")})]',
+    "body": './/*[@data-hook="review-body"]//span',
+    "name": f'.//*[{_has_class("a-profile-name")} or @data-hook="review-author"]',
+    "date": './/*[@data-hook="review-date"]',
+    "verified": './/*[@data-hook="avp-badge"]',
+    "helpful": './/*[@data-hook="helpful-vote-statement"]',
+}
+
+
+def extract_reviews_html(html: str, start_index: int = 1) -> List[Dict]:
+    """Parses a review page's HTML (e.g. driver.page_source) locally with lxml."""
+    from lxml import html as lxml_html
+
+    tree = lxml_html.fromstring(html)
+    # Keep line breaks inside review bodies, as innerText does
+    for br in tree.iter("br"):
+        br.tail = "\n" + (br.tail or "")
+
+    reviews = []
+    for i, el in enumerate(tree.xpath('//*[@data-hook="review"]')):
+        raw = {"id": el.get("id", "")}
+        for field, xpath in _XPATHS.items():
+            found = el.xpath(xpath)
+            if field == "verified":
+                raw[field] = bool(found)
+            else:
+                raw[field] = found[0].text_content() if found else None
+        review = normalize_review(raw, start_index + i)
+        if review:
+            reviews.append(review)
+    return reviews
+
+
+def html_has_next_page(html: str) -> Optional[bool]:
+    """page_source counterpart of waits.has_next_page()."""
+    from lxml import html as lxml_html
+
+    tree = lxml_html.fromstring(html)
+    last = tree.xpath(f'//*[{_has_class("a-pagination")}]//li[{_has_class("a-last")}]')
+    if not last:
+        return None
+    return not ("a-disabled" in (last[0].get("class") or "").split())
+
+
+def extract_rating_from_review(review_element) -> Optional[int]:
+    """Extract star rating from review element."""
+    try:
+        rating_elem = review_element.find_element(
+            By.CSS_SELECTOR, '[data-hook="review-star-rating"], .a-icon-alt, span.a-icon-alt'
+        )
+        rating_text = rating_elem.get_attribute('textContent') or rating_elem.text
+        rating_match = re.search(r'(\d+)', rating_text)
+        if rating_match:
+            return int(rating_match.group(1))
+    except NoSuchElementException:
+        pass
+    return None
+
+
+def extract_review_data(review_element, review_index: int) -> Optional[Dict]:
+    """Extract all data from a single review element."""
+    try:
+        review_id = review_element.get_attribute('id') or f"review_{review_index}"
+        rating = extract_rating_from_review(review_element)
+
+        # Review title
+        try:
+            title_elem = review_element.find_element(By.CSS_SELECTOR, '[data-hook="review-title"] span:not(.a-icon-alt)')
+            review_title = title_elem.text.strip()
+        except NoSuchElementException:
+            review_title = ""
+
+        # Review body
+        try:
+            body_elem = review_element.find_element(By.CSS_SELECTOR, '[data-hook="review-body"] span')
+            review_body = body_elem.text.strip()
+        except NoSuchElementException:
+            review_body = ""
+
+        # Reviewer name
+        try:
+            name_elem = review_element.find_element(By.CSS_SELECTOR, '.a-profile-name, [data-hook="review-author"]')
+            reviewer_name = name_elem.text.strip()
+        except NoSuchElementException:
+            reviewer_name = "Anonymous"
+
+        # Review date
+        try:
+            date_elem = review_element.find_element(By.CSS_SELECTOR, '[data-hook="review-date"]')
+            review_date = date_elem.text.strip()
+            date_match = re.search(r'(\w+\s+\d+,\s+\d{4})', review_date)
+            if date_match:
+                review_date = date_match.group(1)
+        except NoSuchElementException:
+            review_date = ""
+
+        # Verified purchase
+        verified_purchase = False
+        try:
+            review_element.find_element(By.CSS_SELECTOR, '[data-hook="avp-badge"]')
+            verified_purchase = True
+        except NoSuchElementException:
+            pass
+
+        # Helpful count
+        helpful_count = 0
+        try:
+            helpful_elem = review_element.find_element(By.CSS_SELECTOR, '[data-hook="helpful-vote-statement"]')
+            helpful_match = re.search(r'(\d+)', helpful_elem.text)
+            if helpful_match:
+                helpful_count = int(helpful_match.group(1))
+        except NoSuchElementException:
+            pass
+
+        if review_body or review_title:
+            return {
+                "review_id": review_id,
+                "rating": rating,
+                "review_title": review_title,
+                "review_body": review_body,
+                "reviewer_name": reviewer_name,
+                "review_date": review_date,
+                "verified_purchase": verified_purchase,
+                "helpful_count": helpful_count
+            }
+    except Exception as e:
+        print(f"   ⚠️  Error extracting review data: {e}")
+    return None
+
+
+def extract_reviews_per_element(driver, selector: str = REVIEW_SELECTOR, start_index: int = 1) -> List[Dict]:
+    """Original path: find the review cards, then extract_review_data() on each one."""
+    reviews = []
+    for i, elem in enumerate(driver.find_elements(By.CSS_SELECTOR, selector)):
+        data = extract_review_data(elem, start_index + i)
+        if data:
+            reviews.append(data)
+    return reviews
+
+
+class _CommandCounter:
+    """Counts WebDriver commands (chromedriver roundtrips) issued through driver.execute."""
+    def __init__(self, driver):
+        self.driver = driver
+        self.count = 0
+
+    def __enter__(self):
+        def count(driver_command: str) -> None:
+            self.count += 1
+
+        self._remove = hook_execute(self.driver, count)
+        return self
+
+    def __exit__(self, *exc):
+        self._remove()  # Restores whatever execute was before, e.g. an attached CrawlTrace
+        return False
+
+
+def benchmark_extraction(driver, repeats: int = 3,
+                         paths: Optional[Dict[str, Callable]] = None) -> Dict[str, Dict]:
+    """
+    Times each extraction path on the page currently loaded in `driver` and counts its
+    WebDriver roundtrips. Also reports whether each path's output matches the per-element one.
+    """
+    paths = paths or {
+        "per_element": extract_reviews_per_element,
+        "batched_js": extract_reviews_js,
+        "page_source_lxml": lambda d: extract_reviews_html(d.page_source),
+    }
+    results = {}
+    reference = None
+    for name, extract in paths.items():
+        timings = []
+        for _ in range(repeats):
+            with _CommandCounter(driver) as counter:
+                start = time.perf_counter()
+                reviews = extract(driver)
+                timings.append(time.perf_counter() - start)
+        if reference is None:
+            reference = reviews
+        results[name] = {
+            "reviews": len(reviews),
+            "roundtrips": counter.count,
+            "best_seconds": round(min(timings), 4),
+            "mean_seconds": round(sum(timings) / len(timings), 4),
+            "matches_reference": reviews == reference,
+        }
+    return results
+
+
+def print_benchmark(results: Dict[str, Dict]) -> None:
+    print(f"{'path':<18}{'reviews':>8}{'roundtrips':>12}{'best (s)':>10}{'mean (s)':>10}  matches")
+    for name, r in results.items():
+        print(f"{name:<18}{r['reviews']:>8}{r['roundtrips']:>12}{r['best_seconds']:>10}"
+              f"{r['mean_seconds']:>10}  {r['matches_reference']}")
+
+
+if __name__ == "__main__":
+    # Usage: python review_extractor.py saved_review_page.html
+    import os
+    import sys
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    options = Options()
+    options.add_argument('--headless=new')
+    driver = webdriver.Chrome(options=options)
+    try:
+        driver.get("file://" + os.path.abspath(sys.argv[1]))
+        print_benchmark(benchmark_extraction(driver))
+    finally:
+        driver.quit()
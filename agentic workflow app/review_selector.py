@@ -0,0 +1,205 @@
+"""
+Picks which reviews to send to the LLM when they don't all fit in its budget.
+
+Instead of keeping the first N characters, every review is scored locally (NumPy, no network)
+by TF-IDF weight, with visual/aesthetic terms (colors, materials, shapes, lights, buttons, ...)
+counting visual_boost times as much. Reviews are then taken greedily by score until token_budget
+is full. Each pick discounts the terms it mentions, so the next picks favour reviews that add
+something new rather than repeat the same details.
+
+Benchmark against the current truncation on a synthetic corpus:
+    python review_selector.py --reviews 50000 --chars 15000
+"""
+import heapq
+import re
+import time
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from review_chunker import count_tokens, count_tokens_batch
+
+VISUAL_TERMS = frozenset("""
+black white grey gray silver gold red blue green yellow orange pink purple brown beige cream ivory navy
+color colors colour colours colored colorful tone shade pastel neon matte glossy shiny metallic
+transparent clear translucent frosted chrome
+plastic metal aluminum aluminium steel wood wooden bamboo glass ceramic leather fabric silicone rubber
+cotton foam mesh velvet suede
+shape round square rectangular curved boxy slim thin thick flat compact bulky tall wide narrow sleek
+size large small tiny big heavy lightweight dimensions inches
+texture smooth rough soft textured grippy ribbed
+finish design look looks appearance aesthetic style retro vintage modern minimalist elegant
+beautiful pretty ugly cute stylish premium cheap
+led leds light lights backlight backlit rgb glow display screen
+button buttons knob knobs switch switches keys keycaps strap straps handle lid cap cord cable
+logo label pattern print stripes
+""".split())
+
+_WORD = re.compile(r"[a-z]{3,}")
+
+
+def _words(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+def _term_weights(texts: List[str], boosted: Iterable[str], visual_boost: float
+                  ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """
+    Sparse TF-IDF of the texts as parallel arrays sorted by document: doc index, term index and
+    weight of every (document, term) pair that occurs, plus the vocabulary size.
+    """
+    vocab: Dict[str, int] = {}
+    doc_ids: List[int] = []
+    term_ids: List[int] = []
+    for i, text in enumerate(texts):
+        ids = [vocab.setdefault(w, len(vocab)) for w in _words(text)]
+        term_ids.extend(ids)
+        doc_ids.extend([i] * len(ids))
+    n_terms = max(len(vocab), 1)
+
+    pairs, counts = np.unique(np.asarray(doc_ids, dtype=np.int64) * n_terms + np.asarray(term_ids, dtype=np.int64),
+                              return_counts=True)
+    docs, terms = pairs // n_terms, pairs % n_terms
+    df = np.bincount(terms, minlength=n_terms)
+    idf = np.log((1 + len(texts)) / (1 + df)) + 1.0
+
+    boost = np.ones(n_terms)
+    boost_ids = [vocab[w] for w in boosted if w in vocab]
+    boost[boost_ids] = visual_boost
+    weights = (1.0 + np.log(counts)) * idf[terms] * boost[terms]
+    return docs, terms, weights, n_terms
+
+
+def select_reviews(texts: List[str], token_budget: int = 3500, extra_terms: Iterable[str] = (),
+                   visual_boost: float = 3.0, redundancy_decay: float = 0.5) -> List[int]:
+    """
+    Indices (in original order) of the reviews to keep within token_budget.
+
+    extra_terms are boosted like the visual terms (e.g. words of the product title).
+    redundancy_decay is what a term's weight is multiplied by each time a picked review uses it.
+    """
+    if not texts:
+        return []
+    boosted = set(VISUAL_TERMS) | {w for t in extra_terms for w in _words(t)}
+    docs, terms, weights, n_terms = _term_weights(texts, boosted, visual_boost)
+    sizes = np.asarray(count_tokens_batch(texts)) + 1  # + the line break joining them
+    bounds = np.searchsorted(docs, np.arange(len(texts) + 1))
+    # Longer reviews mention more terms; sqrt keeps them from winning on length alone
+    norm = np.sqrt(sizes)
+    discount = np.ones(n_terms)
+
+    def gain(d: int) -> float:
+        s, e = bounds[d], bounds[d + 1]
+        return float(weights[s:e] @ discount[terms[s:e]]) / norm[d]
+
+    initial = np.bincount(docs, weights=weights, minlength=len(texts)) / norm
+    first: Dict[str, int] = {}
+    duplicate = np.fromiter((first.setdefault(t, i) != i for i, t in enumerate(texts)), bool, len(texts))
+    initial[duplicate] = 0.0
+    # Only the strongest reviews can make it into a budget that holds a few hundred at most
+    pool = max(1000, 20 * token_budget // max(int(np.median(sizes)), 1))
+    candidates = np.flatnonzero(initial > 0)
+    if len(candidates) > pool:
+        candidates = candidates[np.argpartition(-initial[candidates], pool)[:pool]]
+
+    # Lazy greedy: gains only shrink as terms get discounted, so a popped review whose
+    # refreshed gain still beats the next best one is the best pick
+    heap = list(zip((-initial[candidates]).tolist(), candidates.tolist()))
+    heapq.heapify(heap)
+    remaining = token_budget
+    picked: List[int] = []
+    while heap and remaining > 0:
+        _, d = heapq.heappop(heap)
+        if sizes[d] > remaining:
+            continue  # Never fits again: the budget only shrinks
+        g = gain(d)
+        if heap and g < -heap[0][0]:
+            heapq.heappush(heap, (-g, d))
+            continue
+        picked.append(d)
+        remaining -= int(sizes[d])
+        discount[terms[bounds[d]:bounds[d + 1]]] *= redundancy_decay
+    # Reviews without a scoring term ("ok", emoji-only, ...) still fill whatever budget is left
+    for d in np.flatnonzero((initial == 0) & ~duplicate).tolist():
+        if remaining <= 0:
+            break
+        if sizes[d] <= remaining:
+            picked.append(d)
+            remaining -= int(sizes[d])
+    return sorted(picked)
+
+
+def visual_coverage(text: str, corpus_terms: Iterable[str]) -> float:
+    """Share of the visual terms used anywhere in the corpus that also appear in text."""
+    corpus_terms = set(corpus_terms)
+    return len(corpus_terms & set(_words(text))) / max(len(corpus_terms), 1)
+
+
+def synthetic_visual_reviews(n: int, seed: int = 0) -> List[str]:
+    """Reviews where visual details are a minority and rarer ones show up less often (Zipf-like)."""
+    import random
+    rng = random.Random(seed)
+    generic = ["Works as described.", "Arrived on time and well packed.", "Great value for the price.",
+               "Customer service was helpful.", "Stopped working after two weeks.", "Would buy again.",
+               "My kids use it every day.", "Setup took five minutes.", "Not worth the money.",
+               "Does the job, nothing special."]
+    colors = ["black", "white", "grey", "silver", "red", "blue", "beige", "cream", "gold", "navy", "pink", "ivory"]
+    materials = ["plastic", "metal", "aluminum", "glass", "wood", "ceramic", "leather", "fabric", "silicone", "bamboo"]
+    parts = ["buttons", "handle", "lid", "knob", "strap", "cable", "display", "keys", "logo", "backlight"]
+    looks = ["sleek", "boxy", "retro", "minimalist", "glossy", "matte", "curved", "slim", "elegant", "chunky"]
+
+    def zipf(options: List[str]) -> str:
+        return options[min(int(rng.paretovariate(1.2)) - 1, len(options) - 1)]
+
+    reviews = []
+    for _ in range(n):
+        sentences = [rng.choice(generic) for _ in range(rng.randint(1, 5))]
+        if rng.random() < 0.3:
+            sentences.insert(rng.randint(0, len(sentences)),
+                             f"The {zipf(colors)} {zipf(materials)} {zipf(parts)} look {zipf(looks)}.")
+        reviews.append(" ".join(sentences))
+    return reviews
+
+
+def benchmark(n_reviews: int = 50000, char_budget: int = 15000) -> Dict:
+    """Truncating the joined reviews to char_budget vs. selecting the same number of tokens."""
+    reviews = synthetic_visual_reviews(n_reviews)
+    lines = [f"- {r}" for r in reviews]
+    joined = "\n".join(lines)
+    corpus_terms = set(VISUAL_TERMS) & set(_words(joined))
+
+    truncated = joined[:char_budget]
+    token_budget = count_tokens(truncated)
+
+    start = time.perf_counter()
+    picked = select_reviews(lines, token_budget=token_budget)
+    seconds = time.perf_counter() - start
+    selected = "\n".join(lines[i] for i in picked)
+
+    return {
+        "reviews": n_reviews,
+        "visual_terms_in_corpus": len(corpus_terms),
+        "token_budget": token_budget,
+        "truncation": {"reviews": truncated.count("\n- ") + 1, "tokens": token_budget,
+                       "visual_coverage": round(visual_coverage(truncated, corpus_terms), 3), "seconds": 0.0},
+        "selection": {"reviews": len(picked), "tokens": count_tokens(selected),
+                      "visual_coverage": round(visual_coverage(selected, corpus_terms), 3),
+                      "seconds": round(seconds, 3)},
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark review selection against character truncation.")
+    parser.add_argument("--reviews", type=int, default=50000)
+    parser.add_argument("--chars", type=int, default=15000, help="Character budget of the current truncation")
+    args = parser.parse_args()
+
+    report = benchmark(args.reviews, args.chars)
+    print(f"[Selector]: {report['reviews']:,} reviews, {report['visual_terms_in_corpus']} distinct visual terms, "
+          f"budget {report['token_budget']:,} tokens")
+    print(f"{'method':<12}{'seconds':>9}{'reviews':>9}{'tokens':>9}{'visual coverage':>17}")
+    for name in ("truncation", "selection"):
+        r = report[name]
+        print(f"{name:<12}{r['seconds']:>9}{r['reviews']:>9}{r['tokens']:>9,}{r['visual_coverage']:>16.0%}")
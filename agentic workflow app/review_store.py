@@ -0,0 +1,144 @@
+import json
+import os
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+def load_reviews(path: str) -> List[Dict]:
+    """Loads a customer_reviews.json file, or returns an empty list if there is none yet."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+
+
+def save_reviews(path: str, reviews: List[Dict]) -> None:
+    """Writes customer_reviews.json atomically, so an interrupted save never truncates the store."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(reviews, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def is_stable_id(review_id: str) -> bool:
+    """Amazon review ids (e.g. R1HFGU6PSH9UWV) are stable; the review_<n> fallbacks are positional."""
+    return bool(review_id) and not review_id.startswith("review_")
+
+
+def known_review_ids(reviews: Iterable[Dict]) -> Set[str]:
+    return {r["review_id"] for r in reviews if is_stable_id(r.get("review_id", ""))}
+
+
+def merge_reviews(existing: List[Dict], new: List[Dict]) -> Tuple[List[Dict], int]:
+    """
+    Puts newly scraped reviews (most recent first) in front of the stored ones, skipping any
+    review_id that is already stored. Returns the merged list and how many reviews were added.
+    """
+    seen = known_review_ids(existing)
+    added = []
+    for review in new:
+        review_id = review.get("review_id", "")
+        if is_stable_id(review_id):
+            if review_id in seen:
+                continue
+            seen.add(review_id)
+        added.append(review)
+    return added + existing, len(added)
+
+
+class ReviewStream:
+    """
+    Append-only JSONL log of scraped reviews with a page-level checkpoint, so a crashed crawl
+    keeps every finished page and a restarted one resumes after the last page it completed.
+    Each page is flushed to disk before the checkpoint (which records the byte offset of the
+    committed data) is replaced; anything past that offset is a torn write and is dropped on reopen.
+    compact() turns the log into the usual customer_reviews.json.
+    """
+    def __init__(self, path: str, asin: str):
+        self.path = path
+        self.checkpoint_path = path + ".checkpoint"
+        self.asin = asin
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                self.checkpoint = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.checkpoint = {}
+        if self.checkpoint.get("asin") != asin:
+            # Nothing to resume (or a log left over from another product): start a fresh log
+            self.checkpoint = {"asin": asin, "last_page": 0, "reviews_written": 0, "offset": 0, "complete": False}
+        self._truncate_to_checkpoint()
+
+    @property
+    def last_page(self) -> int:
+        return self.checkpoint["last_page"]
+
+    @property
+    def reviews_written(self) -> int:
+        return self.checkpoint["reviews_written"]
+
+    @property
+    def complete(self) -> bool:
+        return self.checkpoint["complete"]
+
+    def _truncate_to_checkpoint(self) -> None:
+        if os.path.exists(self.path) and os.path.getsize(self.path) > self.checkpoint["offset"]:
+            with open(self.path, "r+b") as f:
+                f.truncate(self.checkpoint["offset"])
+
+    def _save_checkpoint(self) -> None:
+        os.makedirs(os.path.dirname(self.checkpoint_path) or ".", exist_ok=True)
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.checkpoint, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def append_page(self, page: int, reviews: List[Dict]) -> None:
+        """Durably appends one finished page, then moves the checkpoint past it."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "ab") as f:
+            for review in reviews:
+                f.write((json.dumps(review, ensure_ascii=False) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+            offset = f.tell()
+        self.checkpoint.update(last_page=page, reviews_written=self.reviews_written + len(reviews), offset=offset)
+        self._save_checkpoint()
+
+    def mark_complete(self) -> None:
+        """Records that the crawl finished, so a rerun goes straight to compaction."""
+        self.checkpoint["complete"] = True
+        self._save_checkpoint()
+
+    def iter_reviews(self) -> Iterable[Dict]:
+        """Yields the committed reviews one line at a time."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def streamed_ids(self) -> Set[str]:
+        """Stable review ids already committed to the log (not yet compacted)."""
+        return known_review_ids(self.iter_reviews())
+
+    def clear(self) -> None:
+        for path in (self.path, self.checkpoint_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.checkpoint = {"asin": self.asin, "last_page": 0, "reviews_written": 0, "offset": 0, "complete": False}
+
+    def compact(self, output_path: str, merge: bool = True) -> Tuple[int, int]:
+        """
+        Writes the streamed reviews to output_path in the customer_reviews.json format (merged in
+        front of the stored reviews, or replacing them if merge is False) and removes the log.
+        Returns (total reviews saved, reviews added).
+        """
+        existing = load_reviews(output_path) if merge else []
+        merged, added = merge_reviews(existing, list(self.iter_reviews()))
+        save_reviews(output_path, merged)
+        self.clear()
+        return len(merged), added
@@ -1,25 +1,101 @@
-import time
+import json
+import os
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from session_store import SessionStore
+from driver_pool import shared_pool
+from review_extractor import extract_reviews_html, html_has_next_page
+from review_store import known_review_ids
+from http_fetch import FetchEngine, pooled_browser_fetch, parse_product_html, PRODUCT_MARKER, REVIEW_MARKER
+from waits import PolitenessController
+from tracing import CrawlTrace, NAVIGATE, EXTRACT
+from resource_policy import ResourcePolicy
 
-def setup_driver():
+# Point the scraper at a replay_server.py stand-in (e.g. http://127.0.0.1:8765) for offline runs
+AMAZON_BASE_URL = os.getenv("AMAZON_BASE_URL", "https://www.amazon.com")
+
+# Warm browsers are kept between run_scraper calls instead of relaunching Chrome per ASIN
+DRIVER_POOL_SIZE = int(os.getenv("SCRAPER_POOL_SIZE", "1"))
+DRIVER_MAX_AGE = 30 * 60  # Seconds before a browser is recycled
+# Skip images/media/fonts and non-Amazon hosts in the browser (set SCRAPER_BLOCK_RESOURCES=0 to load everything)
+BLOCK_RESOURCES = os.getenv("SCRAPER_BLOCK_RESOURCES", "1") != "0"
+
+# Shared across run_scraper calls: speeds up while Amazon responds normally, backs off on captcha/sign-in
+POLITENESS = PolitenessController(base_delay=2.0, min_delay=0.5)
+
+_FETCH_ENGINES = {}
+
+def setup_driver(profile_dir=None, headless=False, resource_policy=None):
     """Configures Chrome to look like a real user to avoid immediate blocking."""
+    if resource_policy is None and BLOCK_RESOURCES:
+        resource_policy = ResourcePolicy()
     options = Options()
+    if headless:
+        options.add_argument('--headless=new')
+    if profile_dir:
+        # A persistent Chrome profile keeps the login across runs on top of the saved cookies
+        options.add_argument(f'--user-data-dir={os.path.abspath(profile_dir)}')
     options.add_argument('--disable-blink-features=AutomationControlled')
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_argument('--start-maximized')
     options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
-    return webdriver.Chrome(options=options)
+    if resource_policy is not None:
+        resource_policy.apply_to_options(options, headless=headless)
+    driver = webdriver.Chrome(options=options)
+    if resource_policy is not None:
+        resource_policy.apply_to_driver(driver)
+    return driver
 
-def run_scraper(asin, review_limit=10):
+def setup_login_driver():
+    """A visible browser without the resource policy, for manual logins (see SessionStore.ensure_login)."""
+    return setup_driver(resource_policy=ResourcePolicy.off())
+
+def get_driver_pool(profile_dir=None, headless=False):
+    """Returns the shared pool of warm scraper browsers (one pool per Chrome profile)."""
+    return shared_pool(("scraper", profile_dir, headless),
+                       lambda: setup_driver(profile_dir=profile_dir, headless=headless),
+                       size=DRIVER_POOL_SIZE, max_age=DRIVER_MAX_AGE)
+
+def get_fetch_engine(session_store, pool, login_timeout=45):
+    """
+    Returns the shared two-tier fetcher for this session store and driver pool. Pages are
+    fetched over a keep-alive HTTP session first; only blocked or JS-only pages go to the browser.
+    """
+    key = (session_store.path, id(pool))
+    if key not in _FETCH_ENGINES:
+        _FETCH_ENGINES[key] = FetchEngine(
+            browser_fetch=pooled_browser_fetch(pool, session_store, login_timeout=login_timeout,
+                                               login_driver=setup_login_driver),
+            politeness=POLITENESS,
+            session_store=session_store,
+        )
+    return _FETCH_ENGINES[key]
+
+# Review pages an incremental (known_reviews) scrape walks at most before giving up on reaching stored reviews
+MAX_REVIEW_PAGES = 5
+
+def run_scraper(asin, review_limit=10, session_store=None, login_timeout=45, profile_dir=None, pool=None,
+                fetch_engine=None, base_url=None, known_reviews=None, max_review_pages=MAX_REVIEW_PAGES):
     """
     Orchestrates the entire scraping process for a single ASIN.
-    Returns a dictionary containing product metadata and reviews.
+    Returns a dictionary containing product metadata, reviews and a per-page run report.
+
+    Without known_reviews, the first page of top reviews is scraped (up to review_limit). With the
+    previously stored reviews as known_reviews, the review pages are walked newest first
+    (sortBy=recent) until a stored review shows up, and only the reviews posted since then are
+    returned; "new_reviews" holds their count and "new_reviews_capped" is set when max_review_pages
+    ran out before a stored review was reached (so the count is a lower bound). "new_reviews" is
+    None when no review page loaded or the stored reviews have no ids yet (a baseline crawl).
     """
-    driver = setup_driver()
+    base_url = (base_url or AMAZON_BASE_URL).rstrip("/")
+    session_store = session_store or SessionStore()
+    pool = pool or get_driver_pool(profile_dir)
+    engine = fetch_engine or get_fetch_engine(session_store, pool, login_timeout=login_timeout)
+    trace = CrawlTrace(name=f"run_scraper {asin}")
+    previous_trace, engine.trace = engine.trace, trace
     product_data = {
         "title": "Unknown Product",
         "features": [],
@@ -27,66 +103,119 @@ def run_scraper(asin, review_limit=10):
     }
     
     try:
-        # Step 1: Manual Login (Critical for Amazon)
-        print("[Scraper]: Opening Amazon Login Page...")
-        driver.get("https://www.amazon.com/ap/signin")
-        
-        # We allow 45 seconds for the user to manually log in if prompted.
-        # If already logged in or no captcha, this wait ensures the session is stable.
-        print("[Scraper]: Waiting 45 seconds for manual login/verification...")
-        time.sleep(45) 
-        
-        # Step 2: Scrape Product Details (Title & Features)
-        print(f"[Scraper]: Navigating to Product Page {asin}...")
-        driver.get(f"https://www.amazon.com/dp/{asin}")
-        time.sleep(3)
+        # Each page goes through the HTTP tier first. Only if Amazon blocks it (captcha, sign-in
+        # wall, JS-only page) is it escalated to a pooled browser, which restores the saved login
+        # session (or waits up to login_timeout seconds for a manual login) the first time.
         
-        # Extract Title
-        try:
-            product_data["title"] = driver.find_element(By.ID, "productTitle").text.strip()
-        except:
-            print("[Scraper Warning]: Could not find product title.")
-
-        # Extract Feature Bullets
-        try:
-            feature_element = driver.find_element(By.ID, "feature-bullets")
-            items = feature_element.find_elements(By.TAG_NAME, "li")
-            product_data["features"] = [item.text.strip() for item in items if item.text.strip()]
-        except:
-            print("[Scraper Warning]: Could not find feature bullets.")
-
-        # Step 3: Scrape Reviews
-        print("[Scraper]: Navigating to Reviews Page...")
-        driver.get(f"https://www.amazon.com/product-reviews/{asin}/ref=cm_cr_arp_d_paging_btm_next_2?ie=UTF8&reviewerType=all_reviews&pageNumber=1")
-        time.sleep(3)
+        # Step 1: Scrape Product Details (Title & Features)
+        print(f"[Scraper]: Fetching Product Page {asin}...")
+        trace.start_page("product")
+        with trace.phase(NAVIGATE):
+            page = engine.fetch(f"{base_url}/dp/{asin}", expect=PRODUCT_MARKER)
         
-        review_elements = driver.find_elements(By.CSS_SELECTOR, "[data-hook='review']")
-        
-        for element in review_elements[:review_limit]:
-            try:
-                # Extract Body
-                body = element.find_element(By.CSS_SELECTOR, "[data-hook='review-body']").text.strip()
-                
-                # Extract Title (optional but good for context)
-                try:
-                    title = element.find_element(By.CSS_SELECTOR, "[data-hook='review-title']").text.split('\n')[-1]
-                except:
-                    title = ""
-                    
-                if body:
-                    product_data["reviews"].append({
-                        "title": title,
-                        "body": body
-                    })
-            except:
-                continue
+        with trace.phase(EXTRACT):
+            details = parse_product_html(page.html) if page.ok else {"title": "N/A", "features": []}
+            if details["title"] != "N/A":
+                product_data["title"] = details["title"]
+            else:
+                print("[Scraper Warning]: Could not find product title.")
+            product_data["features"] = details["features"]
+            if not details["features"]:
+                print("[Scraper Warning]: Could not find feature bullets.")
+
+        # Step 2: Scrape Reviews
+        if known_reviews is None:
+            print("[Scraper]: Fetching Reviews Page...")
+            trace.start_page("reviews")
+            with trace.phase(NAVIGATE):
+                page = engine.fetch(f"{base_url}/product-reviews/{asin}/ref=cm_cr_arp_d_paging_btm_next_2?ie=UTF8&reviewerType=all_reviews&pageNumber=1",
+                                    expect=REVIEW_MARKER)
+            if not page.ok:
+                print(f"[Scraper Warning]: Reviews page did not load cleanly ({page.reason}).")
+
+            with trace.phase(EXTRACT):
+                for review in (extract_reviews_html(page.html) if page.ok else [])[:review_limit]:
+                    if review["review_body"]:
+                        product_data["reviews"].append(_stored_review(review))
+        else:
+            product_data.update(_scrape_recent_reviews(engine, trace, base_url, asin, known_reviews, max_review_pages))
                 
         print(f"[Scraper]: Successfully scraped {len(product_data['reviews'])} reviews.")
+        trace.print_summary(prefix="[Scraper]: ")
+        engine.print_stats(prefix="[Scraper]: ")
+        product_data["scrape_report"] = trace.report()
 
     except Exception as e:
         print(f"[Scraper Error]: {e}")
         return None
     finally:
-        driver.quit()
+        trace.detach()
+        engine.trace = previous_trace
         
-    return product_data
\ No newline at end of file
+    return product_data
+
+def _stored_review(review):
+    return {"review_id": review["review_id"], "title": review["review_title"], "body": review["review_body"]}
+
+def _scrape_recent_reviews(engine, trace, base_url, asin, known_reviews, max_pages):
+    """
+    Walks the review pages newest first and collects reviews until one that is already stored
+    (matched on review_id) turns up. Snapshots saved without review ids hold top reviews, not the
+    newest ones, so there is nothing to stop at: their first crawl only reads one page as a
+    baseline, skipping reviews already stored (matched on title + body), and reports no count.
+    """
+    known_ids = known_review_ids(known_reviews)
+    baseline = not known_ids
+    known_texts = {(r.get("title"), r.get("body")) for r in known_reviews} if baseline else set()
+    reviews = []
+    reached_known = False
+    pages_read = 0
+    for page_number in range(1, (1 if baseline else max_pages) + 1):
+        print(f"[Scraper]: Fetching Recent Reviews Page {page_number}...")
+        trace.start_page(f"reviews {page_number}")
+        with trace.phase(NAVIGATE):
+            page = engine.fetch(f"{base_url}/product-reviews/{asin}/ref=cm_cr_arp_d_viewopt_srt?ie=UTF8&reviewerType=all_reviews&sortBy=recent&pageNumber={page_number}",
+                                expect=REVIEW_MARKER)
+        if not page.ok:
+            print(f"[Scraper Warning]: Reviews page {page_number} did not load cleanly ({page.reason}).")
+            break
+        pages_read += 1
+        with trace.phase(EXTRACT):
+            page_reviews = extract_reviews_html(page.html)
+            for review in page_reviews:
+                if review["review_id"] in known_ids:
+                    reached_known = True
+                    break
+                if review["review_body"] and (review["review_title"], review["review_body"]) not in known_texts:
+                    reviews.append(_stored_review(review))
+        if reached_known or not page_reviews or html_has_next_page(page.html) is False:
+            # Past the last page counts as caught up too: every review there has now been seen
+            reached_known = True
+            break
+    result = {"reviews": reviews, "new_reviews": None, "new_reviews_capped": False, "recent_pages": pages_read}
+    if not pages_read:
+        # Nothing was read, so "no new reviews" would be a guess
+        return result
+    if baseline:
+        print(f"[Scraper]: Stored reviews have no ids; kept {len(reviews)} recent reviews as a baseline.")
+        return result
+    print(f"[Scraper]: {len(reviews)} reviews posted since the last scrape"
+          f"{'' if reached_known else f' (stopped after {pages_read} pages)'}.")
+    result.update(new_reviews=len(reviews), new_reviews_capped=not reached_known)
+    return result
+
+def save_scraped_data(asin, scraped_data, base_dir="data"):
+    """Writes a run_scraper result into the cache layout: data/<ASIN>/product_description.json + customer_reviews.json (+ scrape_report.json)."""
+    save_path = os.path.join(base_dir, asin)
+    os.makedirs(save_path, exist_ok=True)
+    
+    with open(os.path.join(save_path, "product_description.json"), 'w', encoding='utf-8') as f:
+        json.dump({"title": scraped_data['title'], "features": scraped_data['features']}, f, indent=2)
+    
+    with open(os.path.join(save_path, "customer_reviews.json"), 'w', encoding='utf-8') as f:
+        json.dump(scraped_data['reviews'], f, indent=2)
+    
+    if scraped_data.get("scrape_report"):
+        with open(os.path.join(save_path, "scrape_report.json"), 'w', encoding='utf-8') as f:
+            json.dump(scraped_data["scrape_report"], f, indent=2)
+    return save_path
\ No newline at end of file
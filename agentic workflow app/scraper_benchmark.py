@@ -0,0 +1,220 @@
+"""
+Scraper throughput benchmark against the offline replay server (replay_server.py).
+
+Runs each scraping path over the same fixtures and reports pages/sec, WebDriver roundtrips
+per page and parse time per review:
+  http_lxml            FetchEngine HTTP tier + extract_reviews_html (Massager tier 1, run_scraper)
+  run_scraper          scraper.run_scraper end to end (product page + first review page)
+  product_description  HTTP tier + parse_product_html (Massager extract_product_description)
+  browser_per_element  driver.get + wait + extract_review_data per card (original Massager path)
+  browser_batched_js   driver.get + wait + extract_reviews_js (Massager tier 2)
+  browser_tabs         TabPipeline over K tabs + extract_reviews_js (Massager tabs=K)
+The Massager pipeline itself is a notebook-style script that runs on import, so its steps are
+benchmarked through the shared helpers it calls. Browser paths are skipped if Chrome is missing.
+
+Usage:
+    python scraper_benchmark.py fixtures --latency 0.2 --error-rate 0.05 --tabs 3 --json report.json
+    python scraper_benchmark.py --synthetic 3 --pages 10
+"""
+import json
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import scraper
+from http_fetch import FetchEngine, parse_product_html, PRODUCT_MARKER, REVIEW_MARKER
+from replay_server import FixtureStore, ReplayServer, write_synthetic_fixtures
+from review_extractor import _CommandCounter, extract_reviews_html, extract_reviews_js, extract_reviews_per_element
+from tab_fetch import TabPipeline
+from waits import READY, wait_for_reviews
+
+
+def _review_url(base_url: str, asin: str, page: int) -> str:
+    return f"{base_url}/product-reviews/{asin}/?ie=UTF8&reviewerType=all_reviews&pageNumber={page}"
+
+
+class _PathResult:
+    """Accumulates the counters of one benchmark path."""
+    def __init__(self):
+        self.pages = 0
+        self.reviews = 0
+        self.errors = 0
+        self.roundtrips = 0
+        self.parse_seconds = 0.0
+        self.start = time.perf_counter()
+
+    def parsed(self, reviews: List[Dict], seconds: float) -> None:
+        self.pages += 1
+        self.reviews += len(reviews)
+        self.parse_seconds += seconds
+
+    def summary(self) -> Dict:
+        wall = time.perf_counter() - self.start
+        return {
+            "pages": self.pages,
+            "reviews": self.reviews,
+            "errors": self.errors,
+            "seconds": round(wall, 3),
+            "pages_per_sec": round(self.pages / wall, 2) if wall else 0.0,
+            "roundtrips_per_page": round(self.roundtrips / self.pages, 1) if self.pages else 0.0,
+            "parse_ms_per_review": round(1000 * self.parse_seconds / self.reviews, 3) if self.reviews else 0.0,
+        }
+
+
+def bench_http_reviews(engine: FetchEngine, base_url: str, asins: List[str], pages: Dict[str, int]) -> Dict:
+    result = _PathResult()
+    for asin in asins:
+        for page in range(1, pages[asin] + 1):
+            fetched = engine.fetch_http(_review_url(base_url, asin, page), expect=REVIEW_MARKER)
+            if not fetched.ok:
+                result.errors += 1
+                continue
+            start = time.perf_counter()
+            reviews = extract_reviews_html(fetched.html)
+            result.parsed(reviews, time.perf_counter() - start)
+    return result.summary()
+
+
+def bench_run_scraper(engine: FetchEngine, base_url: str, asins: List[str]) -> Dict:
+    result = _PathResult()
+    for asin in asins:
+        fetches_before = engine.fetch_count
+        data = scraper.run_scraper(asin, review_limit=100, fetch_engine=engine, base_url=base_url)
+        if not data or not data["reviews"]:
+            result.errors += 1
+            continue
+        # run_scraper fetches and parses in one call, so only its wall time is reported
+        result.pages += engine.fetch_count - fetches_before
+        result.reviews += len(data["reviews"])
+    return result.summary()
+
+
+def bench_product_description(engine: FetchEngine, base_url: str, asins: List[str]) -> Dict:
+    result = _PathResult()
+    for asin in asins:
+        fetched = engine.fetch_http(f"{base_url}/dp/{asin}", expect=PRODUCT_MARKER)
+        if not fetched.ok:
+            result.errors += 1
+            continue
+        start = time.perf_counter()
+        details = parse_product_html(fetched.html)
+        result.parsed([details], time.perf_counter() - start)
+    return result.summary()
+
+
+def bench_browser_reviews(driver, base_url: str, asins: List[str], pages: Dict[str, int],
+                          extract: Callable) -> Dict:
+    result = _PathResult()
+    for asin in asins:
+        for page in range(1, pages[asin] + 1):
+            with _CommandCounter(driver) as counter:
+                driver.get(_review_url(base_url, asin, page))
+                if wait_for_reviews(driver, timeout=10) != READY:
+                    result.errors += 1
+                    result.roundtrips += counter.count
+                    continue
+                start = time.perf_counter()
+                reviews = extract(driver)
+                result.parsed(reviews, time.perf_counter() - start)
+            result.roundtrips += counter.count
+    return result.summary()
+
+
+def bench_browser_tabs(driver, base_url: str, asins: List[str], pages: Dict[str, int], tabs: int) -> Dict:
+    result = _PathResult()
+    for asin in asins:
+        urls = ((page, _review_url(base_url, asin, page)) for page in range(1, pages[asin] + 1))
+        with _CommandCounter(driver) as counter:
+            for _ in TabPipeline(driver, tabs=tabs).pages(urls):
+                if wait_for_reviews(driver, timeout=10) != READY:
+                    result.errors += 1
+                    continue
+                start = time.perf_counter()
+                reviews = extract_reviews_js(driver)
+                result.parsed(reviews, time.perf_counter() - start)
+        result.roundtrips += counter.count
+    return result.summary()
+
+
+def run_benchmark(fixture_dir: str, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                  captcha_rate: float = 0.0, tabs: int = 3, browser: bool = True,
+                  max_pages: Optional[int] = None) -> Dict:
+    """Serves fixture_dir through a ReplayServer and runs every scraper path against it."""
+    store = FixtureStore(fixture_dir)
+    asins = store.asins()
+    pages = {asin: min(store.review_pages(asin), max_pages or store.review_pages(asin)) for asin in asins}
+    results: Dict[str, Dict] = {}
+
+    with ReplayServer(fixture_dir, latency=latency, jitter=jitter, error_rate=error_rate,
+                      captcha_rate=captcha_rate) as server:
+        base_url = server.base_url
+        engine = FetchEngine()
+        results["http_lxml"] = bench_http_reviews(engine, base_url, asins, pages)
+        results["run_scraper"] = bench_run_scraper(engine, base_url, asins)
+        results["product_description"] = bench_product_description(engine, base_url, asins)
+
+        if browser:
+            try:
+                driver = scraper.setup_driver(headless=True)
+            except Exception as e:
+                print(f"[Benchmark]: Skipping browser paths, Chrome could not start: {str(e).splitlines()[0]}")
+                driver = None
+            if driver is not None:
+                try:
+                    results["browser_per_element"] = bench_browser_reviews(driver, base_url, asins, pages,
+                                                                           extract_reviews_per_element)
+                    results["browser_batched_js"] = bench_browser_reviews(driver, base_url, asins, pages,
+                                                                          extract_reviews_js)
+                    results[f"browser_tabs_{tabs}"] = bench_browser_tabs(driver, base_url, asins, pages, tabs)
+                finally:
+                    driver.quit()
+        server_stats = dict(server.stats)
+
+    return {
+        "config": {"fixtures": fixture_dir, "asins": asins, "pages": pages, "latency": latency, "jitter": jitter,
+                   "error_rate": error_rate, "captcha_rate": captcha_rate, "tabs": tabs},
+        "results": results,
+        "server": server_stats,
+    }
+
+
+def print_report(report: Dict) -> None:
+    print(f"{'path':<22}{'pages':>7}{'errors':>8}{'seconds':>9}{'pages/s':>9}{'rt/page':>9}{'ms/review':>11}")
+    for name, r in report["results"].items():
+        print(f"{name:<22}{r['pages']:>7}{r['errors']:>8}{r['seconds']:>9}{r['pages_per_sec']:>9}"
+              f"{r['roundtrips_per_page']:>9}{r['parse_ms_per_review']:>11}")
+    print(f"server: {report['server']}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the scraper paths against recorded fixtures.")
+    parser.add_argument("fixtures", nargs="?", help="Fixture directory (see replay_server.py)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate N synthetic ASINs instead")
+    parser.add_argument("--pages", type=int, default=None, help="Review pages per ASIN (synthetic: default 5)")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--captcha-rate", type=float, default=0.0)
+    parser.add_argument("--tabs", type=int, default=3)
+    parser.add_argument("--no-browser", action="store_true")
+    parser.add_argument("--json", help="Write the report to this file")
+    args = parser.parse_args()
+
+    fixture_dir = args.fixtures
+    if args.synthetic:
+        fixture_dir = fixture_dir or tempfile.mkdtemp(prefix="fixtures_")
+        for i in range(args.synthetic):
+            write_synthetic_fixtures(fixture_dir, f"B0SYNTH{i:03d}", pages=args.pages or 5)
+    if not fixture_dir:
+        parser.error("give a fixture directory or --synthetic N")
+
+    report = run_benchmark(fixture_dir, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                           captcha_rate=args.captcha_rate, tabs=args.tabs, browser=not args.no_browser,
+                           max_pages=args.pages)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"[Benchmark]: Report written to {args.json}")
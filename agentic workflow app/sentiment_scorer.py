@@ -0,0 +1,209 @@
+"""
+Local sentiment scoring of every review, in batch and without the LLM.
+
+Each review's text is scored with a weighted word lexicon (words after a negation such as "not"
+or "never" count the other way, more weakly). All reviews are scored at once: the corpus becomes
+(review, term) pairs, and a review's text score is the mean weight of its sentiment words, summed
+over that sparse review-term matrix with NumPy. It is blended with the star rating when the review
+has one, and every review is labelled positive, neutral or negative.
+
+sentiment_stats() turns the scores into exact figures over the whole corpus: the label
+distribution, the same distribution weighted by helpful votes, and a 1-10 satisfaction score
+weighted by helpful votes. A review collapsed from duplicates (review_dedup) counts as many times
+as its "multiplicity", so the figures match the full corpus. pick_samples() chooses a few clear
+positive/negative reviews, so an LLM only has to name the themes in them.
+
+    python sentiment_scorer.py ../Massager/data/customer_reviews.json
+    python sentiment_scorer.py --synthetic 50000
+"""
+import json
+import re
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+POSITIVE = {
+    "amazing": 3, "awesome": 3, "excellent": 3, "fantastic": 3, "love": 3, "loves": 3, "perfect": 3,
+    "wonderful": 3, "outstanding": 3, "incredible": 3, "superb": 3, "best": 3, "miracle": 3,
+    "great": 2, "good": 1.5, "nice": 1.5, "happy": 2, "pleased": 2, "recommend": 2, "recommended": 2,
+    "beautiful": 2, "comfortable": 2, "relaxing": 2, "soothing": 2, "relief": 2, "relieves": 2, "helps": 1.5,
+    "helped": 1.5, "effective": 2, "sturdy": 1.5, "durable": 1.5, "quality": 1, "powerful": 1.5,
+    "worth": 1.5, "impressed": 2, "enjoy": 2, "enjoyable": 2, "favorite": 2, "solid": 1.5, "easy": 1,
+    "works": 1, "worked": 1, "well": 0.5, "satisfied": 2, "sleek": 1.5, "elegant": 1.5, "gorgeous": 2.5,
+    "stunning": 2.5, "smooth": 1, "quiet": 1, "fast": 1, "reliable": 1.5, "lasted": 1, "glad": 1.5,
+    "like": 1, "likes": 1, "liked": 1, "pretty": 1, "fine": 0.5, "fun": 1.5, "value": 1,
+}
+
+NEGATIVE = {
+    "terrible": -3, "awful": -3, "horrible": -3, "worst": -3, "useless": -3, "garbage": -3, "junk": -3,
+    "waste": -3, "refund": -2.5, "returned": -2, "return": -1.5, "returning": -2, "broke": -2.5,
+    "broken": -2.5, "defective": -3, "died": -2.5, "stopped": -2, "disappointed": -2.5,
+    "disappointing": -2.5, "poor": -2, "bad": -2, "cheap": -1.5, "flimsy": -2, "painful": -2, "hurts": -2,
+    "hurt": -1.5, "pain": -0.5, "loud": -1.5, "noisy": -1.5, "weak": -1.5, "uncomfortable": -2,
+    "overheats": -2, "overheated": -2, "burning": -1.5, "smell": -1, "ugly": -2, "problem": -1.5,
+    "problems": -1.5, "issue": -1, "issues": -1, "fails": -2, "failed": -2, "unfortunately": -1.5,
+    "hate": -3, "annoying": -2, "regret": -2.5, "mediocre": -1.5, "difficult": -1, "hard": -0.5,
+    "wore": -1, "tear": -1, "torn": -1.5, "ripped": -1.5, "expensive": -1, "overpriced": -2,
+}
+
+LEXICON = {**POSITIVE, **NEGATIVE}
+
+NEGATORS = {"not", "no", "never", "nothing", "hardly", "cannot", "dont", "doesnt", "didnt", "isnt",
+            "wasnt", "wont", "cant", "couldnt", "wouldnt", "arent", "werent", "without"}
+NEGATION_SPAN = 3        # Words after a negator that it flips
+NEGATION_FACTOR = -0.75  # "not great" is less negative than "terrible"
+TEXT_SCALE = 1.5         # Mean lexicon weight at which the text score reaches tanh(1) ~ 0.76
+RATING_WEIGHT = 0.6      # Share of the star rating in the blended score
+LABEL_THRESHOLD = 0.25   # |score| above this is positive/negative, below it neutral
+
+_TOKEN = re.compile(r"[a-z']+|[.!?;,]")
+LABELS = ("positive", "neutral", "negative")
+
+
+def review_text(review: Dict) -> str:
+    """Title and body of a review, whichever field names the source uses."""
+    title = review.get("review_title") or review.get("title") or ""
+    body = review.get("review_body") or review.get("body") or ""
+    return f"{title}. {body}" if title else body
+
+
+def _rating(review: Dict) -> float:
+    try:
+        return float(str(review.get("rating", "")).split()[0])
+    except (ValueError, IndexError):
+        return float("nan")
+
+
+def score_reviews(reviews: List[Dict], rating_weight: float = RATING_WEIGHT) -> Dict[str, np.ndarray]:
+    """
+    Arrays aligned with `reviews`: text_score and score in [-1, 1], label (index into LABELS),
+    rating (NaN if missing), helpful (vote count) and count (multiplicity, 1 if not collapsed).
+    """
+    vocab: Dict[str, int] = {}
+    doc_ids: List[int] = []
+    term_ids: List[int] = []
+    for i, review in enumerate(reviews):
+        negated = 0
+        for token in _TOKEN.findall(review_text(review).lower()):
+            if not token[0].isalpha():
+                negated = 0  # Punctuation ends the negation
+                continue
+            word = token.replace("'", "")
+            if word in NEGATORS:
+                negated = NEGATION_SPAN
+                continue
+            if negated:
+                word = "not_" + word
+                negated -= 1
+            term_ids.append(vocab.setdefault(word, len(vocab)))
+            doc_ids.append(i)
+
+    weights = np.zeros(max(len(vocab), 1))
+    for word, j in vocab.items():
+        if word.startswith("not_"):
+            weights[j] = NEGATION_FACTOR * LEXICON.get(word[4:], 0.0)
+        else:
+            weights[j] = LEXICON.get(word, 0.0)
+    docs = np.asarray(doc_ids, dtype=np.int64)
+    term_weights = weights[np.asarray(term_ids, dtype=np.int64)]
+    total = np.bincount(docs, weights=term_weights, minlength=len(reviews))
+    hits = np.bincount(docs, weights=term_weights != 0, minlength=len(reviews))
+    # Mean weight of the sentiment words, so long reviews don't score higher just for length
+    text_score = np.tanh(total / np.maximum(hits, 1) / TEXT_SCALE)
+
+    rating = np.array([_rating(r) for r in reviews], dtype=float)
+    rated = ~np.isnan(rating)
+    score = text_score.copy()
+    score[rated] = rating_weight * (rating[rated] - 3) / 2 + (1 - rating_weight) * text_score[rated]
+
+    label = np.full(len(reviews), 1)
+    label[score > LABEL_THRESHOLD] = 0
+    label[score < -LABEL_THRESHOLD] = 2
+    helpful = np.array([int(r.get("helpful_count") or 0) for r in reviews], dtype=float)
+    count = np.array([int(r.get("multiplicity") or 1) for r in reviews], dtype=float)
+    return {"text_score": text_score, "score": score, "label": label, "rating": rating, "helpful": helpful,
+            "count": count}
+
+
+def _distribution(label: np.ndarray, weights: np.ndarray) -> Dict[str, float]:
+    totals = np.bincount(label, weights=weights, minlength=len(LABELS))
+    share = 100 * totals / max(totals.sum(), 1e-12)
+    return {name: round(float(p), 1) for name, p in zip(LABELS, share)}
+
+
+def sentiment_stats(scores: Dict[str, np.ndarray]) -> Dict:
+    """
+    Exact corpus figures. Helpful weighting gives a review 1 + ln(1 + helpful votes), so
+    well-voted reviews count more without one viral review deciding everything. Every figure
+    counts a review multiplicity times.
+    """
+    label, score, rating = scores["label"], scores["score"], scores["rating"]
+    count = scores.get("count", np.ones(len(label)))
+    helpful_weight = count * (1 + np.log1p(scores["helpful"]))
+    counts = np.bincount(label, weights=count, minlength=len(LABELS))
+    satisfaction = 1 + 9 * float(np.average((score + 1) / 2, weights=helpful_weight)) if len(score) else None
+    rated = ~np.isnan(rating)
+    return {
+        "reviews_scored": int(count.sum()),
+        "unique_reviews": int(len(label)),
+        "counts": {name: int(c) for name, c in zip(LABELS, counts)},
+        "overall_sentiment": _distribution(label, count),
+        "helpful_weighted_sentiment": _distribution(label, helpful_weight),
+        "satisfaction_score": round(satisfaction, 1) if satisfaction is not None else None,
+        "average_rating": round(float(np.average(rating[rated], weights=count[rated])), 2) if rated.any() else None,
+    }
+
+
+def pick_samples(reviews: List[Dict], scores: Dict[str, np.ndarray], label: Optional[str], k: int = 8,
+                 must_mention: Optional[Iterable[str]] = None, max_words: int = 80) -> List[str]:
+    """
+    Texts of the k clearest distinct reviews with this label (the highest scores for "positive",
+    the lowest for "negative" and "neutral"), helpful votes breaking ties. label=None takes every
+    review, most helpful first. must_mention keeps only reviews using one of these words. Texts
+    are cut to max_words.
+    """
+    if label is None:
+        idx, strength = np.arange(len(reviews)), np.zeros(len(reviews))
+    else:
+        idx = np.flatnonzero(scores["label"] == LABELS.index(label))
+        strength = scores["score"][idx] if label == "positive" else -scores["score"][idx]
+    order = idx[np.lexsort((-scores["helpful"][idx], -strength))]
+
+    terms = set(must_mention) if must_mention is not None else None
+    samples: List[str] = []
+    for i in order:
+        text = review_text(reviews[i])
+        if terms is not None and not terms & set(re.findall(r"[a-z]+", text.lower())):
+            continue
+        text = " ".join(text.split()[:max_words])
+        if text not in samples:
+            samples.append(text)
+            if len(samples) == k:
+                break
+    return samples
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Score review sentiment locally.")
+    parser.add_argument("path", nargs="?", help="customer_reviews.json")
+    parser.add_argument("--synthetic", type=int, default=0, help="Score N synthetic reviews instead")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        from review_chunker import synthetic_reviews
+        reviews = synthetic_reviews(args.synthetic)
+    else:
+        with open(args.path or "data/customer_reviews.json", "r", encoding="utf-8") as f:
+            reviews = json.load(f)
+
+    start = time.perf_counter()
+    scores = score_reviews(reviews)
+    seconds = time.perf_counter() - start
+    print(f"[Sentiment]: scored {len(reviews):,} reviews in {seconds:.2f}s")
+    print(f"[Sentiment]: {json.dumps(sentiment_stats(scores), indent=2)}")
+    for label in ("positive", "negative"):
+        for text in pick_samples(reviews, scores, label, k=2, max_words=25):
+            print(f"   {label}: {text}")
@@ -0,0 +1,154 @@
+import json
+import os
+import time
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlencode
+
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import NoSuchElementException, WebDriverException
+
+from resource_policy import restricts_hosts, unblocked
+
+AMAZON_HOME = "https://www.amazon.com"
+_OPENID_SELECT = "http://specs.openid.net/auth/2.0/identifier_select"
+SIGNIN_URL = AMAZON_HOME + "/ap/signin?" + urlencode({
+    "openid.pape.max_auth_age": "0",
+    "openid.return_to": AMAZON_HOME + "/",
+    "openid.identity": _OPENID_SELECT,
+    "openid.assoc_handle": "usflex",
+    "openid.mode": "checkid_setup",
+    "openid.claimed_id": _OPENID_SELECT,
+    "openid.ns": "http://specs.openid.net/auth/2.0",
+})
+
+# Amazon only sets these cookies once the user has actually signed in.
+AUTH_COOKIES = ("at-main", "sess-at-main", "x-main")
+
+DEFAULT_SESSION_PATH = os.path.join(".sessions", "amazon_cookies.json")
+
+
+def is_logged_in(driver) -> bool:
+    """Checks the current page for signs of an authenticated Amazon session."""
+    try:
+        if "signin" in driver.current_url.lower():
+            return False
+        names = {c.get("name") for c in driver.get_cookies()}
+        if not names.intersection(AUTH_COOKIES):
+            return False
+        try:
+            greeting = driver.find_element(By.ID, "nav-link-accountList-nav-line-1").text
+            return "sign in" not in greeting.lower()
+        except NoSuchElementException:
+            # Pages without the nav bar (e.g. review pages in some layouts) rely on the cookies alone.
+            return True
+    except WebDriverException:
+        return False
+
+
+class SessionStore:
+    """
+    Saves the cookies of a logged-in browser to disk and restores them into new drivers,
+    so the interactive login only happens when the saved session has expired.
+    """
+    def __init__(self, path: str = DEFAULT_SESSION_PATH, max_age: float = 7 * 24 * 3600,
+                 base_url: str = AMAZON_HOME, signin_url: str = SIGNIN_URL):
+        self.path = path
+        self.max_age = max_age
+        self.base_url = base_url
+        self.signin_url = signin_url
+
+    def load(self) -> List[Dict]:
+        """Returns the saved cookies, or an empty list if there is no usable session on disk."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return []
+
+        now = time.time()
+        if now - saved.get("saved_at", 0) > self.max_age:
+            return []
+
+        cookies = saved.get("cookies", [])
+        auth = [c for c in cookies if c.get("name") in AUTH_COOKIES]
+        if not auth or any(c.get("expiry") and c["expiry"] < now for c in auth):
+            return []
+        return cookies
+
+    def save(self, driver) -> None:
+        """Writes the driver's current cookies to disk (atomically, so a crash never leaves half a file)."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        payload = {"saved_at": time.time(), "cookies": driver.get_cookies()}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        """Forgets the saved session."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def restore(self, driver) -> bool:
+        """Loads the saved cookies into the driver and returns True if Amazon still accepts them."""
+        cookies = self.load()
+        if not cookies:
+            return False
+
+        # Cookies can only be added for the domain the browser is currently on.
+        driver.get(self.base_url)
+        for cookie in cookies:
+            cookie = {k: v for k, v in cookie.items() if k != "sameSite" or v in ("Strict", "Lax", "None")}
+            try:
+                driver.add_cookie(cookie)
+            except WebDriverException:
+                continue
+        driver.refresh()
+        return is_logged_in(driver)
+
+    def ensure_login(self, driver, login_timeout: int = 45, poll_interval: float = 2.0,
+                     interactive: bool = True, login_driver: Optional[Callable[[], object]] = None) -> bool:
+        """
+        Reuses the saved session if it is still valid. Otherwise opens the sign-in page and
+        waits (up to login_timeout seconds) for the user to log in, then saves the new session.
+        Headless runs should pass interactive=False, since nobody can type into the browser.
+
+        If the driver only resolves allow-listed hosts (resource_policy), sign-in captchas and
+        auth assets may not load in it. Pass login_driver, a factory for a browser started
+        without the allow-list: the login then happens there, and its cookies are restored
+        into `driver`.
+        """
+        if self.restore(driver):
+            print("[Session]: Reusing saved Amazon session.")
+            return True
+
+        if not interactive:
+            print("[Session]: No valid saved session and no interactive login possible.")
+            return False
+
+        print(f"[Session]: No valid saved session. Waiting up to {login_timeout}s for manual login...")
+        if login_driver is not None and restricts_hosts(driver):
+            print("[Session]: Opening an unrestricted browser for the login...")
+            helper = login_driver()
+            try:
+                logged_in = self._wait_for_login(helper, login_timeout, poll_interval)
+            finally:
+                helper.quit()
+            return logged_in and self.restore(driver)
+
+        # The sign-in page may show a captcha image, so lift the URL blocklist meanwhile
+        with unblocked(driver):
+            return self._wait_for_login(driver, login_timeout, poll_interval)
+
+    def _wait_for_login(self, driver, login_timeout: int, poll_interval: float) -> bool:
+        driver.get(self.signin_url)
+        deadline = time.time() + login_timeout
+        while time.time() < deadline:
+            if is_logged_in(driver):
+                self.save(driver)
+                print(f"[Session]: Login detected. Session saved to {self.path}")
+                return True
+            time.sleep(poll_interval)
+
+        print("[Session]: Login not detected; continuing without an authenticated session.")
+        return False
@@ -0,0 +1,129 @@
+"""
+Small dependency-graph executor for pipeline stages.
+
+Each stage is a function whose keyword arguments are named after its inputs: values from the
+initial context or the outputs of other stages (a stage's output is stored under its name).
+run() starts every stage as soon as its inputs are ready, so independent stages (e.g. several
+LLM calls over the same reviews) run concurrently and the total time is roughly the longest
+dependency chain rather than the sum. Failed stages are retried; when they keep failing their
+`default` is used as output so downstream stages still run.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional, Sequence
+
+
+class Stage:
+    def __init__(self, name: str, func: Callable, inputs: Sequence[str] = (), retries: int = 1,
+                 retry_delay: float = 2.0, default: Any = None):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.default = default
+
+
+class StageGraph:
+    """Stages added with add(); run(context) executes them in dependency order, in parallel where possible."""
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self.stages: Dict[str, Stage] = {}
+        self.timings: Dict[str, Dict] = {}
+        self.wall_seconds = 0.0
+
+    def add(self, name: str, func: Callable, inputs: Sequence[str] = (), **options) -> "StageGraph":
+        if name in self.stages:
+            raise ValueError(f"Stage {name!r} is already defined")
+        self.stages[name] = Stage(name, func, inputs, **options)
+        return self
+
+    def _check(self, context: Dict) -> None:
+        """Raises ValueError for unknown inputs or dependency cycles."""
+        for stage in self.stages.values():
+            for name in stage.inputs:
+                if name not in self.stages and name not in context:
+                    raise ValueError(f"Stage {stage.name!r} needs {name!r}, which no stage or context provides")
+        visiting, done = set(), set()
+
+        def visit(name: str) -> None:
+            if name in done or name not in self.stages:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle through stage {name!r}")
+            visiting.add(name)
+            for dep in self.stages[name].inputs:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def _run_stage(self, stage: Stage, kwargs: Dict, started: float) -> Any:
+        timing = {"start": time.perf_counter() - started, "attempts": 0, "status": "ok", "error": None}
+        self.timings[stage.name] = timing
+        result = stage.default
+        for attempt in range(stage.retries + 1):
+            timing["attempts"] = attempt + 1
+            try:
+                result = stage.func(**kwargs)
+                timing["status"], timing["error"] = "ok", None
+                break
+            except Exception as e:
+                timing["status"], timing["error"] = "failed", str(e)
+                print(f"   ⚠️ Stage {stage.name} failed (attempt {attempt + 1}/{stage.retries + 1}): {e}")
+                if attempt < stage.retries:
+                    time.sleep(stage.retry_delay * 2 ** attempt)
+        if timing["status"] == "failed":
+            result = stage.default
+        timing["end"] = time.perf_counter() - started
+        return result
+
+    def run(self, context: Optional[Dict] = None) -> Dict:
+        """Runs every stage; returns the context plus each stage's output under its name."""
+        values = dict(context or {})
+        self._check(values)
+        self.timings = {}
+        pending = dict(self.stages)
+        running = {}
+        started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as pool:
+            while pending or running:
+                ready = [s for s in pending.values() if all(dep in values for dep in s.inputs)]
+                for stage in ready:
+                    del pending[stage.name]
+                    kwargs = {dep: values[dep] for dep in stage.inputs}
+                    running[pool.submit(self._run_stage, stage, kwargs, started)] = stage.name
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    values[running.pop(future)] = future.result()
+
+        self.wall_seconds = time.perf_counter() - started
+        return values
+
+    def report(self) -> Dict:
+        summed = sum(t["end"] - t["start"] for t in self.timings.values())
+        return {
+            "wall_seconds": round(self.wall_seconds, 3),
+            "summed_stage_seconds": round(summed, 3),
+            "stages": {name: {"start": round(t["start"], 3), "end": round(t["end"], 3),
+                              "seconds": round(t["end"] - t["start"], 3), "attempts": t["attempts"],
+                              "status": t["status"], "error": t["error"]}
+                       for name, t in self.timings.items()},
+        }
+
+    def print_timeline(self, prefix: str = "   ", width: int = 30) -> None:
+        """One bar per stage over the run's wall time."""
+        report = self.report()
+        total = report["wall_seconds"] or 1e-9
+        print(f"{prefix}⏱️  {len(report['stages'])} stages: wall {report['wall_seconds']:.1f}s vs. "
+              f"{report['summed_stage_seconds']:.1f}s if run one after another")
+        name_width = max((len(n) for n in report["stages"]), default=0) + 2
+        for name, t in sorted(report["stages"].items(), key=lambda kv: kv[1]["start"]):
+            offset = round(width * t["start"] / total)
+            bar = (" " * offset + "█" * max(1, round(width * t["seconds"] / total)))[:width]
+            status = "" if t["status"] == "ok" else f"  ❌ {t['status']}"
+            retries = f" ({t['attempts']} attempts)" if t["attempts"] > 1 else ""
+            print(f"{prefix}  {name:<{name_width}}|{bar:<{width}}| {t['seconds']:>6.1f}s{retries}{status}")
@@ -0,0 +1,162 @@
+"""
+Hierarchical (map-reduce) summarization down to a token budget.
+
+reduce_to_budget() takes the chunk summaries of the map step and, level by level, packs adjacent
+summaries into groups of at most group_tokens, summarizes every group concurrently (llm_pool.fan_out)
+and repeats until the joined text fits target_tokens. However many reviews go in, the output stays
+around the budget.
+
+Every group summary is stored in a SummaryStore under a hash of its inputs, so a rerun where only
+some leaves changed re-summarizes only the groups that contain them (and the levels above).
+Groups end at content-defined boundaries, so a changed leaf does not shift the groups after it.
+The caller saves the store when the run is done.
+"""
+import hashlib
+import json
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+from llm_pool import RateLimiter, estimate_tokens, fan_out
+from review_chunker import content_boundary
+
+SEPARATOR = "\n\n"
+
+
+def content_key(texts: List[str], prefix: str = "") -> str:
+    """Stable hash of a group's inputs (plus e.g. the model name)."""
+    digest = hashlib.sha256(prefix.encode("utf-8"))
+    for text in texts:
+        digest.update(b"\x1e" + text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class SummaryStore:
+    """JSON file of summaries keyed by content hash; in memory only if path is None."""
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, str] = {}
+        self._used = set()  # Keys read or written since loading
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except json.JSONDecodeError:
+                print(f"[SummaryStore]: {path} is unreadable, starting empty")
+
+    def get(self, key: str) -> Optional[str]:
+        self._used.add(key)
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, summary: str) -> None:
+        self._used.add(key)
+        self._entries[key] = summary
+
+    def save(self, prune: bool = False) -> int:
+        """Writes the store; prune=True first drops entries this run never touched. Returns how many."""
+        stale = [k for k in self._entries if k not in self._used] if prune else []
+        for k in stale:
+            del self._entries[k]
+        if not self.path:
+            return len(stale)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.path)
+        return len(stale)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def group_by_budget(texts: List[str], group_tokens: int) -> List[List[str]]:
+    """
+    Packs adjacent texts into groups of at most group_tokens (a larger text gets a group of its
+    own). Groups also end after texts whose hash marks a boundary, about 3/4 of the budget apart.
+    """
+    groups: List[List[str]] = []
+    current: List[str] = []
+    size = 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if current and size + tokens > group_tokens:
+            groups.append(current)
+            current, size = [], 0
+        current.append(text)
+        size += tokens
+        if content_boundary(hashlib.sha1(text.encode("utf-8")).hexdigest(), tokens, 3 * group_tokens // 4):
+            groups.append(current)
+            current, size = [], 0
+    if current:
+        groups.append(current)
+    return groups
+
+
+def reduce_to_budget(texts: List[str], summarize: Callable[[str, int], str], target_tokens: int = 6000,
+                     group_tokens: int = 8000, max_workers: int = 8, limiter: Optional[RateLimiter] = None,
+                     store: Optional[SummaryStore] = None, key_prefix: str = "",
+                     max_levels: int = 6) -> Tuple[str, List[Dict]]:
+    """
+    Summarizes summaries until their joined text fits target_tokens.
+
+    summarize(text, level) returns the summary of one group (the group's texts joined by blank
+    lines); level starts at 1 for the first reduce over the map summaries. A group whose call
+    fails keeps its joined text. Returns the final text and one report dict per level.
+    """
+    store = store if store is not None else SummaryStore()
+    levels: List[Dict] = []
+
+    while texts and sum(estimate_tokens(t) for t in texts) > target_tokens and len(levels) < max_levels:
+        level = len(levels) + 1
+        groups = group_by_budget(texts, group_tokens)
+        keys = [content_key(group, prefix=f"{key_prefix}|{level}") for group in groups]
+        outputs: List[Optional[str]] = [store.get(key) for key in keys]
+        todo = [i for i, out in enumerate(outputs) if out is None]
+
+        results, stats = fan_out(
+            lambda i: summarize(SEPARATOR.join(groups[i]), level),
+            todo,
+            max_workers=max_workers,
+            limiter=limiter,
+            tokens=lambda i: sum(estimate_tokens(t) for t in groups[i]),
+            fallback=lambda i, e: None,
+        )
+        for i, summary in zip(todo, results):
+            if summary is None:
+                outputs[i] = SEPARATOR.join(groups[i])  # Keep the inputs rather than lose them
+            else:
+                outputs[i] = summary
+                store.put(keys[i], summary)
+
+        tokens_in = sum(estimate_tokens(t) for t in texts)
+        tokens_out = sum(estimate_tokens(t) for t in outputs)
+        levels.append({
+            "level": level,
+            "inputs": len(texts),
+            "groups": len(groups),
+            "summarized": len(todo),
+            "reused": len(groups) - len(todo),
+            "failed": stats.failures,
+            "tokens_in": tokens_in,
+            "tokens_out": tokens_out,
+            "wall_seconds": round(stats.wall_seconds, 3),
+        })
+        if tokens_out >= tokens_in:
+            break  # Nothing got shorter (e.g. every call failed); stop instead of looping
+        texts = outputs
+
+    return SEPARATOR.join(texts), levels
+
+
+def print_levels(levels: List[Dict], prefix: str = "   ") -> None:
+    for lv in levels:
+        print(f"{prefix}🌳 Level {lv['level']}: {lv['inputs']} → {lv['groups']} summaries "
+              f"({lv['reused']} reused, {lv['failed']} failed), "
+              f"~{lv['tokens_in']:,} → ~{lv['tokens_out']:,} tokens in {lv['wall_seconds']:.1f}s")
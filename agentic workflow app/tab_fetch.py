@@ -0,0 +1,79 @@
+import time
+from collections import deque
+from typing import Hashable, Iterable, Iterator, Optional, Tuple
+
+from waits import PolitenessController
+
+# Upper bound on tabs loading pages at once in one browser session (one Amazon login)
+MAX_TABS_PER_SESSION = 4
+
+# Clears the old page first, so waits in this tab can't match the previous page's review cards
+NAVIGATE_JS = "document.documentElement.innerHTML = ''; window.location.href = arguments[0];"
+
+
+class TabPipeline:
+    """
+    Pipelines page loads across several tabs of one logged-in driver. Navigation is started
+    with a non-blocking location change, so while the caller extracts page N in one tab, the
+    next pages are already loading in the others. Tabs share the session's cookies, so no
+    extra logins are needed.
+
+    Chrome throttles background tabs unless started with --disable-background-timer-throttling
+    and --disable-renderer-backgrounding.
+    """
+    def __init__(self, driver, tabs: int = 3, politeness: Optional[PolitenessController] = None,
+                 max_tabs: int = MAX_TABS_PER_SESSION):
+        self.driver = driver
+        self.tabs = max(1, min(tabs, max_tabs))
+        self.politeness = politeness
+        self._last_dispatch: Optional[float] = None
+
+    def _dispatch(self, handle: str, url: str) -> None:
+        if self.politeness is not None and self._last_dispatch is not None:
+            self.politeness.pause(since=self._last_dispatch)
+        self._last_dispatch = time.time()
+        self.driver.switch_to.window(handle)
+        self.driver.execute_script(NAVIGATE_JS, url)
+
+    def pages(self, urls: Iterable[Tuple[Hashable, str]]) -> Iterator[Tuple[Hashable, str]]:
+        """
+        Loads (key, url) pairs up to `tabs` at a time and yields them in order, with the driver
+        switched to the tab holding that page (it may still be loading, so wait as usual).
+        When the caller asks for the next page, the finished tab is reused for the next URL.
+        Closing the generator (or breaking out of a for loop over it) closes the extra tabs.
+        """
+        urls = iter(urls)
+        original = self.driver.current_window_handle
+        handles = [original]
+        in_flight = deque()
+        try:
+            for _ in range(self.tabs - 1):
+                self.driver.switch_to.new_window("tab")
+                handles.append(self.driver.current_window_handle)
+
+            for handle in handles:
+                item = next(urls, None)
+                if item is None:
+                    break
+                self._dispatch(handle, item[1])
+                in_flight.append((handle, item))
+
+            while in_flight:
+                handle, item = in_flight.popleft()
+                self.driver.switch_to.window(handle)
+                yield item
+                following = next(urls, None)
+                if following is not None:
+                    self._dispatch(handle, following[1])
+                    in_flight.append((handle, following))
+        finally:
+            for handle in handles[1:]:
+                try:
+                    self.driver.switch_to.window(handle)
+                    self.driver.close()
+                except Exception:
+                    pass
+            try:
+                self.driver.switch_to.window(original)
+            except Exception:
+                pass
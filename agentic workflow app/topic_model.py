@@ -0,0 +1,233 @@
+"""
+Local topic modeling of reviews: the LLM only names the topics.
+
+fit_topics() turns every review into a sparse TF-IDF row (scipy.sparse), factorizes the matrix
+with NMF (multiplicative updates) and assigns each review to its strongest topic. Each topic comes
+back as a compact descriptor: its size, top keywords and a few representative reviews. All of
+this runs on the CPU, so its cost grows with the number of reviews, not with LLM tokens.
+
+name_topics() sends only those descriptors to the LLM for a name, a description and a
+visual_relevance tag, and returns topics in the extracted_topics.json format
+({"topic_name", "description", "keywords", "visual_relevance"}). If the LLM answer is unusable,
+topics are named after their keywords instead.
+
+    python topic_model.py ../Massager/data/customer_reviews.json --topics 6
+    python topic_model.py --synthetic 50000
+"""
+import json
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from multi_analysis import MultiTaskAnalyzer, Section, array, number, obj, string
+from review_selector import VISUAL_TERMS
+
+STOP_WORDS = frozenset("""
+the and for are but not you all any can had her was one our out has him his how its may new now old see two
+who did get got let put say she too use that with have this will your from they know want been good much some
+time very when come here just like long make many more only over such take than them well were what also back
+into after again about there their would could should which other these those then because while where being
+does doing each few most same both through during before under until above below off own once why
+i'm it's don't didn't doesn't isn't wasn't can't won't i've i'd it
+product item bought buy purchase purchased amazon really even still thing things way lot little bit
+""".split())
+
+RELEVANCE = ("High", "Medium", "Low")
+_WORD = re.compile(r"[a-z][a-z']+[a-z]")
+
+
+def vectorize(texts: List[str], max_features: int = 5000, min_df: Optional[int] = None,
+              max_df: float = 0.5) -> Tuple[sparse.csr_matrix, List[str]]:
+    """
+    L2-normalized TF-IDF rows (sublinear tf) and the kept terms. Terms in fewer than min_df
+    reviews (default 2, or 1 for fewer than 20 reviews) or in more than max_df of them are
+    dropped; only the max_features most frequent remain.
+    """
+    vocab: Dict[str, int] = {}
+    rows: List[int] = []
+    cols: List[int] = []
+    for i, text in enumerate(texts):
+        for word in _WORD.findall(text.lower()):
+            if word not in STOP_WORDS:
+                cols.append(vocab.setdefault(word, len(vocab)))
+                rows.append(i)
+    n_docs = len(texts)
+    counts = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(n_docs, max(len(vocab), 1)))
+    counts.sum_duplicates()
+
+    df = np.bincount(counts.indices, minlength=counts.shape[1])
+    min_df = min_df if min_df is not None else (2 if n_docs >= 20 else 1)
+    keep = df >= min_df
+    if n_docs >= 20:
+        keep &= df <= max_df * n_docs
+    kept = np.flatnonzero(keep)
+    kept = kept[np.argsort(-df[kept], kind="stable")[:max_features]]
+    terms = [None] * len(vocab)
+    for word, j in vocab.items():
+        terms[j] = word
+
+    X = counts[:, kept].tocsr()
+    X.data = 1.0 + np.log(X.data)
+    X = X.multiply(np.log((1 + n_docs) / (1 + df[kept])) + 1.0).tocsr()
+    norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+    X = sparse.diags(1.0 / np.maximum(norms, 1e-12)) @ X
+    return X.tocsr(), [terms[j] for j in kept]
+
+
+def nmf(X: sparse.csr_matrix, n_topics: int, max_iter: int = 100, tol: float = 1e-3,
+        seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """X ~ W @ H with W (reviews x topics) and H (topics x terms) non-negative (Lee & Seung updates)."""
+    eps = 1e-10
+    rng = np.random.default_rng(seed)
+    n_docs, n_terms = X.shape
+    scale = np.sqrt(X.sum() / (n_docs * n_terms * n_topics))
+    W = rng.random((n_docs, n_topics)) * scale + eps
+    H = rng.random((n_topics, n_terms)) * scale + eps
+    x_norm = float(X.multiply(X).sum())
+    previous = None
+    for iteration in range(max_iter):
+        H *= (X.T @ W).T / (W.T @ W @ H + eps)
+        XHt = X @ H.T
+        W *= XHt / (W @ (H @ H.T) + eps)
+        if iteration % 10 == 9:
+            # ||X - WH||^2 without forming WH
+            error = x_norm - 2 * float(np.sum(W * XHt)) + float(np.sum((W.T @ W) * (H @ H.T)))
+            if previous is not None and previous - error < tol * max(previous, eps):
+                break
+            previous = error
+    return W, H
+
+
+def fit_topics(texts: List[str], n_topics: int = 8, keywords: int = 8, examples: int = 3,
+               max_words: int = 60, seed: int = 0, counts: Optional[List[int]] = None) -> List[Dict]:
+    """
+    Topic descriptors, largest first: {"cluster", "size", "share" (% of reviews), "keywords",
+    "examples"} with the reviews most strongly in the topic as examples (cut to max_words).
+    counts are the texts' multiplicities after deduplication; sizes and shares add them up.
+    Reviews with none of the kept terms are left out of every topic and of the shares.
+    """
+    if not texts:
+        return []
+    X, terms = vectorize(texts)
+    if not terms:
+        return []
+    n_topics = max(1, min(n_topics, len(texts), len(terms)))
+    W, H = nmf(X, n_topics, seed=seed)
+    assignment = W.argmax(axis=1)
+    assigned = X.getnnz(axis=1) > 0
+    assignment[~assigned] = -1  # Reviews with no kept terms belong nowhere
+    weight = np.asarray(counts if counts is not None else np.ones(len(texts)), dtype=float)
+    total = max(weight[assigned].sum(), 1.0)
+
+    clusters = []
+    for t in range(n_topics):
+        members = np.flatnonzero(assignment == t)
+        if not len(members):
+            continue
+        # Terms that barely load on the topic are noise, not keywords
+        top_terms = [terms[j] for j in np.argsort(-H[t])[:keywords] if H[t, j] >= 0.1 * H[t].max()]
+        strongest = members[np.argsort(-W[members, t])]
+        samples: List[str] = []
+        for i in strongest:
+            text = " ".join(texts[i].split()[:max_words])
+            if text not in samples:
+                samples.append(text)
+            if len(samples) == examples:
+                break
+        size = int(weight[members].sum())
+        clusters.append({"size": size, "share": round(float(100 * size / total), 1),
+                         "keywords": top_terms, "examples": samples})
+    clusters.sort(key=lambda c: -c["size"])
+    for i, cluster in enumerate(clusters):
+        cluster["cluster"] = i + 1
+    return clusters
+
+
+def visual_relevance(keywords: List[str]) -> str:
+    """High/Medium/Low by how many of the keywords are visual terms."""
+    visual = sum(1 for k in keywords if k in VISUAL_TERMS)
+    if visual >= max(2, len(keywords) // 3):
+        return "High"
+    return "Medium" if visual else "Low"
+
+
+def _describe(clusters: List[Dict]) -> str:
+    blocks = []
+    for c in clusters:
+        samples = "\n".join(f"  - {s}" for s in c["examples"])
+        blocks.append(f"Cluster {c['cluster']} ({c['size']} reviews, {c['share']}%)\n"
+                      f"  Keywords: {', '.join(c['keywords'])}\n  Example reviews:\n{samples}")
+    return "\n\n".join(blocks)
+
+
+def name_topics(client, clusters: List[Dict], model: str = "gpt-5.1", product: str = "",
+                temperature: Optional[float] = 0.3, keywords: int = 6) -> List[Dict]:
+    """Topics in extracted_topics.json format, named by the LLM from the cluster descriptors only."""
+    if not clusters:
+        return []
+    ids = {c["cluster"] for c in clusters}
+
+    def check(named: List[Dict]) -> Optional[str]:
+        got = [int(t["cluster"]) for t in named]
+        if sorted(got) != sorted(ids):
+            return f"name every cluster exactly once: {sorted(ids)}"
+        if any(t["visual_relevance"] not in RELEVANCE for t in named):
+            return "visual_relevance must be High, Medium or Low"
+        return None
+
+    section = Section(
+        "topics",
+        "One entry per cluster below: a short topic name, a one-sentence description of what the reviews "
+        "in it discuss, and how relevant the topic is to the product's visual appearance (High, Medium or Low).",
+        array(obj({"cluster": number("cluster number"), "topic_name": string(), "description": string(),
+                   "visual_relevance": string("High, Medium or Low")})),
+        check=check,
+    )
+    analyzer = MultiTaskAnalyzer(client, [section], model=model, temperature=temperature,
+                                 system="You are an expert at topic extraction. Always respond with valid JSON.")
+    header = f"Review topics found by clustering the customer reviews of: {product}\n\n" if product else ""
+    named = analyzer.analyze(header + _describe(clusters))["topics"] or []
+    by_id = {int(t["cluster"]): t for t in named}
+
+    topics = []
+    for c in clusters:
+        t = by_id.get(c["cluster"])
+        topics.append({
+            "topic_name": t["topic_name"] if t else " / ".join(c["keywords"][:3]),
+            "description": t["description"] if t else f"{c['share']}% of reviews; e.g. \"{c['examples'][0]}\"",
+            "keywords": c["keywords"][:keywords],
+            "visual_relevance": t["visual_relevance"] if t else visual_relevance(c["keywords"]),
+        })
+    return topics
+
+
+def print_clusters(clusters: List[Dict], prefix: str = "   ") -> None:
+    for c in clusters:
+        print(f"{prefix}#{c['cluster']} {c['size']} reviews ({c['share']}%): {', '.join(c['keywords'])}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cluster reviews into topics locally (no LLM).")
+    parser.add_argument("path", nargs="?", help="customer_reviews.json")
+    parser.add_argument("--synthetic", type=int, default=0, help="Cluster N synthetic reviews instead")
+    parser.add_argument("--topics", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        from review_chunker import synthetic_reviews
+        reviews = synthetic_reviews(args.synthetic)
+    else:
+        with open(args.path or "data/customer_reviews.json", "r", encoding="utf-8") as f:
+            reviews = json.load(f)
+    texts = [f"{r.get('review_title') or r.get('title') or ''}. {r.get('review_body') or r.get('body') or ''}"
+             for r in reviews]
+
+    start = time.perf_counter()
+    clusters = fit_topics(texts, n_topics=args.topics)
+    print(f"[Topics]: {len(texts):,} reviews -> {len(clusters)} topics in {time.perf_counter() - start:.2f}s")
+    print_clusters(clusters)
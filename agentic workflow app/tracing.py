@@ -0,0 +1,176 @@
+import json
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+# Phases of one page; the first four are time spent waiting on Amazon/the browser, the rest is our own work
+NAVIGATE, HTTP, WAIT, IDLE, SCROLL, EXTRACT = "navigate", "http", "wait", "idle", "scroll", "extract"
+PHASES = (NAVIGATE, HTTP, WAIT, IDLE, SCROLL, EXTRACT)
+WAIT_PHASES = (NAVIGATE, HTTP, WAIT, IDLE)
+
+
+def hook_execute(driver, before: Callable[[str], None]) -> Callable[[], None]:
+    """
+    Calls before(command) ahead of every driver.execute (one WebDriver roundtrip each) and returns
+    a function that removes the hook again. Hooks can be stacked and removed in any order; removing
+    one leaves the others working.
+    """
+    had_own = "execute" in vars(driver)
+    original = driver.execute
+    active = [True]
+
+    def hooked_execute(driver_command, params=None):
+        if active[0]:
+            before(driver_command)
+        return original(driver_command, params)
+
+    def remove() -> None:
+        active[0] = False  # A hook added later may still call through this one
+        if vars(driver).get("execute") is not hooked_execute:
+            return
+        # Skip hooks below this one that were already removed
+        target, own = original, had_own
+        while getattr(target, "_hook", None) is not None and not target._hook[0][0]:
+            _, target, own = target._hook
+        if own:
+            driver.execute = target
+        else:
+            del driver.execute  # Back to the class method
+
+    hooked_execute._hook = (active, original, had_own)
+    driver.execute = hooked_execute
+    return remove
+
+
+class CrawlTrace:
+    """
+    Per-page timing and WebDriver call counts for one crawl.
+
+    Wrap each step of a page in `with trace.phase(NAVIGATE)` (or WAIT, SCROLL, EXTRACT, IDLE, HTTP).
+    attach(driver) hooks driver.execute, so every WebDriver command (one chromedriver roundtrip)
+    is counted by command name and by the phase it was issued in. report() is JSON-ready and
+    print_summary() shows per-phase totals and a histogram of page times.
+    """
+    def __init__(self, name: str = "crawl"):
+        self.name = name
+        self.pages: List[Dict] = []
+        self.started_at = time.time()
+        self._current: Optional[Dict] = None
+        self._phase: Optional[str] = None
+        self._hooks: List = []  # (driver, remove) per attached driver
+
+    def attach(self, driver) -> None:
+        """
+        Counts the driver's WebDriver commands until detach() (safe to call more than once).
+        Detach a pooled driver before it goes back to the pool, or other crawls get counted here.
+        """
+        if driver is None or any(d is driver for d, _ in self._hooks):
+            return
+
+        def count(driver_command: str) -> None:
+            page = self._current
+            if page is not None:
+                page["commands"][driver_command] += 1
+                page["phase_commands"][self._phase or "other"] += 1
+
+        self._hooks.append((driver, hook_execute(driver, count)))
+
+    def detach(self, driver=None) -> None:
+        """Stops counting `driver` (default: every attached driver), restoring its previous execute."""
+        keep = []
+        for d, remove in self._hooks:
+            if driver is None or d is driver:
+                remove()
+            else:
+                keep.append((d, remove))
+        self._hooks = keep
+
+    def start_page(self, label) -> None:
+        self._current = {"page": label, "phases": {p: 0.0 for p in PHASES},
+                         "commands": Counter(), "phase_commands": Counter()}
+        self.pages.append(self._current)
+
+    @contextmanager
+    def phase(self, name: str):
+        """Times the block as `name` on the current page (nested phases count toward the inner one)."""
+        outer, self._phase = self._phase, name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._phase = outer
+            if self._current is not None:
+                self._current["phases"][name] = self._current["phases"].get(name, 0.0) + elapsed
+                if outer is not None:
+                    self._current["phases"][outer] -= elapsed
+
+    def report(self) -> Dict:
+        """Machine-readable run report: per-page phases and commands, plus totals."""
+        pages = []
+        phase_totals = Counter()
+        command_totals = Counter()
+        for p in self.pages:
+            total = sum(p["phases"].values())
+            phase_totals.update(p["phases"])
+            command_totals.update(p["commands"])
+            pages.append({
+                "page": p["page"],
+                "seconds": round(total, 3),
+                "wait_seconds": round(sum(p["phases"][k] for k in WAIT_PHASES), 3),
+                "phases": {k: round(v, 3) for k, v in p["phases"].items()},
+                "webdriver_commands": sum(p["commands"].values()),
+                "commands": dict(p["commands"]),
+                "commands_by_phase": dict(p["phase_commands"]),
+            })
+        total_commands = sum(command_totals.values())
+        return {
+            "name": self.name,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            "pages": len(pages),
+            "seconds": round(sum(p["seconds"] for p in pages), 3),
+            "phase_seconds": {k: round(v, 3) for k, v in phase_totals.items()},
+            "webdriver_commands": total_commands,
+            "commands_per_page": round(total_commands / len(pages), 1) if pages else 0.0,
+            "commands": dict(command_totals.most_common()),
+            "per_page": pages,
+        }
+
+    def save(self, path: str) -> Dict:
+        """Writes report() as JSON and returns it."""
+        report = self.report()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        return report
+
+    def print_summary(self, prefix: str = "   ", width: int = 30) -> None:
+        report = self.report()
+        if not report["pages"]:
+            return
+        total = report["seconds"] or 1e-9
+        print(f"{prefix}{report['pages']} pages in {report['seconds']:.2f}s, "
+              f"{report['webdriver_commands']} WebDriver commands ({report['commands_per_page']}/page)")
+        for name, seconds in sorted(report["phase_seconds"].items(), key=lambda kv: -kv[1]):
+            if seconds <= 0:
+                continue
+            bar = "█" * max(1, round(width * seconds / total))
+            print(f"{prefix}  {name:<9}{seconds:>8.2f}s {seconds / report['pages']:>6.2f}s/page  {bar} {100 * seconds / total:.0f}%")
+        if report["commands"]:
+            top = ", ".join(f"{k}: {v}" for k, v in list(report["commands"].items())[:5])
+            print(f"{prefix}  top commands — {top}")
+
+        # Histogram of page times
+        times = [p["seconds"] for p in report["per_page"]]
+        low, high = min(times), max(times)
+        buckets = min(6, len(times)) if high > low else 1
+        step = (high - low) / buckets or 1.0
+        counts = [0] * buckets
+        for t in times:
+            counts[min(int((t - low) / step), buckets - 1)] += 1
+        print(f"{prefix}page time histogram:")
+        for i, count in enumerate(counts):
+            bar = "█" * round(width * count / max(counts))
+            print(f"{prefix}  {low + i * step:>6.2f}-{low + (i + 1) * step:.2f}s {bar} {count}")
@@ -0,0 +1,89 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+DEFAULT_REGISTRY_PATH = os.path.join(".sessions", "review_url_formats.json")
+
+
+class UrlFormatRegistry:
+    """
+    Remembers which review-page URL format worked for each marketplace/ASIN, so later runs
+    try that format first and only probe the others after it fails. A new ASIN starts from the
+    format that last worked on the same marketplace. Persisted as JSON next to the saved session.
+
+    stats counts lookups: a "hit" is a remembered format that still worked, a "miss" is a
+    lookup with nothing remembered or a remembered format that failed.
+    """
+    def __init__(self, path: str = DEFAULT_REGISTRY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict] = {}
+        self.stats = {"hits": 0, "misses": 0}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            self.entries = saved.get("entries", {})
+            self.stats.update(saved.get("stats", {}))
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    @staticmethod
+    def _key(marketplace: str, asin: Optional[str] = None) -> str:
+        return f"{marketplace}/{asin}" if asin else marketplace
+
+    def lookup(self, marketplace: str, asin: str) -> Optional[str]:
+        """Returns the remembered format name for this ASIN, else the marketplace's last working one."""
+        with self._lock:
+            entry = self.entries.get(self._key(marketplace, asin)) or self.entries.get(self._key(marketplace))
+            return entry["format"] if entry else None
+
+    def order(self, marketplace: str, asin: str, names: List[str]) -> List[str]:
+        """Puts the remembered format (if any) in front of the probe order."""
+        remembered = self.lookup(marketplace, asin)
+        if remembered not in names:
+            return list(names)
+        return [remembered] + [n for n in names if n != remembered]
+
+    def record_success(self, marketplace: str, asin: str, name: str) -> None:
+        """Records the format that worked; counts a hit if it was the remembered one."""
+        with self._lock:
+            previous = self.entries.get(self._key(marketplace, asin)) or self.entries.get(self._key(marketplace))
+            if previous is None or not previous.get("failed"):
+                # A failed remembered format was already counted as a miss by record_failure
+                self.stats["hits" if previous and previous["format"] == name else "misses"] += 1
+            for key in (self._key(marketplace, asin), self._key(marketplace)):
+                entry = self.entries.get(key)
+                uses = entry["uses"] + 1 if entry and entry["format"] == name else 1
+                self.entries[key] = {
+                    "format": name,
+                    "marketplace": marketplace,
+                    "asin": asin if key != marketplace else None,
+                    "verified_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "uses": uses,
+                }
+        self.save()
+
+    def record_failure(self, marketplace: str, asin: str, name: str) -> None:
+        """Marks a remembered format as failed (a miss), so the other formats get probed."""
+        with self._lock:
+            counted = False
+            for key in (self._key(marketplace, asin), self._key(marketplace)):
+                entry = self.entries.get(key)
+                if entry and entry["format"] == name and not entry.get("failed"):
+                    entry["failed"] = True
+                    entry["failed_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+                    if not counted:
+                        self.stats["misses"] += 1
+                        counted = True
+        self.save()
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock:
+            payload = {"entries": self.entries, "stats": self.stats}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2)
+        os.replace(tmp_path, self.path)
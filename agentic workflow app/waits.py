@@ -0,0 +1,135 @@
+import random
+import time
+from typing import Optional
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+REVIEW_SELECTOR = '[data-hook="review"]'
+# Shown instead of review cards when a product (or a filtered page) has no reviews
+NO_REVIEWS_SELECTOR = '[data-hook="cr-filter-info-review-rating-count"], .no-reviews-section'
+CAPTCHA_SELECTOR = 'form[action*="validateCaptcha"], #captchacharacters'
+
+READY, EMPTY, SIGNIN, CAPTCHA, TIMEOUT = "ready", "empty", "signin", "captcha", "timeout"
+
+
+def page_status(driver) -> Optional[str]:
+    """Classifies the current page, or returns None while it is still loading."""
+    if "signin" in driver.current_url.lower():
+        return SIGNIN
+    if driver.find_elements(By.CSS_SELECTOR, CAPTCHA_SELECTOR):
+        return CAPTCHA
+    if driver.find_elements(By.CSS_SELECTOR, REVIEW_SELECTOR):
+        return READY
+    if driver.execute_script("return document.readyState") == "complete" and \
+            driver.find_elements(By.CSS_SELECTOR, NO_REVIEWS_SELECTOR):
+        return EMPTY
+    return None
+
+
+def wait_for_reviews(driver, timeout: float = 15, poll_frequency: float = 0.25) -> str:
+    """
+    Waits until review cards render, or the page turns out to be a sign-in redirect,
+    a captcha or an empty review list. Returns one of READY/EMPTY/SIGNIN/CAPTCHA/TIMEOUT
+    as soon as the page settles, instead of sleeping a fixed amount.
+    """
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=poll_frequency,
+                             ignored_exceptions=(WebDriverException,)).until(page_status)
+    except TimeoutException:
+        return TIMEOUT
+
+
+def wait_for_element(driver, by: str, value: str, timeout: float = 10) -> bool:
+    """Waits for a single element (e.g. #productTitle) and returns whether it appeared."""
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.25).until(
+            lambda d: d.find_elements(by, value)
+        )
+        return True
+    except TimeoutException:
+        return False
+
+
+def has_next_page(driver) -> Optional[bool]:
+    """Reads the pagination bar: False on the last page, True if a next link exists, None if there is no bar."""
+    if driver.find_elements(By.CSS_SELECTOR, ".a-pagination li.a-last.a-disabled"):
+        return False
+    if driver.find_elements(By.CSS_SELECTOR, ".a-pagination li.a-last a"):
+        return True
+    return None
+
+
+def scroll_page(driver) -> None:
+    """Scrolls to the bottom and back so lazily rendered sections are triggered, without sleeping."""
+    driver.execute_script(
+        "window.scrollTo(0, document.body.scrollHeight); window.scrollTo(0, 0);"
+    )
+
+
+class PolitenessController:
+    """
+    Adaptive delay between page requests. Each healthy page shrinks the delay towards
+    min_delay; a captcha or sign-in redirect doubles it (up to max_delay).
+    """
+    def __init__(self, base_delay: float = 3.0, min_delay: float = 0.5, max_delay: float = 60.0,
+                 speedup: float = 0.75, backoff: float = 2.0, jitter: float = 0.2):
+        self.min_delay = min(min_delay, base_delay)
+        self.max_delay = max(max_delay, base_delay)
+        self.delay = base_delay
+        self.speedup = speedup
+        self.backoff = backoff
+        self.jitter = jitter
+        self.blocks = 0
+
+    def record_success(self) -> None:
+        self.delay = max(self.min_delay, self.delay * self.speedup)
+
+    def record_block(self) -> None:
+        self.blocks += 1
+        self.delay = min(self.max_delay, max(self.delay, self.min_delay) * self.backoff)
+
+    def pause(self, since: Optional[float] = None) -> float:
+        """
+        Sleeps for the current delay (with a little jitter) and returns the time slept.
+        If `since` (a time.time() of the previous request) is given, only the remainder is slept.
+        """
+        seconds = self.delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+        if since is not None:
+            seconds -= time.time() - since
+        if seconds > 0:
+            time.sleep(seconds)
+        return max(seconds, 0.0)
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter whose state lives in multiprocessing shared memory, so every
+    worker process scraping the same host draws from one global budget of `rate` requests/second.
+    """
+    def __init__(self, rate: float, capacity: float = 1.0, ctx=None):
+        import multiprocessing
+        ctx = ctx or multiprocessing.get_context()
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = ctx.Value("d", self.capacity, lock=False)
+        self._updated = ctx.Value("d", time.time(), lock=False)
+        self._lock = ctx.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Blocks until `tokens` are available and returns the time spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.time()
+                self._tokens.value = min(self.capacity,
+                                         self._tokens.value + (now - self._updated.value) * self.rate)
+                self._updated.value = now
+                if self._tokens.value >= tokens:
+                    self._tokens.value -= tokens
+                    return waited
+                shortfall = (tokens - self._tokens.value) / self.rate
+            time.sleep(shortfall)
+            waited += shortfall
+